@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+
+from config import Config, MOSCOW_OFFSET
+from recurrence import rule_for
+from utils import TextFormatter
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен: без него серии разворачиваются на чистом Python
+    np = None
+
+WEEKDAY_TITLES = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def split_series(rows):
+    """Разложение напоминаний на серии с фиксированным периодом.
+
+    rows - кортежи (ключ, время первого повторения UTC, repeat_type). Возвращает
+    серии (ключ, начало, период или None для однократных) и календарные правила
+    (ключ, правило, начало), которые разворачиваются по одному. Еженедельное правило
+    по нескольким дням недели - это отдельная серия на каждый день с периодом в
+    INTERVAL недель.
+    """
+    series = []
+    calendar = []
+    for key, start, repeat_type in rows:
+        rule = rule_for(repeat_type)
+        if rule is None:
+            series.append((key, start, None))
+            continue
+        period = rule.period()
+        if period is not None:
+            series.append((key, start, period))
+        elif rule.freq == 'WEEKLY':
+            # Дни недели - по Москве, как в Recurrence.next_after
+            local_start = start + MOSCOW_OFFSET
+            period = timedelta(weeks=rule.interval)
+            first_monday = local_start - timedelta(days=local_start.weekday())
+            for _, weekday in rule.byday:
+                first = first_monday + timedelta(days=weekday)
+                if first < local_start:
+                    first += period
+                series.append((key, first - MOSCOW_OFFSET, period))
+        else:
+            calendar.append((key, rule, start))
+    return series, calendar
+
+
+def _expand_numpy(series, range_start, range_end):
+    # Целые микросекунды от эпохи: перевод datetime -> datetime64 по одному объекту заметно медленнее
+    count = len(series)
+    keys = np.array([key for key, _, _ in series], dtype=object)
+    starts = np.fromiter(((start - EPOCH) // MICROSECOND for _, start, _ in series), np.int64, count)
+    periods = np.fromiter((period // MICROSECOND if period else 0 for _, _, period in series), np.int64, count)
+    range_start = (range_start - EPOCH) // MICROSECOND
+    range_end = (range_end - EPOCH) // MICROSECOND
+
+    once = periods == 0
+    steps = np.where(once, 1, periods)
+    # Номер первого повторения не раньше range_start и число повторений до range_end
+    first_index = np.maximum(0, -((starts - range_start) // steps))
+    first = starts + first_index * steps
+    counts = np.where(first < range_end, -((first - range_end) // steps), 0)
+    counts = np.where(once, (starts >= range_start) & (starts < range_end), counts).astype(np.int64)
+
+    owners = np.repeat(np.arange(count), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    times = first[owners] + offsets * steps[owners]
+    order = np.argsort(times, kind='stable')
+    return list(zip(times[order].astype('datetime64[us]').tolist(), keys[owners[order]].tolist()))
+
+
+def _expand_python(series, range_start, range_end):
+    occurrences = []
+    for key, start, period in series:
+        if period is None:
+            if range_start <= start < range_end:
+                occurrences.append((start, key))
+            continue
+        moment = start + period * max(0, -((start - range_start) // period))
+        while moment < range_end:
+            occurrences.append((moment, key))
+            moment += period
+    return occurrences
+
+
+def expand(rows, range_start, range_end, vectorized=None):
+    """Все повторения напоминаний в [range_start, range_end): список (время UTC, ключ) по времени.
+
+    Серии с фиксированным периодом разворачиваются одним проходом над массивами
+    NumPy (если он установлен), календарные правила - через Recurrence.between.
+    """
+    series, calendar = split_series(rows)
+    if vectorized is None:
+        vectorized = np is not None
+    if series and vectorized:
+        occurrences = _expand_numpy(series, range_start, range_end)
+    else:
+        occurrences = _expand_python(series, range_start, range_end)
+
+    for key, rule, start in calendar:
+        local = rule.between(start + MOSCOW_OFFSET, range_start + MOSCOW_OFFSET, range_end + MOSCOW_OFFSET)
+        occurrences.extend((moment - MOSCOW_OFFSET, key) for moment in local)
+    if calendar or not vectorized:
+        occurrences.sort(key=lambda occurrence: occurrence[0])
+    return occurrences
+
+
+def format_agenda(occurrences, reminders, days):
+    """Текст повестки по дням; reminders - id -> (текст, категория, repeat_type)"""
+    if not occurrences:
+        return f"📭 На ближайшие {days} дн. напоминаний нет."
+
+    def blocks():
+        current_day = None
+        for moment, reminder_id in occurrences:
+            local = moment + MOSCOW_OFFSET
+            text, category, repeat_type = reminders[reminder_id]
+            block = []
+            if local.date() != current_day:
+                current_day = local.date()
+                block += ["", f"📅 {WEEKDAY_TITLES[local.weekday()]}, {local.strftime('%d.%m')}"]
+            category_icon = Config.CATEGORIES.get(category, '📌').split(' ')[0]
+            repeat_icon = " 🔁" if repeat_type != 'once' else ""
+            block.append(f"  {local.strftime('%H:%M')} {category_icon} {text}{repeat_icon}")
+            yield block
+
+    return TextFormatter.join_within_limit(
+        [f"🗓 Повестка на {days} дн. ({len(occurrences)}):"], blocks(), len(occurrences)
+    )
@@ -0,0 +1,95 @@
+"""Развертка повторений для /agenda и прогнозов нагрузки.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.agenda_bench --sizes 500,100000 --json agenda_bench.json
+
+Для каждого размера создаются активные напоминания со смесью правил повторения и
+разворачиваются на --days дней тремя способами: по одному правилу через
+Recurrence.between, сериями на чистом Python и векторно через NumPy (если установлен).
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import agenda
+import recurrence
+
+RULES = [
+    'once', 'daily', 'weekly', 'monthly', 'FREQ=HOURLY;INTERVAL=4', 'FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR',
+    'FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH', 'FREQ=MONTHLY;BYDAY=-1FR', 'FREQ=DAILY;INTERVAL=3',
+]
+
+
+def make_rows(size, now, rng):
+    return [
+        (index, now + timedelta(minutes=rng.randint(-90 * 1440, 7 * 1440)), rng.choice(RULES))
+        for index in range(size)
+    ]
+
+
+def per_rule(rows, start, end):
+    occurrences = [
+        (moment, key) for key, first, repeat_type in rows
+        for moment in recurrence.occurrences_between(repeat_type, first, start, end)
+    ]
+    occurrences.sort(key=lambda occurrence: occurrence[0])
+    return occurrences
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, round((time.perf_counter() - started) * 1000, 2)
+
+
+def run_size(size, days, rng):
+    now = datetime.utcnow().replace(microsecond=0)
+    end = now + timedelta(days=days)
+    rows = make_rows(size, now, rng)
+
+    expected, per_rule_ms = timed(lambda: per_rule(rows, now, end))
+    result = {'reminders': size, 'occurrences': len(expected), 'per_rule_ms': per_rule_ms}
+    python_result, result['python_ms'] = timed(lambda: agenda.expand(rows, now, end, vectorized=False))
+    result['python_matches'] = sorted(python_result) == sorted(expected)
+    if agenda.np is not None:
+        numpy_result, result['numpy_ms'] = timed(lambda: agenda.expand(rows, now, end, vectorized=True))
+        result['numpy_matches'] = sorted(numpy_result) == sorted(expected)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Развертка повторений: по одному, сериями, NumPy')
+    parser.add_argument('--sizes', default='500,100000', help='число напоминаний через запятую')
+    parser.add_argument('--days', type=int, default=7, help='период развертки, дней')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_path', help='сохранить отчет в JSON файл')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    results = []
+    for size in args.sizes.split(','):
+        if size:
+            print(f"{size} reminders...", file=sys.stderr)
+            results.append(run_size(int(size), args.days, rng))
+
+    report = {
+        'generated_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'params': vars(args),
+        'numpy': agenda.np.__version__ if agenda.np is not None else None,
+        'results': results,
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+    return all(result['python_matches'] and result.get('numpy_matches', True) for result in results)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
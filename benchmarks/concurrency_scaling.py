@@ -0,0 +1,139 @@
+"""Масштабирование обработки обновлений с ростом параллельности.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.concurrency_scaling --users 200 --levels 1,2,4,8,16 --api-latency 20
+
+Обновления всех пользователей перемешиваются (шаг 1 каждого, потом шаг 2 и т.д.)
+и кладутся в очередь приложения. После обработки проверяется, что у каждого
+пользователя пошаговый сценарий завершился корректно.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import sqlite3
+import sys
+import time
+
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from benchmarks.load_test import FakeTelegramRequest, UpdateFactory, creation_flow
+from bot import ImprovedReminderBot
+from config import Config
+from scheduler import ReminderScheduler
+
+
+def count_consistent_flows(user_ids):
+    """Пользователи, у которых создано ровно то напоминание, которое ожидает сценарий"""
+    conn = sqlite3.connect(Config.DB_PATH)
+    placeholders = ','.join('?' * len(user_ids))
+    rows = conn.execute(f'''
+        SELECT user_id, reminder_text, category, repeat_type, notify_before
+        FROM reminders WHERE user_id IN ({placeholders})
+    ''', list(user_ids.values())).fetchall()
+    conn.close()
+
+    consistent = 0
+    by_user = {}
+    for user_id, *fields in rows:
+        by_user.setdefault(user_id, []).append(tuple(fields))
+    for index, user_id in user_ids.items():
+        expected = (f'Нагрузочное напоминание {index}', 'work', 'daily', 15)
+        if by_user.get(user_id) == [expected]:
+            consistent += 1
+    return consistent
+
+
+async def run_level(level, users, api_latency, base_user_id):
+    Config.CONCURRENT_UPDATES = level
+    request = FakeTelegramRequest(latency=api_latency / 1000)
+    bot = ImprovedReminderBot(request=request)
+    application = bot.application
+    factory = UpdateFactory(application.bot)
+
+    processed = 0
+    done = asyncio.Event()
+    user_ids = {i: base_user_id + i for i in range(users)}
+    flows = [creation_flow(factory, user_id, i) for i, user_id in user_ids.items()]
+    total = sum(len(flow) for flow in flows)
+
+    async def record_processed(update, context):
+        nonlocal processed
+        processed += 1
+        if processed >= total:
+            done.set()
+
+    application.add_handler(TypeHandler(Update, record_processed), group=99)
+
+    await application.initialize()
+    bot.scheduler = ReminderScheduler(application.bot, loop=asyncio.get_running_loop())
+    await application.start()
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for step in range(max(len(flow) for flow in flows)):
+            for flow in flows:
+                if step < len(flow):
+                    await application.update_queue.put(flow[step][1])
+        try:
+            await asyncio.wait_for(done.wait(), timeout=300)
+        except asyncio.TimeoutError:
+            pass
+    elapsed = time.perf_counter() - started
+
+    await application.stop()
+    bot.scheduler.shutdown()
+    await application.shutdown()
+
+    return {
+        'concurrent_updates': level,
+        'updates': total,
+        'processed': processed,
+        'elapsed_s': round(elapsed, 3),
+        'updates_per_s': round(processed / elapsed, 1) if elapsed else 0.0,
+        'consistent_flows': count_consistent_flows(user_ids),
+        'users': users,
+    }
+
+
+async def main_async(args):
+    levels = [int(level) for level in args.levels.split(',') if level]
+    results = []
+    for i, level in enumerate(levels):
+        result = await run_level(level, args.users, args.api_latency, 4_000_000 + i * 100_000)
+        print(f"{level:>4} concurrent: {result['updates_per_s']:>8} updates/s, "
+              f"{result['consistent_flows']}/{result['users']} flows consistent", file=sys.stderr)
+        results.append(result)
+
+    baseline = results[0]['updates_per_s'] if results else 0
+    for result in results:
+        result['speedup'] = round(result['updates_per_s'] / baseline, 2) if baseline else 0.0
+    return {'params': vars(args), 'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Масштабирование обработки обновлений')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--levels', default='1,2,4,8,16', help='значения CONCURRENT_UPDATES через запятую')
+    parser.add_argument('--api-latency', type=float, default=20.0,
+                        help='искусственная задержка ответа Bot API, мс')
+    parser.add_argument('--json', dest='json_path', help='сохранить отчет в JSON файл')
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    report = asyncio.run(main_async(args))
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+    return report
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
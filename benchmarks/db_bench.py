@@ -0,0 +1,212 @@
+"""Микробенчмарк публичных методов Database.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.db_bench --sizes 10000,100000,1000000 --json db_bench.json
+    python -m benchmarks.db_bench --sizes 10000 --compare db_bench.json
+
+Для каждого размера создается отдельный SQLite файл, заполняется пользователями
+и напоминаниями, после чего каждый метод выполняется в течение заданного времени.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+_TMP_DIR = tempfile.mkdtemp(prefix='reminder_db_bench_')
+os.environ['DB_PATH'] = os.path.join(_TMP_DIR, 'data', 'reminders.db')
+os.environ['BACKUP_DIR'] = os.path.join(_TMP_DIR, 'backups')
+
+from config import Config
+from database import Database
+
+SEED_BATCH = 50_000
+CATEGORIES = list(Config.CATEGORIES.keys())
+REPEAT_TYPES = list(Config.REPEAT_OPTIONS.keys())
+STATUSES = ('active', 'active', 'active', 'completed', 'cancelled')
+# Слова текстов напоминаний, чтобы поиску было что находить
+WORDS = ('позвонить', 'врачу', 'купить', 'молоко', 'оплатить', 'счет', 'встреча', 'отчет',
+         'забрать', 'посылку', 'маме', 'спортзал', 'таблетки', 'день', 'рождения', 'анализы')
+
+
+def seed_database(db_path, reminders, users, rng):
+    """Быстрое заполнение базы напрямую через executemany"""
+    db = Database(db_path)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA synchronous = OFF')
+    cursor.execute('PRAGMA journal_mode = MEMORY')
+
+    cursor.executemany(
+        'INSERT INTO users (user_id, username, first_name) VALUES (?, ?, ?)',
+        ((user_id, f'user{user_id}', f'User{user_id}') for user_id in range(1, users + 1))
+    )
+
+    now = datetime.utcnow()
+    stats = {}
+    for start in range(0, reminders, SEED_BATCH):
+        rows = []
+        for _ in range(start, min(start + SEED_BATCH, reminders)):
+            user_id = rng.randint(1, users)
+            status = rng.choice(STATUSES)
+            # Часть напоминаний попадает в ближайший час, чтобы get_pending_reminders было что вернуть
+            offset = timedelta(seconds=rng.randint(-30 * 86400, 30 * 86400))
+            rows.append((
+                user_id, f'{rng.choice(WORDS)} {rng.choice(WORDS)} {user_id}', now + offset,
+                rng.choice(CATEGORIES), rng.choice(REPEAT_TYPES), status, rng.choice((0, 0, 15, 60)),
+            ))
+            total, completed, cancelled = stats.get(user_id, (0, 0, 0))
+            stats[user_id] = (total + 1, completed + (status == 'completed'), cancelled + (status == 'cancelled'))
+        cursor.executemany('''
+            INSERT INTO reminders (user_id, reminder_text, reminder_time, category, repeat_type, status, notify_before)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+    cursor.executemany('''
+        INSERT INTO user_stats (user_id, total_reminders, completed_reminders, cancelled_reminders)
+        VALUES (?, ?, ?, ?)
+    ''', ((user_id, *values) for user_id, values in stats.items()))
+
+    conn.commit()
+    conn.close()
+    return db
+
+
+def benchmark_method(name, func, min_time, max_ops):
+    """Выполняет func повторно и возвращает ops/sec, среднее время и пик памяти"""
+    tracemalloc.start()
+    durations = []
+    started = time.perf_counter()
+    while len(durations) < max_ops and (time.perf_counter() - started) < min_time:
+        op_started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - op_started)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'method': name,
+        'ops': len(durations),
+        'ops_per_s': round(len(durations) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(durations) / len(durations) * 1000, 3) if durations else 0.0,
+        'max_ms': round(max(durations) * 1000, 3) if durations else 0.0,
+        'peak_alloc_kb': peak // 1024,
+    }
+
+
+def run_size(size, reminders_per_user, min_time, max_ops, rng):
+    users = max(1, size // reminders_per_user)
+    db_path = os.path.join(_TMP_DIR, f'bench_{size}.db')
+
+    seed_started = time.perf_counter()
+    db = seed_database(db_path, size, users, rng)
+    seed_time = time.perf_counter() - seed_started
+
+    reminder_time = datetime.utcnow() + timedelta(hours=2)
+    methods = [
+        ('add_reminder', lambda: db.add_reminder(
+            rng.randint(1, users), 'Бенчмарк', reminder_time, 'work', 'once', 0)),
+        ('get_user_reminders', lambda: db.get_user_reminders(rng.randint(1, users))),
+        ('get_user_reminders_active', lambda: db.get_user_reminders(rng.randint(1, users), status='active')),
+        ('get_pending_reminders', db.get_pending_reminders),
+        ('get_user_stats', lambda: db.get_user_stats(rng.randint(1, users))),
+        ('search_reminders', lambda: db.search_reminders(rng.randint(1, users), rng.choice(WORDS)[:4])),
+        ('create_backup', db.create_backup),
+    ]
+
+    results = []
+    for name, func in methods:
+        # Бэкап копирует весь файл, поэтому ограничиваем число повторов
+        limit = min(max_ops, 5) if name == 'create_backup' else max_ops
+        result = benchmark_method(name, func, min_time, limit)
+        result.update({'size': size, 'users': users})
+        results.append(result)
+        print(f"{size:>10} {name:<28} {result['ops_per_s']:>12} ops/s {result['mean_ms']:>10} ms", file=sys.stderr)
+
+    shutil.rmtree(Config.BACKUP_DIR, ignore_errors=True)
+    db_size_kb = os.path.getsize(db_path) // 1024
+    os.remove(db_path)
+    return {'size': size, 'users': users, 'seed_s': round(seed_time, 2),
+            'db_size_kb': db_size_kb, 'methods': results}
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline_path):
+    """Печатает изменение ops/sec относительно сохраненного отчета"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    previous = {
+        (entry['size'], method['method']): method['ops_per_s']
+        for entry in baseline['results'] for method in entry['methods']
+    }
+    print(f"Сравнение с {baseline_path} (коммит {baseline.get('commit')}):")
+    for entry in report['results']:
+        for method in entry['methods']:
+            before = previous.get((entry['size'], method['method']))
+            if not before:
+                continue
+            ratio = method['ops_per_s'] / before
+            print(f"  {entry['size']:>10} {method['method']:<28} {before:>12} -> {method['ops_per_s']:>12} ({ratio:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Микробенчмарк методов Database')
+    parser.add_argument('--sizes', default='10000,100000',
+                        help='число напоминаний через запятую, например 10000,1000000,10000000')
+    parser.add_argument('--reminders-per-user', type=int, default=20)
+    parser.add_argument('--min-time', type=float, default=1.0, help='секунд на каждый метод')
+    parser.add_argument('--max-ops', type=int, default=10_000, help='максимум вызовов на метод')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_path', help='сохранить отчет в JSON файл')
+    parser.add_argument('--compare', help='JSON отчет для сравнения')
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.disable(logging.INFO)
+    rng = random.Random(args.seed)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    report = {
+        'commit': current_commit(),
+        'generated_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'sqlite_version': sqlite3.sqlite_version,
+        'params': vars(args),
+        'results': [run_size(size, args.reminders_per_user, args.min_time, args.max_ops, rng) for size in sizes],
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        compare(report, args.compare)
+    return report
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,342 @@
+"""Нагрузочный тест бота против локальной заглушки Bot API.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.load_test --users 200 --storm 500 --storm-delay 60
+
+Бот работает с настоящими обработчиками и настоящей SQLite базой во временной
+директории, а все запросы к Telegram перехватывает FakeTelegramRequest.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# Настраиваем окружение до импорта модулей бота
+_TMP_DIR = tempfile.mkdtemp(prefix='reminder_load_')
+os.environ.setdefault('BOT_TOKEN', '123456:LOADTEST')
+os.environ['DB_PATH'] = os.path.join(_TMP_DIR, 'data', 'reminders.db')
+os.environ['BACKUP_DIR'] = os.path.join(_TMP_DIR, 'backups')
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+from bot import ImprovedReminderBot
+from database import Database
+from scheduler import ReminderScheduler
+
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'LoadTest', 'username': 'load_test_bot'}
+
+# Методы Database, которые пишут в базу
+WRITE_METHODS = (
+    'add_or_update_user', 'add_reminder', 'update_reminder_status',
+    'delete_reminder', 'update_reminder', 'claim_reminder', 'release_reminder',
+    'complete_delivery', 'claim_notification', 'release_notification',
+)
+
+
+class FakeTelegramRequest(BaseRequest):
+    """Заглушка Bot API: отвечает на запросы без сети и запоминает отправки"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = defaultdict(int)
+        self.sent = []  # (время отправки, chat_id, текст)
+        self._lock = threading.Lock()
+        self._message_id = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        params = request_data.parameters if request_data else {}
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        with self._lock:
+            self.calls[api_method] += 1
+            self._message_id += 1
+            message_id = self._message_id
+            if api_method == 'sendMessage':
+                self.sent.append((time.time(), params.get('chat_id'), params.get('text', '')))
+
+        if api_method == 'getMe':
+            result = BOT_USER
+        elif api_method in ('sendMessage', 'editMessageText'):
+            chat_id = params.get('chat_id') or 0
+            result = {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': params.get('text', ''),
+            }
+        else:
+            result = True
+
+        return 200, json.dumps({'ok': True, 'result': result}).encode('utf-8')
+
+
+class UpdateFactory:
+    """Генератор синтетических обновлений Telegram"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._update_id = 0
+
+    def _next_id(self):
+        self._update_id += 1
+        return self._update_id
+
+    @staticmethod
+    def _user(user_id):
+        return {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}',
+                'username': f'user{user_id}'}
+
+    def message(self, user_id, text):
+        data = {
+            'update_id': self._next_id(),
+            'message': {
+                'message_id': self._update_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': self._user(user_id),
+                'text': text,
+            },
+        }
+        if text.startswith('/'):
+            command = text.split()[0]
+            data['message']['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        return Update.de_json(data, self.bot)
+
+    def callback(self, user_id, callback_data):
+        data = {
+            'update_id': self._next_id(),
+            'callback_query': {
+                'id': str(self._update_id),
+                'from': self._user(user_id),
+                'chat_instance': str(user_id),
+                'data': callback_data,
+                'message': {
+                    'message_id': self._update_id,
+                    'date': int(time.time()),
+                    'chat': {'id': user_id, 'type': 'private'},
+                    'from': BOT_USER,
+                    'text': '...',
+                },
+            },
+        }
+        return Update.de_json(data, self.bot)
+
+
+def creation_flow(factory, user_id, index):
+    """Полный сценарий пользователя: создание напоминания и просмотр списка"""
+    return [
+        ('start', factory.message(user_id, '/start')),
+        ('create', factory.message(user_id, '📝 Создать напоминание')),
+        ('text', factory.message(user_id, f'Нагрузочное напоминание {index}')),
+        ('time', factory.message(user_id, 'через 2 часа')),
+        ('category', factory.callback(user_id, 'category_work')),
+        ('repeat', factory.callback(user_id, 'repeat_daily')),
+        ('notify', factory.callback(user_id, 'notify_15')),
+        ('my_reminders', factory.message(user_id, '/my_reminders')),
+    ]
+
+
+class WriteCounter:
+    """Подсчет вызовов пишущих методов Database"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        self._originals = {}
+
+    def install(self):
+        for name in WRITE_METHODS:
+            original = getattr(Database, name)
+            self._originals[name] = original
+
+            def wrapper(db, *args, _original=original, **kwargs):
+                with self._lock:
+                    self.count += 1
+                return _original(db, *args, **kwargs)
+
+            setattr(Database, name, wrapper)
+
+    def uninstall(self):
+        for name, original in self._originals.items():
+            setattr(Database, name, original)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(values):
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(max(values) * 1000, 3) if values else 0.0,
+        'mean_ms': round(statistics.mean(values) * 1000, 3) if values else 0.0,
+    }
+
+
+async def run_updates(bot, factory, users, concurrency, writes):
+    """Фаза 1: сценарии пользователей через настоящие обработчики"""
+    application = bot.application
+    latencies = defaultdict(list)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_user(index):
+        user_id = 1_000_000 + index
+        async with semaphore:
+            for kind, update in creation_flow(factory, user_id, index):
+                started = time.perf_counter()
+                await application.process_update(update)
+                latencies[kind].append(time.perf_counter() - started)
+
+    writes_before = writes.count
+    started = time.perf_counter()
+    await asyncio.gather(*(run_user(i) for i in range(users)))
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        'users': users,
+        'updates': len(all_latencies),
+        'elapsed_s': round(elapsed, 3),
+        'updates_per_s': round(len(all_latencies) / elapsed, 1) if elapsed else 0.0,
+        'db_writes': writes.count - writes_before,
+        'db_writes_per_s': round((writes.count - writes_before) / elapsed, 1) if elapsed else 0.0,
+        'latency': latency_summary(all_latencies),
+        'latency_by_step': {kind: latency_summary(values) for kind, values in latencies.items()},
+    }
+
+
+def run_storm(bot, request, storm_size, storm_delay, writes):
+    """Фаза 2: шторм напоминаний, срабатывающих в одну минуту"""
+    scheduler = bot.scheduler
+    fire_time = datetime.utcnow() + timedelta(seconds=storm_delay)
+    # Разбрасываем срабатывания по минуте так же, как это делают реальные пользователи
+    due = {}
+    for i in range(storm_size):
+        user_id = 2_000_000 + i
+        reminder_time = fire_time.replace(microsecond=0) + timedelta(seconds=i % 60)
+        text = f'storm-{i}'
+        reminder_id = bot.db.add_reminder(user_id, text, reminder_time)
+        scheduler.add_reminder(user_id, text, reminder_time, reminder_id)
+        due[f'⏰ Напоминание: {text}'] = reminder_time
+
+    sent_before = len(request.sent)
+    writes_before = writes.count
+    last_due = max(due.values()) if due else fire_time
+    deadline = time.time() + (last_due - datetime.utcnow()).total_seconds() + 30
+
+    while time.time() < deadline:
+        delivered = sum(1 for _, _, text in request.sent[sent_before:] if text in due)
+        if delivered >= storm_size:
+            break
+        time.sleep(0.2)
+
+    lags = []
+    first_send = last_send = None
+    for sent_at, _, text in request.sent[sent_before:]:
+        if text not in due:
+            continue
+        due_ts = (due[text] - datetime(1970, 1, 1)).total_seconds()
+        lags.append(max(0.0, sent_at - due_ts))
+        first_send = sent_at if first_send is None else min(first_send, sent_at)
+        last_send = sent_at if last_send is None else max(last_send, sent_at)
+
+    window = (last_send - first_send) if lags and last_send > first_send else 0.0
+    return {
+        'scheduled': storm_size,
+        'delivered': len(lags),
+        'lost': storm_size - len(lags),
+        'sends_per_s': round(len(lags) / window, 1) if window else float(len(lags)),
+        'db_writes': writes.count - writes_before,
+        'fire_to_send_lag': latency_summary(lags),
+    }
+
+
+async def main_async(args):
+    request = FakeTelegramRequest(latency=args.api_latency / 1000)
+    bot = ImprovedReminderBot(request=request)
+    factory = UpdateFactory(bot.application.bot)
+    writes = WriteCounter()
+    writes.install()
+
+    await bot.application.initialize()
+    # Отправка в цикле приложения, как при обычном запуске бота
+    bot.scheduler = ReminderScheduler(bot.application.bot, loop=asyncio.get_running_loop())
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            updates_report = await run_updates(bot, factory, args.users, args.concurrency, writes)
+            storm_report = None
+            if args.storm:
+                storm_report = await asyncio.get_running_loop().run_in_executor(
+                    None, run_storm, bot, request, args.storm, args.storm_delay, writes
+                )
+    finally:
+        bot.scheduler.shutdown()
+        await bot.application.shutdown()
+        writes.uninstall()
+
+    return {
+        'generated_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'params': vars(args),
+        'db_path': os.environ['DB_PATH'],
+        'updates': updates_report,
+        'storm': storm_report,
+        'api_calls': dict(request.calls),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Нагрузочный тест бота с заглушкой Bot API')
+    parser.add_argument('--users', type=int, default=100, help='число синтетических пользователей')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='сколько пользователей обрабатываются одновременно')
+    parser.add_argument('--storm', type=int, default=200,
+                        help='число напоминаний в шторме (0 - не запускать)')
+    parser.add_argument('--storm-delay', type=int, default=60,
+                        help='через сколько секунд начинается шторм')
+    parser.add_argument('--api-latency', type=float, default=0.0,
+                        help='искусственная задержка ответа Bot API, мс')
+    parser.add_argument('--json', dest='json_path', help='сохранить отчет в JSON файл')
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    report = asyncio.run(main_async(args))
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+    return report
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,126 @@
+"""Сравнение движка повторений с перебором dateutil.rrule.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.recurrence_bench --rules 2000 --json recurrence_bench.json
+
+Для каждого вида правила создаются напоминания с первым повторением от месяца до
+трех лет назад и вычисляется следующее повторение после текущего момента, а также
+все повторения на ближайшую неделю. dateutil перебирает повторения от dtstart,
+движок вычисляет ответ арифметикой. Результаты обоих сверяются.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from dateutil import rrule as dateutil_rrule
+
+from recurrence import EPSILON, Recurrence
+
+RULES = {
+    'hourly_2': 'FREQ=HOURLY;INTERVAL=2',
+    'daily': 'daily',
+    'weekdays': 'FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR',
+    'biweekly_tu_th': 'FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH',
+    'monthly': 'monthly',
+    'last_friday': 'FREQ=MONTHLY;BYDAY=-1FR',
+    'monthday_15_last': 'FREQ=MONTHLY;BYMONTHDAY=15,-1',
+    'yearly': 'yearly',
+}
+
+DATEUTIL_FREQS = {
+    'MINUTELY': dateutil_rrule.MINUTELY, 'HOURLY': dateutil_rrule.HOURLY, 'DAILY': dateutil_rrule.DAILY,
+    'WEEKLY': dateutil_rrule.WEEKLY, 'MONTHLY': dateutil_rrule.MONTHLY, 'YEARLY': dateutil_rrule.YEARLY,
+}
+DATEUTIL_WEEKDAYS = [dateutil_rrule.MO, dateutil_rrule.TU, dateutil_rrule.WE, dateutil_rrule.TH,
+                     dateutil_rrule.FR, dateutil_rrule.SA, dateutil_rrule.SU]
+
+
+def to_dateutil(rule, start):
+    """То же правило для dateutil (без кеша, как при разовом вычислении)"""
+    byweekday = [DATEUTIL_WEEKDAYS[day](ordinal) if ordinal else DATEUTIL_WEEKDAYS[day]
+                 for ordinal, day in rule.byday] or None
+    return dateutil_rrule.rrule(
+        DATEUTIL_FREQS[rule.freq], dtstart=start, interval=rule.interval,
+        byweekday=byweekday, bymonthday=list(rule.bymonthday) or None, bysetpos=list(rule.bysetpos) or None
+    )
+
+
+def make_starts(count, now, rng):
+    # День месяца до 28: у dateutil 31 число пропускает короткие месяцы, у движка - последний день месяца
+    starts = []
+    for _ in range(count):
+        start = now - timedelta(days=rng.randint(30, 3 * 365))
+        starts.append(start.replace(day=rng.randint(1, 28), hour=rng.randint(0, 23),
+                                    minute=rng.choice((0, 15, 30, 45)), second=0, microsecond=0))
+    return starts
+
+
+def timed(func, items):
+    started = time.perf_counter()
+    results = [func(item) for item in items]
+    return results, time.perf_counter() - started
+
+
+def run_rule(name, text, starts, now, horizon):
+    rule = Recurrence.parse(text)
+    end = now + horizon
+
+    engine_next, engine_next_s = timed(lambda start: rule.next_after(start, now), starts)
+    naive_next, naive_next_s = timed(lambda start: to_dateutil(rule, start).after(now), starts)
+    engine_range, engine_range_s = timed(lambda start: rule.between(start, now, end), starts)
+    naive_range, naive_range_s = timed(
+        lambda start: [moment for moment in to_dateutil(rule, start).between(now - EPSILON, end, inc=True)
+                       if moment < end], starts
+    )
+
+    count = len(starts)
+    return {
+        'rule': str(rule),
+        'next_us': {'engine': round(engine_next_s / count * 1e6, 2), 'dateutil': round(naive_next_s / count * 1e6, 2)},
+        'next_speedup': round(naive_next_s / engine_next_s, 1) if engine_next_s else None,
+        'range_us': {'engine': round(engine_range_s / count * 1e6, 2), 'dateutil': round(naive_range_s / count * 1e6, 2)},
+        'range_speedup': round(naive_range_s / engine_range_s, 1) if engine_range_s else None,
+        'occurrences_in_range': sum(len(moments) for moments in engine_range),
+        'mismatches': sum(a != b for a, b in zip(engine_next, naive_next))
+        + sum(a != b for a, b in zip(engine_range, naive_range)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Сравнение движка повторений и dateutil.rrule')
+    parser.add_argument('--rules', type=int, default=2000, help='число напоминаний на каждый вид правила')
+    parser.add_argument('--horizon-days', type=int, default=7, help='диапазон развертки повторений')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_path', help='сохранить отчет в JSON файл')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    starts = make_starts(args.rules, now, rng)
+
+    results = {}
+    for name, text in RULES.items():
+        print(f"{name}: {args.rules} rules...", file=sys.stderr)
+        results[name] = run_rule(name, text, starts, now, timedelta(days=args.horizon_days))
+
+    report = {
+        'generated_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'params': vars(args),
+        'results': results,
+        'mismatches': sum(result['mismatches'] for result in results.values()),
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+    return report['mismatches'] == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,184 @@
+"""Сравнение хранилищ запланированных напоминаний: APScheduler и колесо таймеров.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.scheduler_bench --sizes 100000,1000000 --json scheduler_bench.json
+
+Для каждого размера в планировщик добавляются напоминания со сроками в ближайшие
+30 дней так же, как это делает ReminderScheduler.add_reminder, затем отменяется
+часть из них. Память измеряется tracemalloc отдельным проходом, чтобы трассировка
+не влияла на время.
+"""
+import argparse
+import gc
+import json
+import logging
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from scheduler import FirePointsTrigger
+from timer_wheel import TimerWheelThread, to_second
+
+BACKENDS = ('apscheduler', 'wheel')
+
+
+def noop(*args):
+    pass
+
+
+def make_dues(size, rng):
+    now = datetime.utcnow()
+    return [now + timedelta(seconds=rng.randint(60, 30 * 86400)) for _ in range(size)]
+
+
+class APSchedulerBackend:
+    """Задача на напоминание, как во встроенном режиме по умолчанию"""
+
+    def __init__(self):
+        self.scheduler = BackgroundScheduler()
+        # Запуск на паузе: задачи попадают в хранилище, но не выполняются
+        self.scheduler.start(paused=True)
+
+    def add(self, reminder_id, due):
+        points = [(due, None)]
+        self.scheduler.add_job(
+            noop, FirePointsTrigger([due], self.scheduler.timezone), id=str(reminder_id),
+            args=[reminder_id, 'Текст напоминания', reminder_id, points], replace_existing=True
+        )
+
+    def cancel(self, reminder_id):
+        if self.scheduler.get_job(str(reminder_id)):
+            self.scheduler.remove_job(str(reminder_id))
+
+    def expire_all(self, until):
+        return None
+
+    def close(self):
+        self.scheduler.shutdown(wait=False)
+
+
+class WheelBackend:
+    """Колесо таймеров (SCHEDULER_BACKEND=wheel); поток не запускается, сдвиг выполняется вручную"""
+
+    def __init__(self):
+        self.timers = TimerWheelThread(noop)
+
+    def add(self, reminder_id, due):
+        self.timers.add(reminder_id, due)
+
+    def cancel(self, reminder_id):
+        self.timers.cancel(reminder_id)
+
+    def expire_all(self, until):
+        return len(self.timers.wheel.advance(to_second(until)))
+
+    def close(self):
+        self.timers._executor.shutdown(wait=False)
+
+
+def create_backend(name):
+    return APSchedulerBackend() if name == 'apscheduler' else WheelBackend()
+
+
+def rate(count, elapsed):
+    return round(count / elapsed, 1) if elapsed else 0.0
+
+
+def run_timing(name, dues, cancel_ids):
+    backend = create_backend(name)
+    gc.collect()
+
+    started = time.perf_counter()
+    for reminder_id, due in enumerate(dues):
+        backend.add(reminder_id, due)
+    add_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for reminder_id in cancel_ids:
+        backend.cancel(reminder_id)
+    cancel_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    expired = backend.expire_all(max(dues) + timedelta(seconds=1))
+    expire_elapsed = time.perf_counter() - started
+    backend.close()
+
+    result = {
+        'add_per_s': rate(len(dues), add_elapsed),
+        'add_us': round(add_elapsed / len(dues) * 1e6, 2),
+        'cancel_per_s': rate(len(cancel_ids), cancel_elapsed),
+        'cancel_us': round(cancel_elapsed / len(cancel_ids) * 1e6, 2) if cancel_ids else 0.0,
+    }
+    if expired is not None:
+        result['expired'] = expired
+        result['expire_per_s'] = rate(expired, expire_elapsed)
+    return result
+
+
+def run_memory(name, dues):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    backend = create_backend(name)
+    for reminder_id, due in enumerate(dues):
+        backend.add(reminder_id, due)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    backend.close()
+    return {'memory_mb': round(used / 1024 / 1024, 1), 'bytes_per_entry': round(used / len(dues))}
+
+
+def run_size(size, backends, cancel_share, memory, rng):
+    dues = make_dues(size, rng)
+    cancel_ids = rng.sample(range(size), int(size * cancel_share))
+    result = {'entries': size, 'cancelled': len(cancel_ids)}
+    for name in backends:
+        print(f"{name}: {size} entries...", file=sys.stderr)
+        result[name] = run_timing(name, dues, cancel_ids)
+        if memory:
+            result[name].update(run_memory(name, dues))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Сравнение APScheduler и колеса таймеров')
+    parser.add_argument('--sizes', default='100000,1000000', help='число напоминаний через запятую')
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--cancel-share', type=float, default=0.1, help='доля отменяемых напоминаний')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='не измерять память')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_path', help='сохранить отчет в JSON файл')
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.disable(logging.INFO)
+    rng = random.Random(args.seed)
+
+    backends = [name for name in args.backends.split(',') if name in BACKENDS]
+    report = {
+        'generated_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'params': vars(args),
+        'results': [
+            run_size(int(size), backends, args.cancel_share, args.memory, rng)
+            for size in args.sizes.split(',') if size
+        ],
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+    return report
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,148 @@
+"""Соединения с Bot API: переиспользование и задержка при разных настройках транспорта.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.transport_bench --rounds 4 --gap 6 --burst 100 --json transport_bench.json
+
+Локальная заглушка Bot API отвечает на sendMessage через --latency мс, а каждое новое
+соединение принимает с задержкой --connect-delay мс (как TCP и TLS рукопожатие до
+api.telegram.org). Пачки по --burst отправок идут раз в --gap секунд, как срабатывания
+напоминаний в соседние минуты. Для каждой конфигурации "пул:keep-alive" из --configs
+сравниваются открытые соединения, доля переиспользования и задержка отправки. Значение
+5 секунд для keep-alive - умолчание httpx, с которым работал бот до настройки транспорта.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sys
+import time
+from datetime import datetime
+
+from telegram import Bot
+
+from transport import BotApiRequest
+
+RESPONSE = json.dumps({'ok': True, 'result': {
+    'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'}, 'text': 'ok',
+}}).encode()
+
+
+class FakeBotApi:
+    """HTTP/1.1 сервер с keep-alive, отвечающий на любой запрос успешным sendMessage"""
+
+    def __init__(self, latency, connect_delay):
+        self.latency = latency
+        self.connect_delay = connect_delay
+
+    async def serve(self, ports):
+        server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        ports.put(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        await asyncio.sleep(self.connect_delay)
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                length = 0
+                for line in head.split(b'\r\n'):
+                    if line.lower().startswith(b'content-length:'):
+                        length = int(line.split(b':', 1)[1])
+                await reader.readexactly(length)
+                await asyncio.sleep(self.latency)
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    b'Content-Length: %d\r\n\r\n' % len(RESPONSE) + RESPONSE
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def run_fake_api(latency, connect_delay, ports):
+    """Заглушка в отдельном процессе, чтобы ее работа не попадала в задержку клиента"""
+    asyncio.run(FakeBotApi(latency, connect_delay).serve(ports))
+
+
+async def run_config(port, pool_size, keepalive, args):
+    request = BotApiRequest('send', pool_size, keepalive=keepalive)
+    bot = Bot('123456:BENCH', base_url=f'http://127.0.0.1:{port}/bot', request=request)
+    await request.initialize()
+    latencies = []
+
+    async def send(index):
+        started = time.perf_counter()
+        await bot.send_message(chat_id=index, text='⏰ Напоминание')
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    try:
+        for round_index in range(args.rounds):
+            if round_index:
+                await asyncio.sleep(args.gap)
+            await asyncio.gather(*(send(index) for index in range(args.burst)))
+    finally:
+        await request.shutdown()
+
+    latencies.sort()
+    stats = request.metrics.summary()
+    return {
+        'pool_size': pool_size,
+        'keepalive_s': keepalive,
+        'requests': stats['requests'],
+        'connections': stats['connections'],
+        'reuse': stats['reuse'],
+        'send_p50_ms': round(latencies[len(latencies) // 2], 1),
+        'send_p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+    }
+
+
+async def main_async(args):
+    ports = multiprocessing.Queue()
+    api = multiprocessing.Process(
+        target=run_fake_api, args=(args.latency / 1000, args.connect_delay / 1000, ports), daemon=True
+    )
+    api.start()
+    port = ports.get(timeout=30)
+    results = []
+    try:
+        for config in args.configs.split(','):
+            if config:
+                pool_size, keepalive = config.split(':')
+                print(f"pool {pool_size}, keep-alive {keepalive}s...", file=sys.stderr)
+                results.append(await run_config(port, int(pool_size), float(keepalive), args))
+    finally:
+        api.terminate()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Переиспользование соединений с Bot API')
+    parser.add_argument('--configs', default='64:5,64:60,8:60', help='пул:keep-alive через запятую')
+    parser.add_argument('--rounds', type=int, default=4, help='число пачек отправок')
+    parser.add_argument('--gap', type=float, default=6, help='пауза между пачками, секунд')
+    parser.add_argument('--burst', type=int, default=100, help='отправок в пачке')
+    parser.add_argument('--latency', type=float, default=20, help='время ответа заглушки, мс')
+    parser.add_argument('--connect-delay', type=float, default=100, help='задержка нового соединения, мс')
+    parser.add_argument('--json', dest='json_path', help='сохранить отчет в JSON файл')
+    args = parser.parse_args(argv)
+
+    report = {
+        'generated_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'params': vars(args),
+        'results': asyncio.run(main_async(args)),
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+    return all(result['requests'] == args.rounds * args.burst for result in report['results'])
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,133 @@
+"""Проверка режима webhook: синтетические обновления отправляются POST запросами.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.webhook_load --users 200 --concurrency 50 --concurrent-updates 8
+
+Бот поднимает встроенный webhook сервер на localhost, Bot API подменяется
+FakeTelegramRequest, так что настоящий токен не нужен.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import socket
+import sys
+import time
+
+import httpx
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from benchmarks.load_test import (
+    FakeTelegramRequest, UpdateFactory, creation_flow, latency_summary
+)
+from bot import ImprovedReminderBot
+from config import Config
+from scheduler import ReminderScheduler
+
+SECRET = 'webhook-load-secret'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def main_async(args):
+    Config.CONCURRENT_UPDATES = args.concurrent_updates
+    port = free_port()
+    request = FakeTelegramRequest(latency=args.api_latency / 1000)
+    bot = ImprovedReminderBot(request=request)
+    application = bot.application
+    factory = UpdateFactory(application.bot)
+
+    posted_at = {}
+    processed_at = {}
+
+    async def record_processed(update, context):
+        processed_at[update.update_id] = time.perf_counter()
+
+    # Группа после основных обработчиков: срабатывает, когда обновление обработано
+    application.add_handler(TypeHandler(Update, record_processed), group=99)
+
+    await application.initialize()
+    bot.scheduler = ReminderScheduler(application.bot, loop=asyncio.get_running_loop())
+    await application.updater.start_webhook(
+        listen='127.0.0.1', port=port, url_path='webhook', secret_token=SECRET
+    )
+    await application.start()
+    url = f'http://127.0.0.1:{port}/webhook'
+
+    post_latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    flows = [creation_flow(factory, 3_000_000 + i, i) for i in range(args.users)]
+    total = sum(len(flow) for flow in flows)
+
+    async with httpx.AsyncClient(headers={'X-Telegram-Bot-Api-Secret-Token': SECRET}) as client:
+        rejected = await client.post(url, content=b'{}', headers={'X-Telegram-Bot-Api-Secret-Token': 'wrong'})
+
+        async def post_user(flow):
+            async with semaphore:
+                for _, update in flow:
+                    payload = json.dumps(update.to_dict()).encode('utf-8')
+                    started = time.perf_counter()
+                    posted_at[update.update_id] = started
+                    response = await client.post(url, content=payload, headers={'Content-Type': 'application/json'})
+                    response.raise_for_status()
+                    post_latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(*(post_user(flow) for flow in flows))
+            deadline = time.perf_counter() + 60
+            while len(processed_at) < total and time.perf_counter() < deadline:
+                await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+
+    await application.updater.stop()
+    await application.stop()
+    bot.scheduler.shutdown()
+    await application.shutdown()
+
+    end_to_end = [processed_at[uid] - posted_at[uid] for uid in processed_at if uid in posted_at]
+    return {
+        'params': vars(args),
+        'updates': total,
+        'processed': len(processed_at),
+        'elapsed_s': round(elapsed, 3),
+        'updates_per_s': round(len(processed_at) / elapsed, 1) if elapsed else 0.0,
+        'wrong_secret_status': rejected.status_code,
+        'post_latency': latency_summary(post_latencies),
+        'end_to_end_latency': latency_summary(end_to_end),
+        'api_calls': dict(request.calls),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Нагрузочный тест режима webhook')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=20, help='одновременных POST запросов')
+    parser.add_argument('--concurrent-updates', type=int, default=1,
+                        help='сколько обновлений бот обрабатывает одновременно')
+    parser.add_argument('--api-latency', type=float, default=0.0,
+                        help='искусственная задержка ответа Bot API, мс')
+    parser.add_argument('--json', dest='json_path', help='сохранить отчет в JSON файл')
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    report = asyncio.run(main_async(args))
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+    return report
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -1,18 +1,34 @@
+import time
+
+# Отсчет времени запуска ведется с самого начала, до тяжелых импортов
+_STARTED = time.perf_counter()
+
 import os
+import asyncio
 import logging
 import sqlite3
+import tempfile
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram import (
+    Update, InlineKeyboardMarkup, InlineKeyboardButton, InlineQueryResultArticle, InputTextMessageContent
+)
 from telegram.ext import (
-    Application, CommandHandler, MessageHandler, CallbackQueryHandler,
+    Application, CommandHandler, MessageHandler, CallbackQueryHandler, InlineQueryHandler,
     filters, ContextTypes, ConversationHandler
 )
 
 from config import Config
-from database import Database
-from scheduler import ReminderScheduler
+import agenda
+from broadcast import Broadcast
+from bulk_io import ImportInterrupted, ImportRowError, detect_format, export_reminders, parse_reminders
+from conversation_store import create_persistence
+import forecast
 from keyboards import Keyboards
+import recurrence
+from storage import create_database
+from transport import create_request
+from update_processor import PerUserUpdateProcessor
 from utils import TimeParser, TextFormatter
 
 # Загрузка переменных окружения
@@ -29,14 +45,50 @@ logging.basicConfig(
 )
 
 class ImprovedReminderBot:
-    def __init__(self):
+    def __init__(self, request=None):
         self.token = Config.BOT_TOKEN
-        self.db = Database()
-        self.application = Application.builder().token(self.token).build()
+        # Длительность этапов запуска, мс (выводится в лог после инициализации)
+        self.startup_timings = {'imports': (time.perf_counter() - _STARTED) * 1000}
+        self.db = self.timed('database', create_database)
+        
+        phase_started = time.perf_counter()
+        builder = Application.builder().token(self.token)
+        if Config.CONCURRENT_UPDATES > 1:
+            # Разные пользователи обрабатываются параллельно, обновления одного - по очереди
+            builder = builder.concurrent_updates(PerUserUpdateProcessor(Config.CONCURRENT_UPDATES))
+        self.transports = []
+        if request is not None:
+            # Подменный транспорт Bot API (используется в нагрузочных тестах)
+            builder = builder.request(request)
+        else:
+            # Отдельные пулы: долгий getUpdates не занимает соединения, через которые идет отправка
+            self.transports = [
+                create_request('send', Config.BOT_API_POOL_SIZE),
+                create_request('polling', Config.BOT_API_POLLING_POOL_SIZE),
+            ]
+            builder = builder.request(self.transports[0]).get_updates_request(self.transports[1])
+        persistence = create_persistence(self.db)
+        if persistence is not None:
+            # Состояние пошагового создания напоминаний переживает перезапуск
+            builder = builder.persistence(persistence)
+        builder = builder.post_init(self.post_init).post_stop(self.post_stop)
+        self.application = builder.build()
         self.scheduler = None
+        self._sweeper_task = None
+        self._metrics_task = None
+        self._broadcasts = {}  # id рассылки -> задача
         
         # Регистрация обработчиков
         self.register_handlers()
+        self.startup_timings['application'] = (time.perf_counter() - phase_started) * 1000
+
+    def timed(self, phase, func, *args, **kwargs):
+        """Вызов func с записью длительности в startup_timings"""
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.startup_timings[phase] = (time.perf_counter() - started) * 1000
 
     def register_handlers(self):
         """Регистрация всех обработчиков команд"""
@@ -48,26 +100,135 @@ class ImprovedReminderBot:
         self.application.add_handler(CommandHandler("my_info", self.my_info_command))
         self.application.add_handler(CommandHandler("cancel", self.cancel_command))
         self.application.add_handler(CommandHandler("debug", self.debug_reminders))
+        self.application.add_handler(CommandHandler("import", self.import_command))
+        self.application.add_handler(CommandHandler("export", self.export_command))
+        self.application.add_handler(CommandHandler("agenda", self.agenda_command))
+        self.application.add_handler(CommandHandler("find", self.find_command))
+        self.application.add_handler(InlineQueryHandler(self.inline_search))
         
         # Команды управления бэкапами (только для администраторов)
         self.application.add_handler(CommandHandler("backup", self.backup_command))
         self.application.add_handler(CommandHandler("backups", self.backups_list_command))
         self.application.add_handler(CommandHandler("restore", self.restore_command))
         self.application.add_handler(CommandHandler("dbinfo", self.db_info_command))
+        self.application.add_handler(CommandHandler("forecast", self.forecast_command))
+        self.application.add_handler(CommandHandler("broadcast", self.broadcast_command))
+        self.application.add_handler(CommandHandler("broadcast_cancel", self.broadcast_cancel_command))
         
         # Обработчик всех callback
         self.application.add_handler(CallbackQueryHandler(self.handle_callback))
         
         # Обработчик сообщений
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        self.application.add_handler(MessageHandler(filters.Document.ALL, self.handle_document))
 
     def run(self):
         """Запуск бота"""
-        # Инициализация планировщика после создания application
-        self.scheduler = ReminderScheduler(self.application.bot)
+        if Config.DELIVERY_MODE == 'workers':
+            # Напоминания отправляют отдельные процессы workers.py; модуль планировщика
+            # импортируется здесь, чтобы не задерживать импорт bot.py
+            from scheduler import PassiveScheduler
+            self.scheduler = self.timed('scheduler', PassiveScheduler)
         
         print("Улучшенный бот запущен! Нажми Ctrl+C для остановки")
-        self.application.run_polling()
+        if Config.BOT_MODE == 'webhook':
+            self.application.run_webhook(**self.webhook_settings())
+        else:
+            self.application.run_polling()
+
+    async def post_init(self, application):
+        """Запуск планировщика и фоновых задач после инициализации приложения"""
+        if self.scheduler is None:
+            # Отправка идет в цикле событий приложения: тем же ботом и через уже прогретые
+            # соединения пула. Напоминания загружаются в планировщик в фоне, бот сразу
+            # принимает обновления
+            from scheduler import ReminderScheduler
+            self.scheduler = self.timed(
+                'scheduler', ReminderScheduler, application.bot, db=self.db, loop=asyncio.get_running_loop()
+            )
+        self._sweeper_task = asyncio.create_task(self.expire_conversations())
+        if self.transports and Config.BOT_API_METRICS_INTERVAL > 0:
+            self._metrics_task = asyncio.create_task(self.log_transport_metrics())
+        self.startup_timings['total'] = (time.perf_counter() - _STARTED) * 1000
+        logging.info("Startup timing: " + ", ".join(
+            f"{phase} {elapsed:.0f} ms" for phase, elapsed in self.startup_timings.items()
+        ))
+        # Рассылки, прерванные остановкой бота, продолжаются с сохраненного места
+        for broadcast_id in self.db.get_running_broadcasts():
+            self.start_broadcast(broadcast_id)
+
+    async def post_stop(self, application):
+        """Остановка фоновых задач"""
+        if self._sweeper_task:
+            self._sweeper_task.cancel()
+        if self._metrics_task:
+            self._metrics_task.cancel()
+        for task in self._broadcasts.values():
+            task.cancel()
+        # Цикл приложения сейчас закроется: задачи планировщика больше не должны передавать
+        # в него отправку, а незаконченный проход по пропущенным напоминаниям отменяется
+        if self.scheduler is not None:
+            self.scheduler.shutdown(wait=False)
+
+    def start_broadcast(self, broadcast_id):
+        """Запуск рассылки фоновой задачей"""
+        pause_user = getattr(self.scheduler, 'pause_user', None)
+        task = asyncio.create_task(Broadcast(self.application.bot, self.db, broadcast_id, pause_user=pause_user).run())
+        self._broadcasts[broadcast_id] = task
+        task.add_done_callback(lambda done: self.finish_broadcast(broadcast_id, done))
+
+    def finish_broadcast(self, broadcast_id, task):
+        """Завершение задачи рассылки: ошибка пишется в лог, иначе она пропала бы вместе с задачей"""
+        self._broadcasts.pop(broadcast_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f"Broadcast {broadcast_id} failed: {task.exception()!r}")
+
+    async def expire_conversations(self):
+        """Периодическая очистка брошенных диалогов"""
+        while True:
+            await asyncio.sleep(Config.CONVERSATION_SWEEP_INTERVAL)
+            try:
+                self.sweep_conversations()
+            except Exception as e:
+                logging.error(f"Error expiring conversations: {e}")
+
+    async def log_transport_metrics(self):
+        """Периодическая запись метрик соединений с Bot API в лог"""
+        while True:
+            await asyncio.sleep(Config.BOT_API_METRICS_INTERVAL)
+            for transport in self.transports:
+                logging.info(f"Bot API {transport.metrics.format()}")
+
+    def sweep_conversations(self):
+        """Удаление из памяти пустых и брошенных по TTL диалогов"""
+        deadline = datetime.utcnow() - timedelta(seconds=Config.CONVERSATION_TTL)
+        # Данные живут по последней отметке: начало создания напоминания или последний /find
+        expired = [
+            user_id for user_id, data in self.application.user_data.items()
+            if not data or max((data[key] for key in ('started_at', 'searched_at') if key in data),
+                               default=deadline) <= deadline
+        ]
+        for user_id in expired:
+            self.application.drop_user_data(user_id)
+        
+        stored_expired = 0
+        if self.application.persistence:
+            stored_expired = self.application.persistence.expire()
+        logging.info(f"Expired {len(expired)} conversations in memory, {stored_expired} in storage")
+
+    def webhook_settings(self):
+        """Параметры встроенного HTTP сервера для режима webhook"""
+        if not Config.WEBHOOK_SECRET:
+            logging.warning("WEBHOOK_SECRET is not set, webhook requests are not authenticated")
+        
+        return {
+            'listen': Config.WEBHOOK_LISTEN,
+            'port': Config.WEBHOOK_PORT,
+            'url_path': Config.WEBHOOK_PATH,
+            'webhook_url': Config.WEBHOOK_URL,
+            'secret_token': Config.WEBHOOK_SECRET,
+            'max_connections': Config.WEBHOOK_MAX_CONNECTIONS,
+        }
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /start"""
@@ -81,6 +242,8 @@ class ImprovedReminderBot:
             first_name=user.first_name,
             last_name=user.last_name
         )
+        # Пользователь мог заблокировать бота: его приостановленные напоминания возобновляются
+        resumed = self.resume_user_reminders(user_id)
         
         welcome_text = f"""
 Привет, {user.first_name}! 👋
@@ -105,6 +268,32 @@ class ImprovedReminderBot:
             reply_markup=Keyboards.main_menu(),
             parse_mode='Markdown'
         )
+        if resumed:
+            await update.message.reply_text(f"▶️ С возвращением! Возобновлено напоминаний: {resumed}")
+
+    def touch_user(self, user_id):
+        """Отметка активности пользователя при любом входящем обновлении.
+        
+        Разблокировавший бота пользователь может писать без /start: он снова получает рассылки,
+        а его приостановленные напоминания возобновляются (для активного - один UPDATE без изменений).
+        """
+        self.db.add_or_update_user(user_id)
+        return self.resume_user_reminders(user_id)
+
+    def resume_user_reminders(self, user_id):
+        """Возобновление напоминаний, приостановленных после блокировки бота; возвращает их число.
+        
+        Будущие ставятся в планировщик, уже наступившие доставит сводка пропущенных.
+        """
+        resumed = self.db.reactivate_user(user_id)
+        now = datetime.utcnow()
+        for rem_id, _, text, reminder_time_str, _, notify_before, notify_offsets in resumed:
+            reminder_time = TimeParser.parse_db_time(reminder_time_str)
+            if reminder_time > now:
+                self.scheduler.add_reminder(
+                    user_id, text, reminder_time, rem_id, TimeParser.parse_notify_offsets(notify_before, notify_offsets)
+                )
+        return len(resumed)
 
     async def my_info_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать информацию о пользователе"""
@@ -153,11 +342,21 @@ class ImprovedReminderBot:
 
 *🔄 Повторяющиеся напоминания:*
 - Ежедневные, еженедельные, ежемесячные
+- Свои правила: по будням, каждые 2 часа, в последнюю пятницу месяца
 - Автоматически создаются заново
+- /agenda [дней] - что запланировано на ближайшие дни
+
+*🔎 Поиск:*
+- /find слова - найти напоминания по тексту
+- Или в любом чате: @имя\\_бота слова
 
 *🔔 Уведомления заранее:*
 - Получи уведомление за 15, 30, 60 минут до события
 
+*📥 Импорт и экспорт:*
+- Отправь файл .csv, .jsonl или .ics - подробнее /import
+- /export - выгрузить напоминания в файл
+
 *📊 Статистика:*
 - Отслеживай выполненные и активные напоминания
 - Статистика по категориям
@@ -175,7 +374,7 @@ class ImprovedReminderBot:
         user_id = update.message.from_user.id
         
         # Обновляем активность пользователя
-        self.db.add_or_update_user(user_id)
+        self.touch_user(user_id)
         
         stats = self.db.get_user_stats(user_id)
         
@@ -192,14 +391,14 @@ class ImprovedReminderBot:
         """Показать напоминания пользователя"""
         user_id = update.message.from_user.id
         # Обновляем активность пользователя
-        self.db.add_or_update_user(user_id)
+        self.touch_user(user_id)
         await self.show_reminders_list(update)
 
     async def cancel_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /cancel"""
         user_id = update.message.from_user.id
         # Обновляем активность пользователя
-        self.db.add_or_update_user(user_id)
+        self.touch_user(user_id)
         
         if context.user_data.get('reminder_state'):
             context.user_data.clear()
@@ -325,27 +524,316 @@ class ImprovedReminderBot:
             await update.message.reply_text("❌ Эта команда доступна только администраторам.")
             return
         
-        total_reminders = self.db.get_total_reminders_count()
-        total_users = self.db.get_total_users_count()
+        # Счетчики берутся из global_counters (с кэшем), без COUNT(*) по таблицам
+        counters = self.db.get_counters()
         db_size = os.path.getsize(Config.DB_PATH) // 1024 if os.path.exists(Config.DB_PATH) else 0
         
         text = (
             f"📊 Информация о базе данных:\n\n"
+            f"🗃 Хранилище: {Config.STORAGE_BACKEND}\n"
             f"📁 Путь: {Config.DB_PATH}\n"
             f"📊 Размер: {db_size} KB\n"
-            f"📝 Всего напоминаний: {total_reminders}\n"
-            f"👥 Всего пользователей: {total_users}\n"
+            f"📝 Всего напоминаний: {counters['reminders']}\n"
+            f"🗄 Из них в архиве: {counters['archived']}\n"
+            f"👥 Всего пользователей: {counters['users']}\n"
             f"💾 Директория бэкапов: {Config.BACKUP_DIR}\n"
             f"🕒 Часовой пояс: {Config.TIMEZONE}"
         )
         
+        if self.transports:
+            text += "\n\n🌐 Bot API:"
+            for transport in self.transports:
+                stats = transport.metrics.summary()
+                text += (
+                    f"\n• {transport.metrics.name}: {stats['requests']} запросов, "
+                    f"новых соединений {stats['connections']} ({stats['reuse']:.0%} повторно), "
+                    f"p50 {stats['p50_ms']:.0f} мс, p95 {stats['p95_ms']:.0f} мс, ошибок {stats['failures']}"
+                )
+        
+        maintenance_log = self.db.get_maintenance_log()
+        if maintenance_log:
+            text += "\n\n🛠 Обслуживание:"
+            for task, (last_run, duration_ms, result) in sorted(maintenance_log.items()):
+                moscow_time = TimeParser.parse_db_time(last_run) + timedelta(hours=3)
+                text += f"\n• {task}: {moscow_time.strftime('%d.%m %H:%M')}, {duration_ms} мс - {result}"
+        
         await update.message.reply_text(text)
 
+    async def forecast_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Прогноз нагрузки: срабатывания по минутам на ближайшие часы: /forecast [часов]"""
+        user_id = update.message.from_user.id
+        
+        # Проверяем права администратора
+        if user_id not in Config.ADMIN_IDS:
+            await update.message.reply_text("❌ Эта команда доступна только администраторам.")
+            return
+        
+        try:
+            hours = int(context.args[0]) if context.args else min(24, Config.FORECAST_HOURS)
+        except ValueError:
+            hours = 0
+        if not 1 <= hours <= Config.FORECAST_HOURS:
+            await update.message.reply_text(f"Использование: /forecast [часов от 1 до {Config.FORECAST_HOURS}]")
+            return
+        
+        # Гистограмма уже посчитана и поддерживается при изменении напоминаний, таблица не перебирается
+        now = datetime.utcnow()
+        buckets = self.db.get_load_forecast(now, now + timedelta(hours=hours))
+        await update.message.reply_text(forecast.format_forecast(buckets, hours))
+
+    async def broadcast_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Рассылка сообщения всем пользователям: /broadcast текст"""
+        user_id = update.message.from_user.id
+        
+        # Проверяем права администратора
+        if user_id not in Config.ADMIN_IDS:
+            await update.message.reply_text("❌ Эта команда доступна только администраторам.")
+            return
+        
+        text = update.message.text.partition(' ')[2].strip()
+        if not text:
+            await update.message.reply_text("Использование: /broadcast текст сообщения")
+            return
+        
+        broadcast_id = self.db.create_broadcast(user_id, text)
+        self.start_broadcast(broadcast_id)
+        await update.message.reply_text(
+            f"📣 Рассылка #{broadcast_id} запущена. Прогресс будет обновляться в отдельном сообщении.\n"
+            f"Отменить: /broadcast_cancel {broadcast_id}"
+        )
+
+    async def broadcast_cancel_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Отмена рассылки: /broadcast_cancel id"""
+        user_id = update.message.from_user.id
+        
+        # Проверяем права администратора
+        if user_id not in Config.ADMIN_IDS:
+            await update.message.reply_text("❌ Эта команда доступна только администраторам.")
+            return
+        
+        if not context.args or not context.args[0].isdigit():
+            await update.message.reply_text("Использование: /broadcast_cancel id")
+            return
+        
+        broadcast_id = int(context.args[0])
+        broadcast = self.db.get_broadcast(broadcast_id)
+        if broadcast is None or broadcast[3] != 'running':
+            await update.message.reply_text("❌ Активная рассылка с таким номером не найдена.")
+            return
+        
+        self.db.update_broadcast(broadcast_id, status='cancelled')
+        task = self._broadcasts.get(broadcast_id)
+        if task:
+            task.cancel()
+        await update.message.reply_text(
+            f"🛑 Рассылка #{broadcast_id} отменена."
+        )
+
+    async def import_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Подсказка по импорту напоминаний из файла"""
+        await update.message.reply_text(
+            "📥 Импорт напоминаний\n\n"
+            "Отправь файл .csv, .jsonl или .ics.\n\n"
+            "CSV - колонки text,time,category,repeat,notify_before\n"
+            "JSONL - по объекту на строку с теми же полями\n"
+            "ICS - события календаря (SUMMARY, DTSTART, RRULE, VALARM)\n\n"
+            "Время: 'завтра в 15:00', '25.12.2024 в 10:00' или '2024-12-25 10:00' (по Москве)."
+        )
+
+    async def handle_document(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Импорт напоминаний из присланного файла"""
+        user_id = update.message.from_user.id
+        self.touch_user(user_id)
+        document = update.message.document
+        fmt = detect_format(document.file_name)
+        
+        if not fmt:
+            await update.message.reply_text("❌ Поддерживаются только файлы .csv, .jsonl и .ics. Подробнее: /import")
+            return
+        if document.file_size and document.file_size > Config.IMPORT_MAX_BYTES:
+            await update.message.reply_text(f"❌ Файл больше {Config.IMPORT_MAX_BYTES // 1024} KB.")
+            return
+        
+        await update.message.reply_text("🔄 Импортирую напоминания...")
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'import')
+            telegram_file = await document.get_file()
+            await telegram_file.download_to_drive(path)
+            # Разбор и запись в базу не должны блокировать обработку других обновлений
+            try:
+                imported, errors = await asyncio.get_running_loop().run_in_executor(
+                    None, self.import_reminders, user_id, path, fmt
+                )
+            except UnicodeDecodeError:
+                await update.message.reply_text("❌ Не могу прочитать файл: сохраните его в кодировке UTF-8.")
+                return
+            except ImportInterrupted as e:
+                logging.error(f"Error importing reminders for user {user_id}: {e}")
+                await update.message.reply_text(
+                    f"❌ Импорт прерван ошибкой. Уже импортировано напоминаний: {e.imported}.\n"
+                    "Перед повторной загрузкой удалите из файла первые импортированные строки, "
+                    "иначе они появятся дважды."
+                )
+                return
+            except Exception as e:
+                logging.error(f"Error importing reminders for user {user_id}: {e}")
+                await update.message.reply_text("❌ Ошибка при импорте напоминаний.")
+                return
+        
+        text = f"✅ Импортировано напоминаний: {imported}"
+        if errors:
+            text += f"\n⚠️ Пропущено строк: {len(errors)}\n\n" + "\n".join(errors[:10])
+            if len(errors) > 10:
+                text += f"\n... и еще {len(errors) - 10}"
+        await update.message.reply_text(text, reply_markup=Keyboards.main_menu())
+
+    def import_reminders(self, user_id, path, fmt):
+        """Потоковый импорт файла пачками; возвращает (число импортированных, ошибки).
+        
+        Сначала файл целиком читается и разбирается без записи: ошибка кодировки или формата
+        не оставит в базе часть напоминаний. Если запись прерывается позже, ImportInterrupted
+        сообщает, сколько напоминаний уже импортировано.
+        """
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            for _ in parse_reminders(f, fmt):
+                pass
+        
+        imported, errors, batch = 0, [], []
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as f:
+                for item in parse_reminders(f, fmt):
+                    if isinstance(item, ImportRowError):
+                        errors.append(str(item))
+                        continue
+                    if imported + len(batch) >= Config.IMPORT_MAX_REMINDERS:
+                        errors.append(f"превышен лимит в {Config.IMPORT_MAX_REMINDERS} напоминаний")
+                        break
+                    batch.append(item)
+                    if len(batch) >= Config.IMPORT_BATCH_SIZE:
+                        imported += self.import_batch(user_id, batch)
+                        batch = []
+            
+            if batch:
+                imported += self.import_batch(user_id, batch)
+        except Exception as e:
+            if not imported:
+                raise
+            raise ImportInterrupted(imported, e) from e
+        return imported, errors
+
+    def import_batch(self, user_id, batch):
+        """Запись пачки одной транзакцией и ее планирование"""
+        reminder_ids = self.db.add_reminders_bulk(user_id, batch)
+        self.scheduler.add_reminders_bulk(user_id, zip(reminder_ids, batch))
+        return len(reminder_ids)
+
+    async def export_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Экспорт активных напоминаний в файл: /export [csv|jsonl|ics]"""
+        user_id = update.message.from_user.id
+        fmt = context.args[0].lower() if context.args else 'csv'
+        
+        if fmt not in ('csv', 'jsonl', 'ics'):
+            await update.message.reply_text("Использование: /export [csv|jsonl|ics]")
+            return
+        
+        # Файл собирается на диске по частям, без загрузки всех напоминаний в память
+        with tempfile.TemporaryFile() as export_file:
+            def write_export():
+                for chunk in export_reminders(self.db.iter_user_reminders(user_id, status='active'), fmt):
+                    export_file.write(chunk.encode('utf-8'))
+                export_file.seek(0)
+            
+            await asyncio.get_running_loop().run_in_executor(None, write_export)
+            await update.message.reply_document(
+                document=export_file,
+                filename=f"reminders_{datetime.utcnow().strftime('%Y%m%d')}.{fmt}",
+                caption="📤 Ваши активные напоминания"
+            )
+
+    async def agenda_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Повестка на ближайшие дни с развернутыми повторениями: /agenda [дней]"""
+        user_id = update.message.from_user.id
+        try:
+            days = int(context.args[0]) if context.args else Config.AGENDA_DEFAULT_DAYS
+        except ValueError:
+            days = 0
+        if not 1 <= days <= Config.AGENDA_MAX_DAYS:
+            await update.message.reply_text(f"Использование: /agenda [дней от 1 до {Config.AGENDA_MAX_DAYS}]")
+            return
+        
+        now = datetime.utcnow()
+        until = now + timedelta(days=days)
+        reminders = self.db.get_agenda_reminders(user_id, until)
+        occurrences = agenda.expand(
+            [(rem_id, TimeParser.parse_db_time(reminder_time), repeat_type)
+             for rem_id, _, reminder_time, _, repeat_type in reminders],
+            now, until
+        )
+        details = {rem_id: (text, category, repeat_type) for rem_id, text, _, category, repeat_type in reminders}
+        await update.message.reply_text(agenda.format_agenda(occurrences, details, days))
+
+    async def find_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Поиск по тексту напоминаний: /find слова"""
+        query = update.message.text.partition(' ')[2].strip()
+        if not query:
+            await update.message.reply_text("Использование: /find слова\nНапример: /find врач")
+            return
+        
+        # Запрос нужен для перехода между страницами результатов; отметка времени защищает его от очистки
+        context.user_data['find_query'] = query
+        context.user_data['searched_at'] = datetime.utcnow()
+        text, keyboard = self.search_page(update.message.from_user.id, query, 0)
+        await update.message.reply_text(text, reply_markup=keyboard)
+
+    def search_page(self, user_id, query, offset):
+        """Текст и кнопки страницы результатов поиска"""
+        page_size = Config.SEARCH_PAGE_SIZE
+        # Лишний результат показывает, есть ли следующая страница
+        reminders = self.db.search_reminders(user_id, query, page_size + 1, offset)
+        shown = reminders[:page_size]
+        text = TextFormatter.format_search_results(shown, query, offset)
+        return text, Keyboards.search_results(shown, offset, len(reminders) > page_size)
+
+    async def show_search_page(self, query, context, offset):
+        """Переход между страницами результатов /find"""
+        search = context.user_data.get('find_query')
+        if not search:
+            await query.edit_message_text("🔎 Результаты поиска устарели, повтори /find")
+            return
+        text, keyboard = self.search_page(query.from_user.id, search, offset)
+        await query.edit_message_text(text, reply_markup=keyboard)
+
+    async def inline_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Поиск напоминаний в inline режиме: @бот слова"""
+        inline_query = update.inline_query
+        offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+        limit = Config.SEARCH_INLINE_LIMIT
+        reminders = self.db.search_reminders(inline_query.from_user.id, inline_query.query, limit + 1, offset)
+        
+        results = []
+        for rem_id, text, reminder_time, category, repeat_type, status in reminders[:limit]:
+            moscow_time = TimeParser.parse_db_time(reminder_time) + timedelta(hours=3)
+            when = moscow_time.strftime('%d.%m.%Y %H:%M')
+            repeat_text = f", {recurrence.describe(repeat_type)}" if repeat_type != 'once' else ""
+            results.append(InlineQueryResultArticle(
+                id=str(rem_id),
+                title=text,
+                description=f"{Config.CATEGORIES.get(category, '📌 Другое')} · {when}{repeat_text}",
+                input_message_content=InputTextMessageContent(f"⏰ {text}\n📅 {when}{repeat_text}"),
+            ))
+        
+        # Результаты у каждого пользователя свои, поэтому кэш Telegram - только персональный
+        await inline_query.answer(
+            results, cache_time=0, is_personal=True,
+            next_offset=str(offset + limit) if len(reminders) > limit else ''
+        )
+
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка обычных сообщений"""
         user_id = update.message.from_user.id
         # Обновляем активность пользователя
-        self.db.add_or_update_user(user_id)
+        self.touch_user(user_id)
         
         text = update.message.text
         
@@ -356,6 +844,8 @@ class ImprovedReminderBot:
             await self.process_reminder_text(update, context)
         elif user_state == 'waiting_time':
             await self.process_reminder_time(update, context)
+        elif user_state == 'waiting_rule':
+            await self.process_reminder_rule(update, context)
         elif text == '📋 Мои напоминания':
             await self.show_reminders_list(update)
         elif text == '📊 Статистика':
@@ -379,7 +869,7 @@ class ImprovedReminderBot:
         
         user_id = query.from_user.id
         # Обновляем активность пользователя
-        self.db.add_or_update_user(user_id)
+        self.touch_user(user_id)
         
         data = query.data
         
@@ -420,6 +910,8 @@ class ImprovedReminderBot:
             elif data.startswith('notify15_'):
                 reminder_id = int(data.replace('notify15_', ''))
                 await self.add_notification(query, reminder_id, 15)
+            elif data.startswith('find_page_'):
+                await self.show_search_page(query, context, int(data.replace('find_page_', '')))
             elif data.startswith('back_to_reminder_'):
                 reminder_id = int(data.replace('back_to_reminder_', ''))
                 await self.show_reminder_details(query, reminder_id)
@@ -437,6 +929,7 @@ class ImprovedReminderBot:
         user_id = update.message.from_user.id
         context.user_data.clear()
         context.user_data['reminder_state'] = 'waiting_text'
+        context.user_data['started_at'] = datetime.utcnow()
         
         await update.message.reply_text(
             "📝 О чем тебе напомнить? Напиши текст напоминания:"
@@ -501,25 +994,47 @@ class ImprovedReminderBot:
             await self.finish_reminder_creation(query, context)
             return
         
+        # Свое правило пользователь пишет текстом
+        if repeat_type == 'custom':
+            context.user_data['reminder_state'] = 'waiting_rule'
+            await query.edit_message_text(
+                text="⚙️ Как повторять? Время суток возьмем из времени напоминания.\n\n"
+                     "Примеры:\n"
+                     "• по будням\n"
+                     "• каждые 2 часа\n"
+                     "• по понедельникам и средам\n"
+                     "• в последнюю пятницу месяца\n"
+                     "• 15 числа каждого месяца"
+            )
+            return
+        
         # Для повторяющихся - спрашиваем про уведомление
         context.user_data['reminder_state'] = 'waiting_notification'
         
-        keyboard = [
-            [
-                InlineKeyboardButton("За 15 минут", callback_data="notify_15"),
-                InlineKeyboardButton("За 30 минут", callback_data="notify_30")
-            ],
-            [
-                InlineKeyboardButton("За 60 минут", callback_data="notify_60"),
-                InlineKeyboardButton("Не уведомлять", callback_data="notify_0")
-            ],
-            [InlineKeyboardButton("❌ Отмена", callback_data="cancel")]
-        ]
-        
         await query.edit_message_text(
-            text=f"🔄 Повтор: {Config.REPEAT_OPTIONS.get(repeat_type, '')}\n\n"
+            text=f"🔄 Повтор: {recurrence.describe(repeat_type)}\n\n"
                  "🔔 Уведомить заранее?",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=Keyboards.notify_options()
+        )
+
+    async def process_reminder_rule(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработка своего правила повторения"""
+        try:
+            rule = recurrence.parse_phrase(update.message.text)
+        except ValueError as e:
+            await update.message.reply_text(
+                f"❌ Не могу понять правило повторения: {e}\n\n"
+                f"Пример: 'по будням' или 'каждые 2 часа'"
+            )
+            return
+        
+        context.user_data['repeat_type'] = str(rule)
+        context.user_data['reminder_state'] = 'waiting_notification'
+        
+        await update.message.reply_text(
+            f"🔄 Повтор: {rule.describe()}\n\n"
+            "🔔 Уведомить заранее?",
+            reply_markup=Keyboards.notify_options()
         )
 
     async def process_notification_callback(self, query, context, data):
@@ -543,19 +1058,20 @@ class ImprovedReminderBot:
             context.user_data.clear()
             return
         
+        # Первое напоминание - в ближайший подходящий правилу повторения момент; день месяца
+        # закрепляется в правиле, чтобы повторения не съезжали после коротких месяцев
+        reminder_time = recurrence.first_occurrence(repeat_type, reminder_time)
+        repeat_type = recurrence.anchored(repeat_type, reminder_time)
+        
         # Сохраняем в базу (время уже в UTC)
         reminder_id = self.db.add_reminder(
             user_id, reminder_text, reminder_time, category, repeat_type, notify_before
         )
         
-        # Добавляем в планировщик
-        self.scheduler.add_reminder(user_id, reminder_text, reminder_time, reminder_id)
-        
-        # Уведомление заранее
-        if notify_before > 0:
-            notify_time = reminder_time - timedelta(minutes=notify_before)
-            if notify_time > datetime.utcnow():
-                self.scheduler.add_notification(user_id, reminder_text, notify_time, reminder_id, True)
+        # Добавляем в планировщик вместе с уведомлением заранее
+        self.scheduler.add_reminder(
+            user_id, reminder_text, reminder_time, reminder_id, [notify_before] if notify_before > 0 else []
+        )
         
         # Формируем сообщение об успехе - конвертируем в московское время для отображения
         moscow_offset = timedelta(hours=3)
@@ -566,7 +1082,7 @@ class ImprovedReminderBot:
             f"*Что:* {reminder_text}\n"
             f"*Когда:* {display_time.strftime('%d.%m.%Y в %H:%M')}\n"
             f"*Категория:* {Config.CATEGORIES.get(category, 'Другое')}\n"
-            f"*Повтор:* {Config.REPEAT_OPTIONS.get(repeat_type, 'Один раз')}\n"
+            f"*Повтор:* {recurrence.describe(repeat_type)}\n"
         )
         
         if notify_before > 0:
@@ -675,11 +1191,9 @@ class ImprovedReminderBot:
     async def complete_reminder(self, query, reminder_id):
         """Отметить напоминание как выполненное"""
         user_id = query.from_user.id
-        reminder = self.db.get_reminder(reminder_id)
         
-        # Проверяем, принадлежит ли напоминание пользователю
-        if reminder and reminder[1] == user_id:  # user_id в позиции 1
-            self.db.update_reminder_status(reminder_id, 'completed')
+        # Проверка владельца, смена статуса и статистика - одним запросом к базе
+        if self.db.update_reminder_status(reminder_id, 'completed', user_id=user_id):
             self.scheduler.cancel_reminder(reminder_id)
             
             await query.edit_message_text(
@@ -694,11 +1208,9 @@ class ImprovedReminderBot:
     async def delete_reminder(self, query, reminder_id):
         """Удалить напоминание"""
         user_id = query.from_user.id
-        reminder = self.db.get_reminder(reminder_id)
         
-        # Проверяем, принадлежит ли напоминание пользователю
-        if reminder and reminder[1] == user_id:  # user_id в позиции 1
-            self.db.delete_reminder(reminder_id)
+        # Удаляется только напоминание пользователя, проверка владельца - в том же запросе
+        if self.db.delete_reminder(reminder_id, user_id=user_id):
             self.scheduler.cancel_reminder(reminder_id)
             
             await query.edit_message_text(
@@ -713,9 +1225,9 @@ class ImprovedReminderBot:
     async def show_edit_options(self, query, reminder_id):
         """Показать опции редактирования напоминания"""
         user_id = query.from_user.id
-        reminder = self.db.get_reminder(reminder_id)
+        reminder = self.db.get_reminder(reminder_id, user_id=user_id)
         
-        if not reminder or reminder[1] != user_id:
+        if not reminder:
             await query.edit_message_text("❌ Напоминание не найдено или у вас нет доступа!")
             return
         
@@ -730,20 +1242,21 @@ class ImprovedReminderBot:
     async def show_reminder_details(self, query, reminder_id):
         """Показать детали напоминания"""
         user_id = query.from_user.id
-        reminder = self.db.get_reminder(reminder_id)
+        reminder = self.db.get_reminder(reminder_id, user_id=user_id)
         
-        if not reminder or reminder[1] != user_id:
+        if not reminder:
             await query.edit_message_text("❌ Напоминание не найдено или у вас нет доступа!")
             return
         
         status_icons = {
             'active': '⏳',
             'completed': '✅', 
-            'cancelled': '❌'
+            'cancelled': '❌',
+            'paused': '⏸'
         }
         
         # Конвертируем время для отображения
-        reminder_time = datetime.strptime(reminder[3], '%Y-%m-%d %H:%M:%S')
+        reminder_time = TimeParser.parse_db_time(reminder[3])
         moscow_offset = timedelta(hours=3)
         display_time = reminder_time + moscow_offset
         
@@ -752,7 +1265,14 @@ class ImprovedReminderBot:
             f"*Текст:* {reminder[2]}\n"
             f"*Время:* {display_time.strftime('%d.%m.%Y %H:%M')}\n"
             f"*Категория:* {Config.CATEGORIES.get(reminder[4], 'Другое')}\n"
-            f"*Повтор:* {Config.REPEAT_OPTIONS.get(reminder[5], 'Один раз')}\n"
+            f"*Повтор:* {recurrence.describe(reminder[5])}\n"
+        )
+        
+        offsets = TimeParser.parse_notify_offsets(reminder[7], reminder[14])
+        if offsets:
+            text += f"*Уведомления:* за {', '.join(str(offset) for offset in offsets)} мин.\n"
+        
+        text += (
             f"*Статус:* {reminder[6]}\n"
             f"*ID:* {reminder_id}"
         )
@@ -766,23 +1286,24 @@ class ImprovedReminderBot:
     async def add_notification(self, query, reminder_id, minutes):
         """Добавить уведомление заранее"""
         user_id = query.from_user.id
-        reminder = self.db.get_reminder(reminder_id)
+        # Проверка владельца и добавление к уже настроенным уведомлениям - одна транзакция,
+        # одновременные нажатия не теряют уведомления (notify_offsets - колонка 14)
+        reminder = self.db.add_notify_offset(reminder_id, minutes, user_id=user_id)
         
-        if not reminder or reminder[1] != user_id:
+        if not reminder:
             await query.edit_message_text("❌ Напоминание не найдено или у вас нет доступа!")
             return
         
-        self.db.update_reminder(reminder_id, notify_before=minutes)
-        
-        # Перепланируем уведомление
-        reminder_time = datetime.strptime(reminder[3], '%Y-%m-%d %H:%M:%S')
-        notify_time = reminder_time - timedelta(minutes=minutes)
+        offsets = TimeParser.parse_notify_offsets(reminder[7], reminder[14])
         
-        if notify_time > datetime.now():
-            self.scheduler.add_notification(reminder[1], reminder[2], notify_time, reminder_id, True)
+        # Перепланируем напоминание со всеми уведомлениями одной задачей
+        if reminder[6] == 'active':
+            reminder_time = TimeParser.parse_db_time(reminder[3])
+            self.scheduler.add_reminder(reminder[1], reminder[2], reminder_time, reminder_id, offsets)
     
         await query.edit_message_text(
-            text=f"🔔 Добавлено уведомление за {minutes} минут!",
+            text=f"🔔 Добавлено уведомление за {minutes} минут!\n"
+                 f"Уведомления: за {', '.join(str(offset) for offset in offsets)} мин.",
             reply_markup=InlineKeyboardMarkup([
                 [InlineKeyboardButton("📋 Назад к напоминанию", callback_data=f"back_to_reminder_{reminder_id}")]
             ])
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+from config import Config
+from delivery_errors import is_chat_unavailable
+
+
+class RateLimiter:
+    """Равномерное ограничение частоты запросов, общее для всех отправителей"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.next_at = 0.0
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        delay = self.next_at - now
+        self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Broadcast:
+    """Рассылка сообщения всем пользователям.
+
+    Пользователи читаются из базы пачками и через ограниченную очередь
+    передаются нескольким отправителям с общим лимитом частоты. После каждой
+    пачки в базе сохраняется последний обработанный user_id, поэтому прерванная
+    рассылка продолжается с того же места, а память не зависит от числа пользователей.
+    Пользователи, заблокировавшие бота, пропускаются, а обнаруженные во время
+    рассылки помечаются недоступными.
+    """
+
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, bot, db, broadcast_id, rate=None, senders=None, chunk_size=None, pause_user=None):
+        self.bot = bot
+        self.db = db
+        # Реакция на заблокировавшего бота: по умолчанию пометка в базе, бот передает приостановку планировщика
+        self.pause_user = pause_user or db.deactivate_user
+        self.broadcast_id = broadcast_id
+        self.limiter = RateLimiter(rate or Config.BROADCAST_RATE)
+        self.senders = senders or Config.BROADCAST_SENDERS
+        self.chunk_size = chunk_size or Config.BROADCAST_CHUNK_SIZE
+        self.sent = 0
+        self.failed = 0
+        self.total = 0
+        self.admin_id = None
+        self.progress_message_id = None
+        self._reported_at = 0.0
+
+    async def run(self):
+        broadcast = self.db.get_broadcast(self.broadcast_id)
+        if broadcast is None or broadcast[3] != 'running':
+            return
+        _, self.admin_id, text, _, last_user_id, self.sent, self.failed, self.progress_message_id = broadcast
+        self.total = self.db.get_total_users_count()
+        logging.info(f"Broadcast {self.broadcast_id} started after user {last_user_id}")
+
+        queue = asyncio.Queue(maxsize=self.senders * 2)
+        senders = [asyncio.create_task(self.sender(queue, text)) for _ in range(self.senders)]
+        try:
+            for users in self.db.iter_users(last_user_id, self.chunk_size, active_only=True):
+                for user in users:
+                    await queue.put(user[0])
+                # Прогресс сохраняется только когда вся пачка отправлена
+                await queue.join()
+                self.db.update_broadcast(
+                    self.broadcast_id, last_user_id=users[-1][0],
+                    sent_count=self.sent, failed_count=self.failed
+                )
+                await self.report_progress()
+            self.db.update_broadcast(self.broadcast_id, status='completed')
+            await self.report_progress(final=True)
+            logging.info(f"Broadcast {self.broadcast_id} completed: {self.sent} sent, {self.failed} failed")
+        finally:
+            for task in senders:
+                task.cancel()
+
+    async def sender(self, queue, text):
+        while True:
+            user_id = await queue.get()
+            try:
+                await self.send(user_id, text)
+            except Exception as e:
+                # Ошибка одного пользователя не должна останавливать отправителя: без отправителей
+                # очередь не разберется и рассылка зависнет
+                logging.error(f"Broadcast {self.broadcast_id} failed for user {user_id}: {e}")
+                self.failed += 1
+            finally:
+                queue.task_done()
+
+    async def send(self, user_id, text):
+        for attempt in range(self.MAX_ATTEMPTS):
+            await self.limiter.wait()
+            try:
+                await self.bot.send_message(chat_id=user_id, text=text)
+                self.sent += 1
+                return
+            except RetryAfter as e:
+                logging.warning(f"Broadcast {self.broadcast_id} throttled for {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+            except (Forbidden, BadRequest) as e:
+                if is_chat_unavailable(e):
+                    # Пользователь заблокировал бота или чат недоступен: следующие рассылки его пропустят.
+                    # Запись в базу идет в пуле потоков, чтобы не останавливать цикл приложения
+                    try:
+                        await asyncio.to_thread(self.pause_user, user_id)
+                    except Exception as e:
+                        logging.error(f"Error pausing user {user_id} in broadcast {self.broadcast_id}: {e}")
+                break
+            except TelegramError as e:
+                logging.warning(f"Broadcast {self.broadcast_id} error for user {user_id}: {e}")
+                await asyncio.sleep(2 ** attempt)
+        self.failed += 1
+
+    def progress_text(self, final=False):
+        done = self.sent + self.failed
+        percent = min(100, done * 100 // self.total) if self.total and not final else 100
+        title = "✅ Рассылка завершена" if final else "📣 Рассылка идет"
+        text = (
+            f"{title} (#{self.broadcast_id})\n\n"
+            f"📊 Обработано: {done}/{self.total} ({percent}%)\n"
+            f"✅ Доставлено: {self.sent}\n"
+            f"❌ Не доставлено: {self.failed}"
+        )
+        if final and self.total > done:
+            # total - все пользователи на момент старта, включая заблокировавших бота
+            text += f"\n⏸ Пропущено недоступных: {self.total - done}"
+        return text
+
+    async def report_progress(self, final=False):
+        """Обновление сообщения с прогрессом у администратора (не чаще BROADCAST_PROGRESS_INTERVAL)"""
+        now = asyncio.get_running_loop().time()
+        if not final and now - self._reported_at < Config.BROADCAST_PROGRESS_INTERVAL:
+            return
+        self._reported_at = now
+        try:
+            if self.progress_message_id:
+                await self.bot.edit_message_text(
+                    chat_id=self.admin_id, message_id=self.progress_message_id, text=self.progress_text(final)
+                )
+            else:
+                message = await self.bot.send_message(chat_id=self.admin_id, text=self.progress_text(final))
+                self.progress_message_id = message.message_id
+                self.db.update_broadcast(self.broadcast_id, progress_message_id=message.message_id)
+        except TelegramError as e:
+            logging.warning(f"Error reporting broadcast {self.broadcast_id} progress: {e}")
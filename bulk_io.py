@@ -0,0 +1,246 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import recurrence
+from config import Config, MOSCOW_OFFSET
+from utils import TimeParser
+
+MAX_TEXT_LENGTH = 1000
+
+CSV_FIELDS = ['text', 'time', 'category', 'repeat', 'notify_before']
+
+
+class ImportRowError(ValueError):
+    """Ошибка в строке импортируемого файла"""
+
+    def __init__(self, line, message):
+        super().__init__(f"строка {line}: {message}")
+        self.line = line
+
+
+class ImportInterrupted(Exception):
+    """Импорт прерван ошибкой после того, как часть напоминаний уже записана"""
+
+    def __init__(self, imported, error):
+        super().__init__(f"{imported} reminders imported before error: {error}")
+        self.imported = imported
+
+
+def detect_format(filename):
+    """Формат файла по расширению: csv, jsonl или ics"""
+    name = (filename or '').lower()
+    for extension, fmt in (('.csv', 'csv'), ('.jsonl', 'jsonl'), ('.ndjson', 'jsonl'), ('.ics', 'ics')):
+        if name.endswith(extension):
+            return fmt
+    return None
+
+
+def parse_reminder_time(value):
+    """Время из файла: фразы TimeParser или абсолютное время по Москве (YYYY-MM-DD HH:MM)"""
+    value = str(value).strip()
+    try:
+        return TimeParser.parse_time(value)
+    except (ValueError, IndexError, OverflowError):
+        # OverflowError - слишком большой интервал ("через 99999999999 дней")
+        pass
+    try:
+        return datetime.fromisoformat(value.replace('T', ' ')) - MOSCOW_OFFSET
+    except (ValueError, OverflowError):
+        raise ValueError(f"не могу понять время '{value}'")
+
+
+def validate(line, text, reminder_time, category='other', repeat_type='once', notify_before=0):
+    """Проверка и нормализация одного напоминания; возвращает кортеж для вставки"""
+    text = (text or '').strip()
+    if not text:
+        raise ImportRowError(line, "пустой текст")
+    if len(text) > MAX_TEXT_LENGTH:
+        raise ImportRowError(line, f"текст длиннее {MAX_TEXT_LENGTH} символов")
+
+    if not isinstance(reminder_time, datetime):
+        try:
+            reminder_time = parse_reminder_time(reminder_time)
+        except ValueError as e:
+            raise ImportRowError(line, str(e))
+    if reminder_time <= datetime.utcnow():
+        raise ImportRowError(line, "время уже прошло")
+
+    category = (category or 'other').strip()
+    if category not in Config.CATEGORIES:
+        category = 'other'
+
+    try:
+        # Имя типа повторения (daily, weekly...) или правило RRULE
+        repeat_type = recurrence.normalize(repeat_type)
+    except ValueError as e:
+        raise ImportRowError(line, f"неподдерживаемое повторение '{repeat_type}': {e}")
+
+    reminder_time = recurrence.first_occurrence(repeat_type, reminder_time)
+    repeat_type = recurrence.anchored(repeat_type, reminder_time)
+
+    try:
+        notify_before = int(notify_before or 0)
+    except (TypeError, ValueError):
+        raise ImportRowError(line, "notify_before должно быть числом минут")
+
+    return text, reminder_time, category, repeat_type, max(0, notify_before)
+
+
+def parse_csv(lines):
+    """Потоковый разбор CSV с заголовком text,time,category,repeat,notify_before"""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        line = reader.line_num
+        try:
+            yield validate(line, row.get('text'), row.get('time') or '', row.get('category'),
+                           row.get('repeat'), row.get('notify_before'))
+        except ImportRowError as e:
+            yield e
+
+
+def parse_jsonl(lines):
+    """Потоковый разбор JSON Lines: один объект напоминания на строку"""
+    for line, raw in enumerate(lines, 1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+            if not isinstance(row, dict):
+                raise ValueError("ожидается объект")
+        except ValueError as e:
+            yield ImportRowError(line, f"некорректный JSON ({e})")
+            continue
+        try:
+            yield validate(line, row.get('text'), row.get('time') or '', row.get('category'),
+                           row.get('repeat'), row.get('notify_before'))
+        except ImportRowError as e:
+            yield e
+
+
+def _unfold_ics(lines):
+    """Склейка перенесенных строк iCalendar (продолжение начинается с пробела)"""
+    current, start = None, 0
+    for number, raw in enumerate(lines, 1):
+        raw = raw.rstrip('\r\n')
+        if raw[:1] in (' ', '\t') and current is not None:
+            current += raw[1:]
+            continue
+        if current is not None:
+            yield start, current
+        current, start = raw, number
+    if current is not None:
+        yield start, current
+
+
+def _parse_ics_time(value, params):
+    if value.endswith('Z'):
+        return datetime.strptime(value, '%Y%m%dT%H%M%SZ')
+    if 'VALUE=DATE' in params:
+        # Событие на весь день - напоминаем в 9:00 по Москве
+        return datetime.strptime(value, '%Y%m%d').replace(hour=9) - MOSCOW_OFFSET
+    # Время без зоны считаем московским
+    return datetime.strptime(value, '%Y%m%dT%H%M%S') - MOSCOW_OFFSET
+
+
+def _parse_ics_trigger(value):
+    """TRIGGER:-PT15M -> 15 минут"""
+    value = value.lstrip('-').replace('P', '').replace('T', '')
+    minutes, number = 0, ''
+    for char in value:
+        if char.isdigit():
+            number += char
+            continue
+        multiplier = {'W': 7 * 1440, 'D': 1440, 'H': 60, 'M': 1, 'S': 0}.get(char, 0)
+        minutes += int(number or 0) * multiplier
+        number = ''
+    return minutes
+
+
+def parse_ics(lines):
+    """Потоковый разбор VEVENT из iCalendar"""
+    event = None
+    for line, raw in _unfold_ics(lines):
+        name, _, value = raw.partition(':')
+        name, _, params = name.partition(';')
+        name = name.upper()
+
+        if name == 'BEGIN' and value.upper() == 'VEVENT':
+            event = {'line': line, 'category': 'other', 'repeat': 'once', 'notify_before': 0}
+        elif event is None:
+            continue
+        elif name == 'END' and value.upper() == 'VEVENT':
+            try:
+                if 'time' not in event:
+                    raise ImportRowError(event['line'], "нет DTSTART")
+                yield validate(event['line'], event.get('text'), event['time'], event['category'],
+                               event['repeat'], event['notify_before'])
+            except ImportRowError as e:
+                yield e
+            event = None
+        elif name == 'SUMMARY':
+            event['text'] = value.replace('\\n', '\n').replace('\\,', ',').replace('\\;', ';')
+        elif name == 'DTSTART':
+            try:
+                event['time'] = _parse_ics_time(value.strip(), params.upper())
+            except ValueError:
+                event['time'] = value
+        elif name == 'RRULE':
+            # Правило проверяется в validate: неподдерживаемые части (COUNT, UNTIL...) дают ошибку строки
+            event['repeat'] = value.strip()
+        elif name == 'CATEGORIES':
+            category = value.split(',')[0].strip().lower()
+            event['category'] = category if category in Config.CATEGORIES else 'other'
+        elif name == 'TRIGGER':
+            event['notify_before'] = _parse_ics_trigger(value)
+
+
+PARSERS = {'csv': parse_csv, 'jsonl': parse_jsonl, 'ics': parse_ics}
+
+
+def parse_reminders(lines, fmt):
+    """Генератор проверенных напоминаний (кортежей) и ошибок (ImportRowError)"""
+    return PARSERS[fmt](lines)
+
+
+def _display_time(reminder_time_str):
+    return (TimeParser.parse_db_time(reminder_time_str) + MOSCOW_OFFSET).strftime('%Y-%m-%d %H:%M')
+
+
+def export_reminders(rows, fmt):
+    """Генератор частей файла экспорта для строк (text, time, category, repeat_type, notify_before)"""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_FIELDS)
+        for text, reminder_time, category, repeat_type, notify_before in rows:
+            writer.writerow([text, _display_time(reminder_time), category, repeat_type, notify_before])
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    elif fmt == 'jsonl':
+        for text, reminder_time, category, repeat_type, notify_before in rows:
+            yield json.dumps({
+                'text': text, 'time': _display_time(reminder_time), 'category': category,
+                'repeat': repeat_type, 'notify_before': notify_before,
+            }, ensure_ascii=False) + '\n'
+
+    elif fmt == 'ics':
+        yield 'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//telegram-reminder-bot//RU\r\n'
+        for index, (text, reminder_time, category, repeat_type, notify_before) in enumerate(rows):
+            summary = text.replace('\\', '\\\\').replace('\n', '\\n').replace(',', '\\,').replace(';', '\\;')
+            dtstart = TimeParser.parse_db_time(reminder_time).strftime('%Y%m%dT%H%M%SZ')
+            event = f'BEGIN:VEVENT\r\nUID:{index}-{dtstart}@reminder-bot\r\nDTSTAMP:{dtstart}\r\n' \
+                    f'DTSTART:{dtstart}\r\nSUMMARY:{summary}\r\nCATEGORIES:{category}\r\n'
+            rule = recurrence.Recurrence.parse(repeat_type)
+            if rule is not None:
+                event += f'RRULE:{rule.to_rrule()}\r\n'
+            if notify_before:
+                event += f'BEGIN:VALARM\r\nACTION:DISPLAY\r\nDESCRIPTION:{summary}\r\n' \
+                         f'TRIGGER:-PT{notify_before}M\r\nEND:VALARM\r\n'
+            yield event + 'END:VEVENT\r\n'
+        yield 'END:VCALENDAR\r\n'
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from broadcast import RateLimiter
+from config import Config, MOSCOW_OFFSET
+from delivery_errors import is_chat_unavailable, retry_delay
+from utils import TextFormatter, TimeParser
+
+
+def format_digest(reminders):
+    """Одно сообщение со всеми пропущенными напоминаниями пользователя"""
+    return TextFormatter.join_within_limit(
+        [f"⏰ Пропущенные напоминания ({len(reminders)}):", ""],
+        ([f"• {(reminder_time + MOSCOW_OFFSET).strftime('%d.%m %H:%M')} — {reminder_text}"]
+         for reminder_time, reminder_text in reminders),
+        len(reminders)
+    )
+
+
+class MissedReminders:
+    """Доставка напоминаний, пропущенных за время простоя или зависания.
+
+    Просроченные дольше CATCHUP_GRACE_SECONDS активные напоминания захватываются
+    одним запросом по индексу (status, reminder_time) и группируются по пользователям:
+    каждый получает одно сообщение-сводку через общий лимит частоты. Повторяющиеся
+    напоминания переносятся на ближайшее будущее повторение одной транзакцией.
+    """
+
+    def __init__(self, bot, db, owner_id, rate=None, pause_user=None):
+        self.bot = bot
+        self.db = db
+        self.owner_id = owner_id
+        # Планировщик передает свою приостановку, которая убирает и задачи из памяти;
+        # процессам доставки хватает пометки в базе
+        self.pause_user = pause_user or db.deactivate_user
+        self.limiter = RateLimiter(rate or Config.CATCHUP_RATE)
+
+    async def run(self, shard_index=0, shard_count=1, grace_seconds=None):
+        """Обработка всех пропущенных напоминаний шарда.
+
+        При старте grace_seconds=0: все уже наступившие напоминания отправляются сводкой.
+        Возвращает созданные повторения (id, user_id, текст, время, минуты уведомлений),
+        чтобы вызывающий поставил их в свой планировщик.
+        """
+        if grace_seconds is None:
+            grace_seconds = Config.CATCHUP_GRACE_SECONDS
+        repetitions = []
+        delivered = 0
+        while True:
+            # Запросы к базе - в пуле потоков, чтобы не останавливать цикл приложения
+            reminders = await asyncio.to_thread(
+                self.db.claim_due_reminders, self.owner_id, Config.DELIVERY_LEASE_SECONDS,
+                shard_index, shard_count, Config.CATCHUP_BATCH_SIZE, due_before=datetime.utcnow() - timedelta(seconds=grace_seconds)
+            )
+            if not reminders:
+                break
+            delivered += len(reminders)
+            repetitions.extend(await self.deliver(reminders))
+            if len(reminders) < Config.CATCHUP_BATCH_SIZE:
+                break
+
+        if delivered:
+            logging.info(f"Caught up {delivered} missed reminders ({len(repetitions)} repetitions rescheduled)")
+        return repetitions
+
+    async def deliver(self, reminders):
+        """Сводки по пользователям для одной пачки захваченных напоминаний"""
+        by_user = {}
+        for reminder in reminders:
+            by_user.setdefault(reminder[1], []).append(reminder)
+
+        now = datetime.utcnow()
+        deliveries = []
+        failed = {}  # задержка повторной попытки -> id напоминаний
+        for user_id, user_reminders in by_user.items():
+            user_reminders.sort(key=lambda reminder: reminder[3])
+            await self.limiter.wait()
+            try:
+                await self.bot.send_message(chat_id=user_id, text=format_digest([
+                    (TimeParser.parse_db_time(reminder[3]), reminder[2]) for reminder in user_reminders
+                ]))
+            except Exception as e:
+                logging.error(f"Failed to send missed reminders digest to user {user_id}: {e}")
+                if is_chat_unavailable(e):
+                    # Захваченные напоминания приостанавливаются вместе с остальными
+                    await asyncio.to_thread(self.pause_user, user_id)
+                    continue
+                for reminder in user_reminders:
+                    if reminder[6] >= Config.DELIVERY_MAX_ATTEMPTS:  # attempts
+                        logging.error(f"Reminder {reminder[0]} failed {reminder[6]} times, giving up")
+                        await asyncio.to_thread(self.db.update_reminder_status, reminder[0], 'cancelled')
+                    else:
+                        failed.setdefault(retry_delay(e, reminder[6]), []).append(reminder[0])
+                continue
+            for reminder in user_reminders:
+                next_time = None
+                if reminder[4] != 'once':
+                    next_time = TimeParser.next_future_reminder(TimeParser.parse_db_time(reminder[3]), reminder[4], now)
+                deliveries.append((reminder[0], next_time))
+
+        # Сводка будет отправлена проходом после задержки: экспоненциальной по попыткам, но не меньше RetryAfter
+        for delay, reminder_ids in failed.items():
+            await asyncio.to_thread(self.db.release_reminders, reminder_ids, self.owner_id, delay)
+
+        next_times = dict(deliveries)
+        reminders_by_id = {reminder[0]: reminder for reminder in reminders}
+        repetitions = []
+        completed = await asyncio.to_thread(self.db.complete_deliveries, self.owner_id, deliveries)
+        for reminder_id, next_reminder_id in completed:
+            if next_reminder_id:
+                _, user_id, reminder_text, _, _, notify_before, _, notify_offsets = reminders_by_id[reminder_id]
+                repetitions.append((
+                    next_reminder_id, user_id, reminder_text, next_times[reminder_id],
+                    TimeParser.parse_notify_offsets(notify_before, notify_offsets)
+                ))
+        return repetitions
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+
+from config import Config, MAX_MESSAGE_LENGTH
+
+SEPARATOR = '\n\n'
+
+
+class _Batch:
+    """Сообщения одного чата, ожидающие общей отправки"""
+
+    def __init__(self):
+        self.texts = []
+        self.futures = []
+        self.length = 0
+        self.full = asyncio.Event()
+        self.task = None
+
+
+class ChatCoalescer:
+    """Объединение сообщений одному чату, наступивших почти одновременно.
+
+    Первое сообщение чата открывает пачку на COALESCE_WINDOW секунд; все, что приходит
+    этому чату за это время, отправляется одним send_message. Пачка уходит раньше, если
+    набралось COALESCE_MAX_MESSAGES сообщений или следующее не помещается в лимит длины.
+    Если вызывающий заранее объявил сообщения чата (expect), пачка уходит сразу после
+    последнего из них и не ждет окна: одиночное сообщение отправляется без задержки.
+    Каждый вызов send ждет отправки своей пачки и получает ее ошибку, поэтому повторные
+    попытки и освобождение захвата работают как при отдельной отправке.
+    Все вызовы должны выполняться в одном цикле событий.
+    """
+
+    def __init__(self, bot, window=None, max_messages=None):
+        self.bot = bot
+        self.window = Config.COALESCE_WINDOW if window is None else window
+        self.max_messages = max_messages or Config.COALESCE_MAX_MESSAGES
+        self._batches = {}  # chat_id -> открытая пачка
+        self._expected = {}  # chat_id -> сколько объявленных сообщений еще не пришло
+
+    def expect(self, chat_id, count=1):
+        """Объявление count сообщений чату, которые сейчас будут переданы в send"""
+        if self.window > 0 and self.max_messages > 1:
+            self._expected[chat_id] = self._expected.get(chat_id, 0) + count
+
+    async def send(self, chat_id, text):
+        if self.window <= 0 or self.max_messages <= 1:
+            await self.bot.send_message(chat_id=chat_id, text=text)
+            return
+
+        batch = self._batches.get(chat_id)
+        if batch is not None and batch.length + len(SEPARATOR) + len(text) > MAX_MESSAGE_LENGTH:
+            # Не помещается в одно сообщение: текущая пачка уходит сразу
+            self._close(chat_id, batch)
+            batch = None
+        if batch is None:
+            batch = self._batches[chat_id] = _Batch()
+            batch.task = asyncio.create_task(self._flush(chat_id, batch))
+
+        future = asyncio.get_running_loop().create_future()
+        batch.texts.append(text)
+        batch.futures.append(future)
+        batch.length += len(text) + len(SEPARATOR)
+        expected = self._expected.get(chat_id)
+        if expected is not None:
+            if expected <= 1:
+                # Пришло последнее объявленное сообщение: ждать больше нечего
+                del self._expected[chat_id]
+                self._close(chat_id, batch)
+            else:
+                self._expected[chat_id] = expected - 1
+        if len(batch.texts) >= self.max_messages:
+            self._close(chat_id, batch)
+        await future
+
+    def _close(self, chat_id, batch):
+        if self._batches.get(chat_id) is batch:
+            del self._batches[chat_id]
+        batch.full.set()
+
+    async def _flush(self, chat_id, batch):
+        try:
+            await asyncio.wait_for(batch.full.wait(), self.window)
+        except asyncio.TimeoutError:
+            # Объявленные сообщения не пришли за окно: следующие отправки их не ждут
+            self._expected.pop(chat_id, None)
+        self._close(chat_id, batch)
+
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=SEPARATOR.join(batch.texts))
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future in batch.futures:
+            if not future.done():
+                future.set_result(None)
+        if len(batch.texts) > 1:
+            logging.info(f"Coalesced {len(batch.texts)} messages to chat {chat_id}")
@@ -1,8 +1,14 @@
 import os
+from datetime import timedelta
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Смещение московского времени (TIMEZONE) от UTC: в базе время хранится в UTC
+MOSCOW_OFFSET = timedelta(hours=3)
+# Лимит длины одного сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+
 class Config:
     BOT_TOKEN = os.getenv('BOT_TOKEN')
     ADMIN_IDS = [890219846]  # Замени на свой ID
@@ -12,6 +18,121 @@ class Config:
     DB_PATH = os.getenv('DB_PATH', '/app/data/reminders.db')
     BACKUP_DIR = os.getenv('BACKUP_DIR', '/app/backups')
     
+    # Хранилище напоминаний: 'sqlite', 'postgres' или 'memory' (только для тестов и бенчмарков, один процесс)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite')
+    POSTGRES_DSN = os.getenv('POSTGRES_DSN', '')  # пусто - параметры из PGHOST, PGUSER, PGPASSWORD, PGDATABASE
+    POSTGRES_POOL_MIN = int(os.getenv('POSTGRES_POOL_MIN', '1'))
+    POSTGRES_POOL_MAX = int(os.getenv('POSTGRES_POOL_MAX', '10'))
+    
+    # Получение обновлений: 'polling' или 'webhook'
+    BOT_MODE = os.getenv('BOT_MODE', 'polling')
+    WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'webhook')
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # публичный адрес, например https://bot.example.com/webhook
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+    # Сколько обновлений обрабатывается одновременно (обновления одного пользователя - всегда по очереди)
+    CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '1'))
+    
+    # Соединения с Bot API: отдельные пулы для отправки и для getUpdates (long polling)
+    BOT_API_POOL_SIZE = int(os.getenv('BOT_API_POOL_SIZE', '64'))
+    BOT_API_POLLING_POOL_SIZE = int(os.getenv('BOT_API_POLLING_POOL_SIZE', '1'))
+    BOT_API_KEEPALIVE = float(os.getenv('BOT_API_KEEPALIVE', '60'))  # секунд простоя до закрытия соединения
+    BOT_API_CONNECT_TIMEOUT = float(os.getenv('BOT_API_CONNECT_TIMEOUT', '5'))
+    BOT_API_READ_TIMEOUT = float(os.getenv('BOT_API_READ_TIMEOUT', '5'))
+    BOT_API_WRITE_TIMEOUT = float(os.getenv('BOT_API_WRITE_TIMEOUT', '5'))
+    BOT_API_POOL_TIMEOUT = float(os.getenv('BOT_API_POOL_TIMEOUT', '1'))  # ожидание свободного соединения
+    BOT_API_HTTP2 = os.getenv('BOT_API_HTTP2', '0') == '1'  # нужен pip install "python-telegram-bot[http2]"
+    BOT_API_METRICS_INTERVAL = int(os.getenv('BOT_API_METRICS_INTERVAL', '300'))  # метрики в лог, 0 - отключено
+    
+    # Состояние пошагового создания напоминаний: 'sqlite', 'postgres', 'file' или 'memory'
+    # (по умолчанию - рядом с напоминаниями, чтобы с PostgreSQL его видели процессы бота на всех машинах)
+    CONVERSATION_BACKEND = os.getenv('CONVERSATION_BACKEND', 'postgres' if STORAGE_BACKEND == 'postgres' else 'sqlite')
+    CONVERSATION_FILE = os.getenv('CONVERSATION_FILE', '/app/data/conversations')
+    CONVERSATION_TTL = int(os.getenv('CONVERSATION_TTL', '86400'))  # брошенный диалог удаляется через сутки
+    CONVERSATION_FLUSH_INTERVAL = float(os.getenv('CONVERSATION_FLUSH_INTERVAL', '5'))
+    CONVERSATION_SWEEP_INTERVAL = int(os.getenv('CONVERSATION_SWEEP_INTERVAL', '600'))
+    # Перечитывать состояние перед каждым обновлением (несколько процессов бота)
+    CONVERSATION_SHARED = os.getenv('CONVERSATION_SHARED', '0') == '1'
+    
+    # Импорт и экспорт напоминаний
+    IMPORT_MAX_BYTES = int(os.getenv('IMPORT_MAX_BYTES', str(5 * 1024 * 1024)))
+    IMPORT_MAX_REMINDERS = int(os.getenv('IMPORT_MAX_REMINDERS', '10000'))
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '500'))
+    
+    # Архив выполненных и отмененных напоминаний
+    ARCHIVE_DB_PATH = os.getenv('ARCHIVE_DB_PATH', '')  # пусто - таблица reminders_archive в основной базе
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '30'))
+    ARCHIVE_INTERVAL = int(os.getenv('ARCHIVE_INTERVAL', '3600'))  # секунд между запусками
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+    ARCHIVE_BATCH_PAUSE = float(os.getenv('ARCHIVE_BATCH_PAUSE', '0.5'))  # пауза между пачками, секунд
+    
+    # Обслуживание базы (ANALYZE, optimize, checkpoint, incremental vacuum)
+    MAINTENANCE_INTERVAL = int(os.getenv('MAINTENANCE_INTERVAL', '900'))  # как часто проверять, секунд
+    MAINTENANCE_QUIET_WINDOW = int(os.getenv('MAINTENANCE_QUIET_WINDOW', '120'))  # без напоминаний столько секунд вперед
+    MAINTENANCE_VACUUM_PAGES = int(os.getenv('MAINTENANCE_VACUUM_PAGES', '1000'))
+    
+    # Кэш счетчиков пользователей и напоминаний для /dbinfo и бэкапов, секунд
+    COUNTERS_CACHE_TTL = float(os.getenv('COUNTERS_CACHE_TTL', '30'))
+    
+    # Рассылки администратора
+    BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '25'))  # сообщений в секунду (лимит Telegram ~30)
+    BROADCAST_SENDERS = int(os.getenv('BROADCAST_SENDERS', '8'))
+    BROADCAST_CHUNK_SIZE = int(os.getenv('BROADCAST_CHUNK_SIZE', '1000'))
+    BROADCAST_PROGRESS_INTERVAL = float(os.getenv('BROADCAST_PROGRESS_INTERVAL', '10'))
+    
+    # Доставка напоминаний: 'embedded' - планировщик внутри процесса бота,
+    # 'workers' - отдельные процессы workers.py, делящие напоминания на шарды по user_id
+    DELIVERY_MODE = os.getenv('DELIVERY_MODE', 'embedded')
+    WORKER_POLL_INTERVAL = float(os.getenv('WORKER_POLL_INTERVAL', '1'))
+    WORKER_HEARTBEAT_TIMEOUT = int(os.getenv('WORKER_HEARTBEAT_TIMEOUT', '15'))
+    WORKER_BATCH_SIZE = int(os.getenv('WORKER_BATCH_SIZE', '100'))
+    
+    # Хранение запланированных напоминаний во встроенном режиме: 'apscheduler' - задача на напоминание,
+    # 'wheel' - колесо таймеров (только id и секунда срабатывания, данные читаются из базы при срабатывании)
+    SCHEDULER_BACKEND = os.getenv('SCHEDULER_BACKEND', 'apscheduler')
+    
+    # Фоновая загрузка напоминаний в планировщик при старте
+    HYDRATION_CHUNK_SIZE = int(os.getenv('HYDRATION_CHUNK_SIZE', '1000'))
+    HYDRATION_CHUNK_PAUSE = float(os.getenv('HYDRATION_CHUNK_PAUSE', '0.01'))
+    
+    # Захват напоминаний и повторные попытки отправки
+    DELIVERY_LEASE_SECONDS = int(os.getenv('DELIVERY_LEASE_SECONDS', '60'))
+    DELIVERY_MAX_ATTEMPTS = int(os.getenv('DELIVERY_MAX_ATTEMPTS', '5'))
+    DELIVERY_RETRY_BASE = int(os.getenv('DELIVERY_RETRY_BASE', '5'))  # секунд, удваивается с каждой попыткой
+    DELIVERY_RETRY_MAX = int(os.getenv('DELIVERY_RETRY_MAX', '3600'))
+    
+    # Объединение напоминаний и уведомлений одному чату, наступивших в одно окно (0 - отключено);
+    # окно - задержка каждой отправки, о которой не объявлено заранее
+    COALESCE_WINDOW = float(os.getenv('COALESCE_WINDOW', '0.05'))  # секунд
+    COALESCE_MAX_MESSAGES = int(os.getenv('COALESCE_MAX_MESSAGES', '10'))
+    
+    # Напоминания, пропущенные за время простоя: просроченные дольше CATCHUP_GRACE_SECONDS
+    # отправляются одной сводкой на пользователя при старте и раз в CATCHUP_INTERVAL секунд
+    CATCHUP_GRACE_SECONDS = int(os.getenv('CATCHUP_GRACE_SECONDS', '60'))
+    CATCHUP_INTERVAL = int(os.getenv('CATCHUP_INTERVAL', '60'))
+    CATCHUP_BATCH_SIZE = int(os.getenv('CATCHUP_BATCH_SIZE', '1000'))
+    CATCHUP_RATE = float(os.getenv('CATCHUP_RATE', '20'))  # сводок в секунду
+    
+    # Повестка /agenda: период по умолчанию и максимальный, дней
+    AGENDA_DEFAULT_DAYS = int(os.getenv('AGENDA_DEFAULT_DAYS', '7'))
+    AGENDA_MAX_DAYS = int(os.getenv('AGENDA_MAX_DAYS', '31'))
+    
+    # Поиск /find и inline режим
+    SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '5'))
+    SEARCH_INLINE_LIMIT = int(os.getenv('SEARCH_INLINE_LIMIT', '20'))
+    SEARCH_MAX_WORDS = int(os.getenv('SEARCH_MAX_WORDS', '8'))
+    SEARCH_MAX_MATCHES = int(os.getenv('SEARCH_MAX_MATCHES', '1000'))  # совпадений, из которых выбираются лучшие
+    
+    # Прогноз нагрузки: срабатывания по минутам на FORECAST_HOURS часов вперед, окно сдвигается
+    # раз в FORECAST_ROLL_INTERVAL секунд. При FORECAST_EARLY_SECONDS > 0 процессы доставки перед
+    # минутой, на которую прогноз не меньше FORECAST_SPIKE_FIRES, начинают отправку на столько секунд раньше
+    FORECAST_HOURS = int(os.getenv('FORECAST_HOURS', '48'))
+    FORECAST_ROLL_INTERVAL = int(os.getenv('FORECAST_ROLL_INTERVAL', '60'))
+    FORECAST_EARLY_SECONDS = int(os.getenv('FORECAST_EARLY_SECONDS', '0'))
+    FORECAST_SPIKE_FIRES = int(os.getenv('FORECAST_SPIKE_FIRES', '500'))
+    
     # Настройки повторений
     REPEAT_OPTIONS = {
         'once': 'Один раз',
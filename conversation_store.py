@@ -0,0 +1,362 @@
+import asyncio
+import dbm
+import json
+import logging
+import os
+import sqlite3
+import struct
+import time
+from datetime import datetime
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from config import Config
+
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError:  # нужен только для CONVERSATION_BACKEND=postgres
+    ConnectionPool = None
+
+# Короткие ключи для полей пошагового создания напоминания
+KEY_ALIASES = {
+    'reminder_state': 's',
+    'reminder_text': 't',
+    'reminder_time': 'w',
+    'category': 'c',
+    'repeat_type': 'r',
+    'notify_before': 'n',
+    'started_at': 'a',
+}
+KEY_NAMES = {alias: key for key, alias in KEY_ALIASES.items()}
+
+# Состояния диалога хранятся номерами
+STATES = ['waiting_text', 'waiting_time', 'waiting_category', 'waiting_repeat', 'waiting_notification', 'waiting_rule']
+
+
+def encode_state(data):
+    """Компактная сериализация user_data в JSON с короткими ключами"""
+    compact = {}
+    for key, value in data.items():
+        if key == 'reminder_state' and value in STATES:
+            value = STATES.index(value)
+        elif isinstance(value, datetime):
+            value = {'$d': round((value - datetime(1970, 1, 1)).total_seconds(), 6)}
+        compact[KEY_ALIASES.get(key, key)] = value
+    return json.dumps(compact, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def decode_state(payload):
+    """Обратное преобразование encode_state"""
+    data = {}
+    for alias, value in json.loads(payload).items():
+        key = KEY_NAMES.get(alias, alias)
+        if key == 'reminder_state' and isinstance(value, int):
+            value = STATES[value]
+        elif isinstance(value, dict) and '$d' in value:
+            value = datetime.utcfromtimestamp(value['$d'])
+        data[key] = value
+    return data
+
+
+class SQLiteStateStore:
+    """Хранилище состояний диалогов в таблице conversation_state основной базы"""
+
+    def __init__(self, db_name=None):
+        self.db_name = db_name or Config.DB_PATH
+        conn = sqlite3.connect(self.db_name)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_state (
+                user_id INTEGER PRIMARY KEY,
+                state BLOB NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def load_all(self, min_updated_at):
+        conn = sqlite3.connect(self.db_name)
+        rows = conn.execute(
+            'SELECT user_id, state, updated_at FROM conversation_state WHERE updated_at >= ?',
+            (min_updated_at,)
+        ).fetchall()
+        conn.close()
+        return rows
+
+    def load(self, user_id):
+        conn = sqlite3.connect(self.db_name)
+        row = conn.execute(
+            'SELECT state, updated_at FROM conversation_state WHERE user_id = ?', (user_id,)
+        ).fetchone()
+        conn.close()
+        return row
+
+    def write_many(self, saves, deletes):
+        """Запись пачки изменений одной транзакцией"""
+        conn = sqlite3.connect(self.db_name)
+        conn.executemany('''
+            INSERT INTO conversation_state (user_id, state, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+        ''', saves)
+        conn.executemany('DELETE FROM conversation_state WHERE user_id = ?', [(user_id,) for user_id in deletes])
+        conn.commit()
+        conn.close()
+
+    def expire(self, before):
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.execute('DELETE FROM conversation_state WHERE updated_at < ?', (before,))
+        expired = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return expired
+
+    def close(self):
+        pass
+
+
+class PostgresStateStore:
+    """Хранилище состояний диалогов в таблице conversation_state PostgreSQL.
+
+    Использует пул хранилища напоминаний, если оно тоже в PostgreSQL, иначе открывает свой.
+    """
+
+    def __init__(self, pool=None):
+        self._own_pool = pool is None
+        if pool is None:
+            if ConnectionPool is None:
+                raise RuntimeError('PostgreSQL conversation state requires psycopg: pip install "psycopg[binary,pool]"')
+            pool = ConnectionPool(Config.POSTGRES_DSN, min_size=1, max_size=2, open=True)
+        self.pool = pool
+        with self.pool.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS conversation_state (
+                    user_id BIGINT PRIMARY KEY,
+                    state BYTEA NOT NULL,
+                    updated_at DOUBLE PRECISION NOT NULL
+                )
+            ''')
+
+    def load_all(self, min_updated_at):
+        with self.pool.connection() as conn:
+            return conn.execute(
+                'SELECT user_id, state, updated_at FROM conversation_state WHERE updated_at >= %s',
+                (min_updated_at,)
+            ).fetchall()
+
+    def load(self, user_id):
+        with self.pool.connection() as conn:
+            return conn.execute(
+                'SELECT state, updated_at FROM conversation_state WHERE user_id = %s', (user_id,)
+            ).fetchone()
+
+    def write_many(self, saves, deletes):
+        """Запись пачки изменений одной транзакцией"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.executemany('''
+                    INSERT INTO conversation_state (user_id, state, updated_at) VALUES (%s, %s, %s)
+                    ON CONFLICT (user_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+                ''', saves)
+                cursor.executemany('DELETE FROM conversation_state WHERE user_id = %s', [(user_id,) for user_id in deletes])
+
+    def expire(self, before):
+        with self.pool.connection() as conn:
+            return conn.execute('DELETE FROM conversation_state WHERE updated_at < %s', (before,)).rowcount
+
+    def close(self):
+        if self._own_pool:
+            self.pool.close()
+
+
+class FileStateStore:
+    """Хранилище состояний диалогов в локальном key-value файле (dbm)"""
+
+    HEADER = struct.Struct('>d')  # время обновления перед сериализованным состоянием
+
+    def __init__(self, path=None):
+        self.path = path or Config.CONVERSATION_FILE
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.db = dbm.open(self.path, 'c')
+
+    def _unpack(self, value):
+        updated_at, = self.HEADER.unpack_from(value)
+        return value[self.HEADER.size:], updated_at
+
+    def load_all(self, min_updated_at):
+        rows = []
+        for key in self.db.keys():
+            state, updated_at = self._unpack(self.db[key])
+            if updated_at >= min_updated_at:
+                rows.append((int(key), state, updated_at))
+        return rows
+
+    def load(self, user_id):
+        value = self.db.get(str(user_id))
+        return self._unpack(value) if value is not None else None
+
+    def write_many(self, saves, deletes):
+        for user_id, state, updated_at in saves:
+            self.db[str(user_id)] = self.HEADER.pack(updated_at) + state
+        for user_id in deletes:
+            key = str(user_id)
+            if key in self.db:
+                del self.db[key]
+        if hasattr(self.db, 'sync'):
+            self.db.sync()
+
+    def expire(self, before):
+        expired = [key for key in self.db.keys() if self._unpack(self.db[key])[1] < before]
+        for key in expired:
+            del self.db[key]
+        return len(expired)
+
+    def close(self):
+        self.db.close()
+
+
+class ConversationPersistence(BasePersistence):
+    """Сохранение пошагового создания напоминаний между перезапусками.
+
+    Хранится только user_data. Изменения копятся в памяти и пишутся в хранилище
+    пачкой (write-behind) раз в update_interval секунд, брошенные диалоги
+    удаляются по TTL. В режиме shared перед каждым обновлением состояние
+    перечитывается из хранилища, если его изменил другой процесс.
+    """
+
+    def __init__(self, store, ttl, update_interval, shared=False):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.store = store
+        self.ttl = ttl
+        self.shared = shared
+        self._pending_saves = {}
+        self._pending_deletes = set()
+        self._write_scheduled = False
+        self._synced_at = {}  # время последней записи/чтения состояния этим процессом
+
+    def _schedule_write(self):
+        # PTB вызывает update_user_data для всех измененных пользователей подряд,
+        # поэтому запись откладывается до конца этой пачки
+        if not self._write_scheduled:
+            self._write_scheduled = True
+            asyncio.get_running_loop().call_soon(self.write_pending)
+
+    def write_pending(self):
+        """Запись накопленных изменений одной транзакцией"""
+        self._write_scheduled = False
+        if not self._pending_saves and not self._pending_deletes:
+            return
+        saves = list(self._pending_saves.values())
+        deletes = list(self._pending_deletes)
+        self._pending_saves.clear()
+        self._pending_deletes.clear()
+        try:
+            self.store.write_many(saves, deletes)
+        except Exception as e:
+            logging.error(f"Error writing conversation state: {e}")
+
+    async def get_user_data(self):
+        min_updated_at = time.time() - self.ttl
+        user_data = {}
+        for user_id, state, updated_at in self.store.load_all(min_updated_at):
+            user_data[user_id] = decode_state(state)
+            if self.shared:
+                self._synced_at[user_id] = updated_at
+        logging.info(f"Restored {len(user_data)} conversation states")
+        return user_data
+
+    async def update_user_data(self, user_id, data):
+        now = time.time()
+        if data:
+            self._pending_saves[user_id] = (user_id, encode_state(data), now)
+            self._pending_deletes.discard(user_id)
+        else:
+            # Пустое состояние не храним
+            self._pending_saves.pop(user_id, None)
+            self._pending_deletes.add(user_id)
+        if self.shared:
+            self._synced_at[user_id] = now
+        self._schedule_write()
+
+    async def drop_user_data(self, user_id):
+        self._pending_saves.pop(user_id, None)
+        self._pending_deletes.add(user_id)
+        self._synced_at.pop(user_id, None)
+        self._schedule_write()
+
+    async def refresh_user_data(self, user_id, user_data):
+        if not self.shared or user_id in self._pending_saves:
+            return
+        row = self.store.load(user_id)
+        if row is None:
+            return
+        state, updated_at = row
+        if updated_at > self._synced_at.get(user_id, 0):
+            user_data.clear()
+            user_data.update(decode_state(state))
+            self._synced_at[user_id] = updated_at
+
+    def expire(self):
+        """Удаление брошенных диалогов из хранилища"""
+        before = time.time() - self.ttl
+        for user_id in [user_id for user_id, synced in self._synced_at.items() if synced < before]:
+            del self._synced_at[user_id]
+        return self.store.expire(before)
+
+    async def flush(self):
+        self.write_pending()
+        self.store.close()
+
+    # Остальные данные PTB не сохраняются
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        return {}
+
+    async def update_conversation(self, name, key, new_state):
+        pass
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+
+def create_persistence(db=None):
+    """Хранилище состояний диалогов по настройке CONVERSATION_BACKEND, None - только в памяти.
+
+    db - хранилище напоминаний: с PostgreSQL состояния пишутся через его пул.
+    """
+    if Config.CONVERSATION_BACKEND == 'sqlite':
+        store = SQLiteStateStore()
+    elif Config.CONVERSATION_BACKEND == 'postgres':
+        store = PostgresStateStore(getattr(db, 'pool', None))
+    elif Config.CONVERSATION_BACKEND == 'file':
+        store = FileStateStore()
+    else:
+        return None
+    return ConversationPersistence(
+        store, Config.CONVERSATION_TTL, Config.CONVERSATION_FLUSH_INTERVAL, Config.CONVERSATION_SHARED
+    )
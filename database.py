@@ -1,22 +1,58 @@
 import sqlite3
+import json
 import logging
 import os
-import shutil
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 from config import Config
+import forecast
+from storage import Storage
+from utils import TimeParser
 
-class Database:
+class Database(Storage):
     def __init__(self, db_name=None):
         self.db_name = db_name or Config.DB_PATH
+        # Архив старых напоминаний: таблица в основной базе или в отдельном файле (ATTACH)
+        self.archive_path = Config.ARCHIVE_DB_PATH or None
+        self.archive_table = 'archive.reminders_archive' if self.archive_path else 'reminders_archive'
+        self._counters_cache = None  # (время устаревания, счетчики)
         # Создаем директорию для базы данных если её нет
         os.makedirs(os.path.dirname(self.db_name), exist_ok=True)
         self.init_db()
 
+    # Версия схемы в PRAGMA user_version; увеличивается при любом изменении init_db или MIGRATIONS
+    SCHEMA_VERSION = 6
+
+    def _schema_is_current(self, cursor):
+        cursor.execute('PRAGMA user_version')
+        if cursor.fetchone()[0] != self.SCHEMA_VERSION:
+            return False
+        if self.archive_path:
+            cursor.execute('PRAGMA archive.user_version')
+            return cursor.fetchone()[0] == self.SCHEMA_VERSION
+        return True
+
     def init_db(self):
         """Инициализация улучшенной базы данных"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect_with_archive()
         cursor = conn.cursor()
         
+        # Освобожденные страницы возвращаются частями через incremental_vacuum
+        # (действует только для новой пустой базы, существующую нужно перевести вручную, см. README)
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        
+        # WAL: чтение не блокирует запись процессов доставки и бота. Режим хранится в файле базы,
+        # поэтому включается и для уже существующих баз; контрольные точки делает обслуживание
+        cursor.execute('PRAGMA journal_mode = WAL')
+        if self.archive_path:
+            cursor.execute('PRAGMA archive.journal_mode = WAL')
+        
+        # Схема уже актуальна - DDL при старте не выполняется
+        if self._schema_is_current(cursor):
+            conn.close()
+            logging.info(f"Database schema v{self.SCHEMA_VERSION} is up to date at {self.db_name}")
+            return
+        
         # Таблица пользователей
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -70,18 +106,356 @@ class Database:
             )
         ''')
         
+        # Таблица процессов доставки (режим workers)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS delivery_workers (
+                worker_id TEXT PRIMARY KEY,
+                hostname TEXT,
+                pid INTEGER,
+                started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                heartbeat DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Таблица рассылок администратора (прогресс хранится для продолжения после перезапуска)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS broadcasts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id INTEGER NOT NULL,
+                message_text TEXT NOT NULL,
+                status TEXT DEFAULT 'running',
+                last_user_id INTEGER DEFAULT 0,
+                sent_count INTEGER DEFAULT 0,
+                failed_count INTEGER DEFAULT 0,
+                progress_message_id INTEGER,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Последние запуски обслуживания базы
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS maintenance_log (
+                task TEXT PRIMARY KEY,
+                last_run DATETIME,
+                duration_ms REAL,
+                result TEXT
+            )
+        ''')
+        
+        # Прогноз нагрузки: число срабатываний на каждую минуту окна прогноза
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS load_forecast (
+                minute DATETIME PRIMARY KEY,
+                fires INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        
+        # Архив выполненных и отмененных напоминаний
+        schema = 'archive.' if self.archive_path else ''
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {self.archive_table} (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                reminder_text TEXT NOT NULL,
+                reminder_time DATETIME NOT NULL,
+                category TEXT,
+                repeat_type TEXT,
+                status TEXT,
+                notify_before INTEGER,
+                created_at DATETIME,
+                updated_at DATETIME,
+                archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS {schema}idx_reminders_archive_user
+            ON reminders_archive (user_id, reminder_time)
+        ''')
+        
+        self._migrate(cursor)
+        self._create_search_index(cursor)
+        
+        # Счетчики строк, которые поддерживаются триггерами (вместо COUNT(*) по всей таблице)
+        self._create_counters(cursor, '', 'users')
+        self._create_counters(cursor, '', 'reminders')
+        self._create_counters(cursor, schema, 'reminders_archive')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_reminders_status_time
+            ON reminders (status, reminder_time)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_reminders_user_status
+            ON reminders (user_id, status)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_reminders_forecast
+            ON reminders (forecast_next) WHERE forecast_next IS NOT NULL
+        ''')
+        self._init_forecast(cursor)
+        
+        cursor.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+        if self.archive_path:
+            cursor.execute(f'PRAGMA archive.user_version = {self.SCHEMA_VERSION}')
+        
         conn.commit()
         conn.close()
         logging.info(f"Database initialized successfully at {self.db_name}")
 
+    # Колонки, добавленные после первой версии схемы: (таблица, колонка, определение)
+    MIGRATIONS = [
+        ('reminders', 'notified', 'INTEGER DEFAULT 0'),
+        ('reminders', 'claimed_by', 'TEXT'),
+        ('reminders', 'claimed_until', 'DATETIME'),
+        ('reminders', 'attempts', 'INTEGER DEFAULT 0'),
+        # JSON список минут уведомлений заранее, если их несколько (иначе NULL и используется notify_before)
+        ('reminders', 'notify_offsets', 'TEXT'),
+        # Самое раннее срабатывание первого повторения, еще не учтенного в load_forecast (NULL - учтены все)
+        ('reminders', 'forecast_next', 'DATETIME'),
+        # 0 - бот заблокирован или аккаунт удален: напоминания пользователя приостановлены до /start
+        ('users', 'is_active', 'INTEGER DEFAULT 1'),
+        # Попытки текущего уведомления заранее и время следующей (NULL - уведомление еще не падало)
+        ('reminders', 'notify_attempts', 'INTEGER DEFAULT 0'),
+        ('reminders', 'notify_retry_at', 'DATETIME'),
+    ]
+
+    def _migrate(self, cursor):
+        """Добавление недостающих колонок в существующие таблицы"""
+        for table, column, definition in self.MIGRATIONS:
+            cursor.execute(f'PRAGMA table_info({table})')
+            columns = [row[1] for row in cursor.fetchall()]
+            if column not in columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+                logging.info(f"Column {table}.{column} added")
+
+    def _create_search_index(self, cursor):
+        """Полнотекстовый индекс FTS5 по тексту напоминаний, который поддерживается триггерами.
+
+        Текст хранится только в reminders (external content). user_id индексируется как
+        отдельная колонка: поиск ограничивается токеном владельца внутри самого индекса.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'reminders_fts'")
+        exists = cursor.fetchone() is not None
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS reminders_fts USING fts5(
+                reminder_text, user_id,
+                content='reminders', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5'
+            )
+        ''')
+        new_text = self.SEARCH_TEXT_SQL.format('new.reminder_text')
+        old_text = self.SEARCH_TEXT_SQL.format('old.reminder_text')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_reminders_fts_insert AFTER INSERT ON reminders
+            BEGIN
+                INSERT INTO reminders_fts (rowid, reminder_text, user_id) VALUES (new.id, {new_text}, new.user_id);
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_reminders_fts_delete AFTER DELETE ON reminders
+            BEGIN
+                INSERT INTO reminders_fts (reminders_fts, rowid, reminder_text, user_id)
+                VALUES ('delete', old.id, {old_text}, old.user_id);
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_reminders_fts_update AFTER UPDATE OF reminder_text, user_id ON reminders
+            BEGIN
+                INSERT INTO reminders_fts (reminders_fts, rowid, reminder_text, user_id)
+                VALUES ('delete', old.id, {old_text}, old.user_id);
+                INSERT INTO reminders_fts (rowid, reminder_text, user_id) VALUES (new.id, {new_text}, new.user_id);
+            END
+        ''')
+        
+        # Существующие напоминания индексируются один раз, дальше индекс ведут триггеры
+        if not exists:
+            cursor.execute(f'''
+                INSERT INTO reminders_fts (rowid, reminder_text, user_id)
+                SELECT id, {self.SEARCH_TEXT_SQL.format('reminder_text')}, user_id FROM reminders
+            ''')
+            logging.info("Search index built")
+
+    def _create_counters(self, cursor, schema, table):
+        """Счетчик строк таблицы в global_counters той же базы и триггеры, которые его обновляют"""
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {schema}global_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+        for event, delta in (('INSERT', '+ 1'), ('DELETE', '- 1')):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {schema}trg_{table}_count_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE global_counters SET value = value {delta} WHERE name = '{table}';
+                END
+            ''')
+        
+        # Начальное значение считается один раз; пока строки счетчика нет, триггеры ничего не меняют
+        cursor.execute(f'SELECT 1 FROM {schema}global_counters WHERE name = ?', (table,))
+        if cursor.fetchone() is None:
+            cursor.execute(f'''
+                INSERT OR IGNORE INTO {schema}global_counters (name, value)
+                SELECT ?, COUNT(*) FROM {schema}{table}
+            ''', (table,))
+            logging.info(f"Counter for {table} initialized")
+
+    def get_counters(self):
+        """Число пользователей и напоминаний из global_counters с кэшем на COUNTERS_CACHE_TTL секунд"""
+        cache = self._counters_cache
+        if cache is not None and cache[0] > time.monotonic():
+            return cache[1]
+        
+        conn = self._connect_with_archive()
+        cursor = conn.cursor()
+        archive_counters = 'archive.global_counters' if self.archive_path else 'global_counters'
+        cursor.execute(f'''
+            SELECT
+                (SELECT value FROM global_counters WHERE name = 'users'),
+                (SELECT value FROM global_counters WHERE name = 'reminders'),
+                (SELECT value FROM {archive_counters} WHERE name = 'reminders_archive')
+        ''')
+        users, reminders, archived = cursor.fetchone()
+        conn.close()
+        
+        counters = {
+            'users': users or 0,
+            'reminders': (reminders or 0) + (archived or 0),
+            'archived': archived or 0,
+        }
+        self._counters_cache = (time.monotonic() + Config.COUNTERS_CACHE_TTL, counters)
+        return counters
+
+    def _connect_with_archive(self):
+        """Соединение, в котором доступна таблица архива"""
+        conn = sqlite3.connect(self.db_name)
+        if self.archive_path:
+            conn.execute('ATTACH DATABASE ? AS archive', (self.archive_path,))
+        return conn
+
+    def _init_forecast(self, cursor):
+        """Начальное заполнение гистограммы прогноза; как и счетчики, считается один раз по всей таблице"""
+        cursor.execute("SELECT 1 FROM global_counters WHERE name = 'forecast_until'")
+        if cursor.fetchone() is not None:
+            return
+        until = datetime.utcnow() + timedelta(hours=Config.FORECAST_HOURS)
+        cursor.execute(f"SELECT {self.FORECAST_COLUMNS} FROM reminders WHERE status = 'active'")
+        self._forecast_track_rows(cursor, cursor.fetchall(), until)
+        cursor.execute('''
+            INSERT INTO global_counters (name, value) VALUES ('forecast_until', ?)
+        ''', (int((until - forecast.EPOCH).total_seconds()),))
+        logging.info("Load forecast initialized")
+
+    def _forecast_until(self, cursor):
+        """Граница окна прогноза (секунды Unix в global_counters)"""
+        cursor.execute("SELECT value FROM global_counters WHERE name = 'forecast_until'")
+        row = cursor.fetchone()
+        return forecast.EPOCH + timedelta(seconds=row[0]) if row else None
+
+    def _forecast_rows(self, cursor, reminder_ids):
+        cursor.execute(f'''
+            SELECT {self.FORECAST_COLUMNS} FROM reminders
+            WHERE id IN (SELECT value FROM json_each(?)) AND status = 'active'
+        ''', (json.dumps(list(reminder_ids)),))
+        return cursor.fetchall()
+
+    def _forecast_apply(self, cursor, counts, sign):
+        """Прибавление (sign=1) или вычитание (sign=-1) срабатываний по минутам"""
+        if sign > 0:
+            cursor.executemany('''
+                INSERT INTO load_forecast (minute, fires) VALUES (?, ?)
+                ON CONFLICT(minute) DO UPDATE SET fires = fires + excluded.fires
+            ''', counts.items())
+        else:
+            cursor.executemany('UPDATE load_forecast SET fires = fires - ? WHERE minute = ?',
+                               [(fires, minute) for minute, fires in counts.items()])
+            cursor.execute('DELETE FROM load_forecast WHERE fires <= 0')
+
+    def _forecast_track_rows(self, cursor, rows, until, from_marks=False):
+        """Учет срабатываний напоминаний до границы окна и сдвиг их forecast_next (см. _forecast_counts)"""
+        total, marks = self._forecast_counts(rows, until, from_marks)
+        cursor.executemany('UPDATE reminders SET forecast_next = ? WHERE id = ?', marks)
+        self._forecast_apply(cursor, total, 1)
+
+    def _forecast_track(self, cursor, reminder_ids):
+        """Учет активных напоминаний в прогнозе (после вставки или изменения, в той же транзакции)"""
+        until = self._forecast_until(cursor)
+        if until is not None:
+            self._forecast_track_rows(cursor, self._forecast_rows(cursor, reminder_ids), until)
+
+    def _forecast_untrack(self, cursor, reminder_ids):
+        """Вычитание учтенных будущих срабатываний (до изменения, завершения или удаления, под блокировкой записи)"""
+        until = self._forecast_until(cursor)
+        if until is None:
+            return
+        total = self._forecast_counted(self._forecast_rows(cursor, reminder_ids), until)
+        cursor.execute('''
+            UPDATE reminders SET forecast_next = NULL WHERE id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(list(reminder_ids)),))
+        self._forecast_apply(cursor, total, -1)
+
+    def roll_forecast(self, hours):
+        """Сдвиг окна прогноза к now + hours.
+        
+        В гистограмму добавляются только повторения, вошедшие в окно: напоминания
+        выбираются по индексу forecast_next, а не перебором таблицы. Прошедшие минуты
+        удаляются. Возвращает число обработанных напоминаний.
+        """
+        now = datetime.utcnow()
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        until = max(self._forecast_until(cursor) or now, now + timedelta(hours=hours))
+        cursor.execute(f'''
+            SELECT {self.FORECAST_COLUMNS} FROM reminders
+            WHERE forecast_next < ? AND status = 'active'
+        ''', (until,))
+        rows = cursor.fetchall()
+        self._forecast_track_rows(cursor, rows, until, from_marks=True)
+        
+        cursor.execute('DELETE FROM load_forecast WHERE minute < ?', (forecast.minute_of(now),))
+        cursor.execute('''
+            INSERT INTO global_counters (name, value) VALUES ('forecast_until', ?)
+            ON CONFLICT(name) DO UPDATE SET value = excluded.value
+        ''', (int((until - forecast.EPOCH).total_seconds()),))
+        
+        conn.commit()
+        conn.close()
+        return len(rows)
+
+    def get_load_forecast(self, start, end):
+        """Гистограмма прогноза: (минута UTC, число срабатываний) в [start, end) по возрастанию"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT minute, fires FROM load_forecast
+            WHERE minute >= ? AND minute < ?
+            ORDER BY minute
+        ''', (start, end))
+        
+        buckets = [(TimeParser.parse_db_time(minute), fires) for minute, fires in cursor.fetchall()]
+        conn.close()
+        return buckets
+
     def add_or_update_user(self, user_id, username=None, first_name=None, last_name=None):
         """Добавление или обновление информации о пользователе"""
         conn = sqlite3.connect(self.db_name)
         cursor = conn.cursor()
         
+        # Upsert вместо INSERT OR REPLACE: замена удаляла строку без срабатывания
+        # триггера счетчика и сбрасывала created_at
         cursor.execute('''
-            INSERT OR REPLACE INTO users (user_id, username, first_name, last_name, last_active)
+            INSERT INTO users (user_id, username, first_name, last_name, last_active)
             VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(user_id) DO UPDATE SET
+                username = excluded.username,
+                first_name = excluded.first_name,
+                last_name = excluded.last_name,
+                last_active = CURRENT_TIMESTAMP
         ''', (user_id, username, first_name, last_name))
         
         conn.commit()
@@ -99,6 +473,62 @@ class Database:
         
         return user
 
+    def deactivate_user(self, user_id):
+        """Пометка пользователя недоступным (бот заблокирован или аккаунт удален).
+        
+        Все активные напоминания пользователя приостанавливаются (статус paused) и выходят
+        из прогноза той же транзакцией, захваты процессов доставки снимаются. Возвращает
+        id приостановленных напоминаний, чтобы убрать их из планировщика.
+        """
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        cursor.execute('UPDATE users SET is_active = 0 WHERE user_id = ?', (user_id,))
+        cursor.execute("SELECT id FROM reminders WHERE user_id = ? AND status = 'active'", (user_id,))
+        reminder_ids = [row[0] for row in cursor.fetchall()]
+        self._forecast_untrack(cursor, reminder_ids)
+        
+        cursor.execute('''
+            UPDATE reminders
+            SET status = 'paused', claimed_by = NULL, claimed_until = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = ? AND status = 'active'
+        ''', (user_id,))
+        
+        conn.commit()
+        conn.close()
+        logging.info(f"User {user_id} deactivated, {len(reminder_ids)} reminders paused")
+        return reminder_ids
+
+    def reactivate_user(self, user_id):
+        """Снятие пометки недоступности и возобновление приостановленных напоминаний.
+        
+        Для активного пользователя - один UPDATE без изменений. Возвращает возобновленные
+        напоминания (id, user_id, текст, время, повтор, notify_before, notify_offsets);
+        уже наступившие из них доставит сводка пропущенных.
+        """
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute('UPDATE users SET is_active = 1 WHERE user_id = ? AND is_active = 0 RETURNING user_id', (user_id,))
+        if not cursor.fetchone():
+            conn.close()
+            return []
+        
+        cursor.execute('''
+            UPDATE reminders
+            SET status = 'active', attempts = 0, updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = ? AND status = 'paused'
+            RETURNING id, user_id, reminder_text, reminder_time, repeat_type, notify_before, notify_offsets
+        ''', (user_id,))
+        reminders = cursor.fetchall()
+        self._forecast_track(cursor, [reminder[0] for reminder in reminders])
+        
+        conn.commit()
+        conn.close()
+        logging.info(f"User {user_id} reactivated, {len(reminders)} reminders resumed")
+        return reminders
+
     def get_all_users(self):
         """Получение списка всех пользователей"""
         conn = sqlite3.connect(self.db_name)
@@ -110,26 +540,117 @@ class Database:
         
         return users
 
+    def iter_users(self, after_user_id=0, chunk_size=1000, active_only=False):
+        """Обход пользователей пачками по возрастанию user_id.
+        
+        Каждая пачка читается отдельным запросом по ключу (user_id > последний
+        прочитанный), поэтому память не зависит от числа пользователей, а обход
+        можно продолжить с любого места. active_only - без пользователей, заблокировавших бота.
+        """
+        active_clause = 'AND is_active = 1' if active_only else ''
+        while True:
+            conn = sqlite3.connect(self.db_name)
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT user_id, username, first_name, last_name, created_at
+                FROM users
+                WHERE user_id > ? {active_clause}
+                ORDER BY user_id
+                LIMIT ?
+            ''', (after_user_id, chunk_size))
+            users = cursor.fetchall()
+            conn.close()
+            
+            if not users:
+                break
+            yield users
+            after_user_id = users[-1][0]
+
+    def create_broadcast(self, admin_id, message_text):
+        """Создание рассылки"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO broadcasts (admin_id, message_text)
+            VALUES (?, ?)
+        ''', (admin_id, message_text))
+        
+        broadcast_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        logging.info(f"Broadcast {broadcast_id} created by {admin_id}")
+        return broadcast_id
+
+    def get_broadcast(self, broadcast_id):
+        """Получение рассылки"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, admin_id, message_text, status, last_user_id, sent_count, failed_count, progress_message_id
+            FROM broadcasts WHERE id = ?
+        ''', (broadcast_id,))
+        broadcast = cursor.fetchone()
+        conn.close()
+        
+        return broadcast
+
+    def get_running_broadcasts(self):
+        """Незавершенные рассылки (для продолжения после перезапуска)"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT id FROM broadcasts WHERE status = 'running' ORDER BY id")
+        broadcast_ids = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        
+        return broadcast_ids
+
+    def update_broadcast(self, broadcast_id, **kwargs):
+        """Сохранение прогресса и статуса рассылки"""
+        allowed_fields = ['status', 'last_user_id', 'sent_count', 'failed_count', 'progress_message_id']
+        updates = {key: value for key, value in kwargs.items() if key in allowed_fields}
+        if not updates:
+            return
+        
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        set_clause = ', '.join(f"{field} = ?" for field in updates)
+        cursor.execute(f'''
+            UPDATE broadcasts 
+            SET {set_clause}, updated_at = CURRENT_TIMESTAMP 
+            WHERE id = ?
+        ''', list(updates.values()) + [broadcast_id])
+        
+        conn.commit()
+        conn.close()
+
     def add_reminder(self, user_id, reminder_text, reminder_time, category='other', repeat_type='once', notify_before=0):
-        """Добавление напоминания с дополнительными параметрами"""
+        """Добавление напоминания с дополнительными параметрами (notify_before - минуты или список минут)"""
         conn = sqlite3.connect(self.db_name)
         cursor = conn.cursor()
         
         # Сначала убедимся, что пользователь существует
         self.add_or_update_user(user_id)
         
+        notify_before, notify_offsets = self._notify_columns(notify_before)
         cursor.execute('''
-            INSERT INTO reminders (user_id, reminder_text, reminder_time, category, repeat_type, notify_before)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, reminder_text, reminder_time, category, repeat_type, notify_before))
+            INSERT INTO reminders (user_id, reminder_text, reminder_time, category, repeat_type, notify_before, notify_offsets)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, reminder_text, reminder_time, category, repeat_type, notify_before, notify_offsets))
         
         reminder_id = cursor.lastrowid
+        self._forecast_track(cursor, [reminder_id])
         
         # Обновляем статистику
         cursor.execute('''
-            INSERT OR REPLACE INTO user_stats (user_id, total_reminders, last_active)
-            VALUES (?, COALESCE((SELECT total_reminders FROM user_stats WHERE user_id = ?), 0) + 1, CURRENT_TIMESTAMP)
-        ''', (user_id, user_id))
+            INSERT INTO user_stats (user_id, total_reminders, last_active)
+            VALUES (?, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT(user_id) DO UPDATE SET
+                total_reminders = total_reminders + 1, last_active = CURRENT_TIMESTAMP
+        ''', (user_id,))
         
         conn.commit()
         conn.close()
@@ -137,81 +658,283 @@ class Database:
         logging.info(f"Reminder added for user {user_id}: {reminder_text}")
         return reminder_id
 
-    def get_reminder(self, reminder_id):
-        """Получение конкретного напоминания"""
+    def add_reminders_bulk(self, user_id, reminders):
+        """Добавление пачки напоминаний одной транзакцией.
+        
+        reminders - кортежи (text, reminder_time, category, repeat_type, notify_before).
+        Возвращает id добавленных напоминаний в том же порядке.
+        """
+        reminders = list(reminders)
+        if not reminders:
+            return []
+        
         conn = sqlite3.connect(self.db_name)
         cursor = conn.cursor()
+        # Блокировка записи с начала транзакции: id вставленных строк идут подряд
+        cursor.execute('BEGIN IMMEDIATE')
         
-        cursor.execute('SELECT * FROM reminders WHERE id = ?', (reminder_id,))
+        cursor.execute('''
+            INSERT INTO users (user_id) VALUES (?)
+            ON CONFLICT(user_id) DO UPDATE SET last_active = CURRENT_TIMESTAMP
+        ''', (user_id,))
         
-        reminder = cursor.fetchone()
+        cursor.executemany('''
+            INSERT INTO reminders (user_id, reminder_text, reminder_time, category, repeat_type, notify_before, notify_offsets)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(user_id, *reminder[:4], *self._notify_columns(reminder[4])) for reminder in reminders])
+        
+        cursor.execute('SELECT last_insert_rowid()')
+        last_id = cursor.fetchone()[0]
+        reminder_ids = list(range(last_id - len(reminders) + 1, last_id + 1))
+        self._forecast_track(cursor, reminder_ids)
+        
+        cursor.execute('''
+            INSERT INTO user_stats (user_id, total_reminders, last_active)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(user_id) DO UPDATE SET
+                total_reminders = total_reminders + excluded.total_reminders, last_active = CURRENT_TIMESTAMP
+        ''', (user_id, len(reminders)))
+        
+        conn.commit()
         conn.close()
         
-        return reminder
+        logging.info(f"{len(reminders)} reminders imported for user {user_id}")
+        return reminder_ids
 
-    def get_user_reminders(self, user_id, status=None):
-        """Получить напоминания пользователя с фильтрацией по статусу"""
+    def iter_user_reminders(self, user_id, status=None, chunk_size=500):
+        """Потоковое чтение напоминаний пользователя пачками (для экспорта)"""
         conn = sqlite3.connect(self.db_name)
         cursor = conn.cursor()
         
+        query = '''
+            SELECT reminder_text, reminder_time, category, repeat_type, notify_before
+            FROM reminders 
+            WHERE user_id = ?
+        '''
+        params = [user_id]
         if status:
-            cursor.execute('''
-                SELECT id, reminder_text, reminder_time, category, repeat_type, status
-                FROM reminders 
-                WHERE user_id = ? AND status = ?
-                ORDER BY reminder_time
-            ''', (user_id, status))
+            query += ' AND status = ?'
+            params.append(status)
+        cursor.execute(query + ' ORDER BY reminder_time', params)
+        
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    def get_reminder(self, reminder_id, user_id=None):
+        """Получение конкретного напоминания (с user_id - только если оно принадлежит пользователю)"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        if user_id is None:
+            cursor.execute('SELECT * FROM reminders WHERE id = ?', (reminder_id,))
         else:
-            cursor.execute('''
+            cursor.execute('SELECT * FROM reminders WHERE id = ? AND user_id = ?', (reminder_id, user_id))
+        
+        reminder = cursor.fetchone()
+        conn.close()
+        
+        return reminder
+
+    def get_user_reminders(self, user_id, status=None):
+        """Получить напоминания пользователя с фильтрацией по статусу (включая архив)"""
+        conn = self._connect_with_archive()
+        cursor = conn.cursor()
+        
+        condition = 'user_id = ?' + (' AND status = ?' if status else '')
+        params = [user_id, status] if status else [user_id]
+        query = f'''
+            SELECT id, reminder_text, reminder_time, category, repeat_type, status
+            FROM reminders 
+            WHERE {condition}
+        '''
+        # В архиве только выполненные и отмененные, для активных его не читаем
+        if status != 'active':
+            query += f'''
+                UNION ALL
                 SELECT id, reminder_text, reminder_time, category, repeat_type, status
-                FROM reminders 
-                WHERE user_id = ?
-                ORDER BY reminder_time
-            ''', (user_id,))
+                FROM {self.archive_table}
+                WHERE {condition}
+            '''
+            params = params * 2
+        cursor.execute(query + ' ORDER BY reminder_time', params)
         
         reminders = cursor.fetchall()
         conn.close()
         
         return reminders
 
-    def update_reminder_status(self, reminder_id, status):
-        """Обновление статуса напоминания"""
+    def search_reminders(self, user_id, text, limit=10, offset=0):
+        """Полнотекстовый поиск по напоминаниям пользователя.
+
+        Все слова ищутся по началу ("врач" находит "врачу") через индекс FTS5, где отбор
+        по владельцу тоже идет по индексу. Результаты упорядочены по релевантности, активные -
+        первыми. Возвращает строки (id, текст, время, категория, повтор, статус), как get_user_reminders.
+        """
+        words = self._search_words(text)
+        if not words:
+            return []
+        terms = ' AND '.join(f'"{word[:self.SEARCH_PREFIX_LENGTH]}"*' for word in words)
+
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+
+        # Унарный + не дает планировщику начать с индекса по user_id и проверять MATCH для
+        # каждой строки пользователя: сначала поиск по FTS, затем чтение найденных строк
+        cursor.execute('''
+            SELECT r.id, r.reminder_text, r.reminder_time, r.category, r.repeat_type, r.status
+            FROM reminders_fts
+            JOIN reminders r ON r.id = reminders_fts.rowid
+            WHERE reminders_fts MATCH ? AND +r.user_id = ?
+            LIMIT ?
+        ''', (f'user_id : "{int(user_id)}" AND reminder_text : ({terms})', user_id, Config.SEARCH_MAX_MATCHES))
+
+        matches = cursor.fetchall()
+        conn.close()
+
+        return self._rank_search(matches, words, limit, offset)
+
+    def get_agenda_reminders(self, user_id, until):
+        """Активные напоминания пользователя, первое срабатывание которых раньше until (для повестки)"""
         conn = sqlite3.connect(self.db_name)
         cursor = conn.cursor()
         
         cursor.execute('''
+            SELECT id, reminder_text, reminder_time, category, repeat_type
+            FROM reminders
+            WHERE user_id = ? AND status = 'active' AND reminder_time < ?
+        ''', (user_id, until))
+        
+        reminders = cursor.fetchall()
+        conn.close()
+        
+        return reminders
+
+    def update_reminder_status(self, reminder_id, status, user_id=None):
+        """Обновление статуса напоминания.
+        
+        С user_id напоминание меняется, только если принадлежит пользователю: проверка владельца,
+        снятие захвата процессом доставки и статистика - в одной транзакции. Возвращает, нашлось ли
+        напоминание.
+        """
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        self._forecast_untrack(cursor, [reminder_id])
+        
+        # Снятый захват не дает процессу доставки завершить доставку отмененного напоминания
+        owner_clause, params = self._owner_clause(reminder_id, user_id)
+        cursor.execute(f'''
             UPDATE reminders 
-            SET status = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (status, reminder_id))
+            SET status = ?, claimed_by = NULL, claimed_until = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE {owner_clause}
+            RETURNING user_id
+        ''', (status, *params))
+        row = cursor.fetchone()
+        
+        if not row:
+            conn.rollback()
+            conn.close()
+            return False
+        
+        self._forecast_track(cursor, [reminder_id])
         
         # Обновляем статистику
         if status == 'completed':
             cursor.execute('''
                 UPDATE user_stats 
                 SET completed_reminders = completed_reminders + 1
-                WHERE user_id = (SELECT user_id FROM reminders WHERE id = ?)
-            ''', (reminder_id,))
+                WHERE user_id = ?
+            ''', (row[0],))
         elif status == 'cancelled':
             cursor.execute('''
                 UPDATE user_stats 
                 SET cancelled_reminders = cancelled_reminders + 1
-                WHERE user_id = (SELECT user_id FROM reminders WHERE id = ?)
-            ''', (reminder_id,))
+                WHERE user_id = ?
+            ''', (row[0],))
         
         conn.commit()
         conn.close()
         logging.info(f"Reminder {reminder_id} status updated to {status}")
+        return True
 
-    def delete_reminder(self, reminder_id):
-        """Удаление напоминания"""
+    def set_notify_offsets(self, reminder_id, offsets):
+        """Замена списка уведомлений заранее; отметки об отправленных уведомлениях сбрасываются"""
+        notify_before, notify_offsets = self._notify_columns(offsets)
         conn = sqlite3.connect(self.db_name)
         cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        self._forecast_untrack(cursor, [reminder_id])
+        
+        cursor.execute('''
+            UPDATE reminders 
+            SET notify_before = ?, notify_offsets = ?, notified = 0, notify_retry_at = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (notify_before, notify_offsets, reminder_id))
+        self._forecast_track(cursor, [reminder_id])
+        
+        conn.commit()
+        conn.close()
+        logging.info(f"Reminder {reminder_id} notifications set to {offsets}")
+
+    def add_notify_offset(self, reminder_id, minutes, user_id=None):
+        """Добавление уведомления заранее к уже настроенным одной транзакцией.
+        
+        С user_id - только для напоминания пользователя. Возвращает обновленное напоминание
+        (как get_reminder) или None, если оно не найдено.
+        """
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        owner_clause, params = self._owner_clause(reminder_id, user_id)
+        cursor.execute(f'SELECT notify_before, notify_offsets FROM reminders WHERE {owner_clause}', params)
+        row = cursor.fetchone()
+        
+        if not row:
+            conn.rollback()
+            conn.close()
+            return None
+        
+        offsets = self._merge_notify_offset(row[0], row[1], minutes)
+        self._forecast_untrack(cursor, [reminder_id])
+        cursor.execute('''
+            UPDATE reminders 
+            SET notify_before = ?, notify_offsets = ?, notified = 0, notify_retry_at = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+            RETURNING *
+        ''', (*self._notify_columns(offsets), reminder_id))
+        reminder = cursor.fetchone()
+        self._forecast_track(cursor, [reminder_id])
+        
+        conn.commit()
+        conn.close()
+        logging.info(f"Reminder {reminder_id} notifications set to {offsets}")
+        return reminder
+
+    def delete_reminder(self, reminder_id, user_id=None):
+        """Удаление напоминания (с user_id - только напоминания пользователя); возвращает, нашлось ли оно"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        self._forecast_untrack(cursor, [reminder_id])
+        
+        owner_clause, params = self._owner_clause(reminder_id, user_id)
+        cursor.execute(f'DELETE FROM reminders WHERE {owner_clause} RETURNING id', params)
+        if not cursor.fetchone():
+            conn.rollback()
+            conn.close()
+            return False
         
-        cursor.execute('DELETE FROM reminders WHERE id = ?', (reminder_id,))
         conn.commit()
         conn.close()
         logging.info(f"Reminder {reminder_id} deleted")
+        return True
 
     def update_reminder(self, reminder_id, **kwargs):
         """Обновление напоминания"""
@@ -220,6 +943,8 @@ class Database:
         
         conn = sqlite3.connect(self.db_name)
         cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        self._forecast_untrack(cursor, [reminder_id])
         
         set_clause = ", ".join([f"{key} = ?" for key in kwargs.keys()])
         values = list(kwargs.values()) + [reminder_id]
@@ -229,6 +954,7 @@ class Database:
             SET {set_clause}, updated_at = CURRENT_TIMESTAMP
             WHERE id = ?
         ''', values)
+        self._forecast_track(cursor, [reminder_id])
         
         conn.commit()
         conn.close()
@@ -236,7 +962,7 @@ class Database:
 
     def get_user_stats(self, user_id):
         """Получение статистики пользователя"""
-        conn = sqlite3.connect(self.db_name)
+        conn = self._connect_with_archive()
         cursor = conn.cursor()
         
         # Основная статистика
@@ -249,12 +975,14 @@ class Database:
         stats = cursor.fetchone()
         
         # Статистика по категориям
-        cursor.execute('''
-            SELECT category, COUNT(*) 
-            FROM reminders 
-            WHERE user_id = ? 
+        cursor.execute(f'''
+            SELECT category, COUNT(*) FROM (
+                SELECT category FROM reminders WHERE user_id = ?
+                UNION ALL
+                SELECT category FROM {self.archive_table} WHERE user_id = ?
+            )
             GROUP BY category
-        ''', (user_id,))
+        ''', (user_id, user_id))
         
         categories = cursor.fetchall()
         
@@ -272,13 +1000,67 @@ class Database:
             'total': 0, 'completed': 0, 'cancelled': 0, 'active': 0, 'categories': {}
         }
 
+    def archive_reminders(self, older_than, batch_size=500):
+        """Перенос пачки выполненных и отмененных напоминаний, не менявшихся с older_than, в архив.
+        
+        Возвращает число перенесенных строк; пачка переносится одной короткой транзакцией.
+        """
+        conn = self._connect_with_archive()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        cursor.execute('''
+            SELECT id FROM reminders
+            WHERE status IN ('completed', 'cancelled') AND updated_at < ?
+            ORDER BY id
+            LIMIT ?
+        ''', (older_than.strftime('%Y-%m-%d %H:%M:%S'), batch_size))
+        reminder_ids = [row[0] for row in cursor.fetchall()]
+        
+        if reminder_ids:
+            placeholders = ','.join('?' * len(reminder_ids))
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO {self.archive_table} ({self.ARCHIVE_COLUMNS})
+                SELECT {self.ARCHIVE_COLUMNS} FROM reminders WHERE id IN ({placeholders})
+            ''', reminder_ids)
+            cursor.execute(f'DELETE FROM reminders WHERE id IN ({placeholders})', reminder_ids)
+        
+        conn.commit()
+        conn.close()
+        return len(reminder_ids)
+
+    def iter_pending_reminders(self, after, chunk_size=1000):
+        """Активные напоминания позже after пачками по возрастанию времени (для фоновой загрузки в планировщик).
+        
+        Пачки читаются по ключу (reminder_time, id) через индекс по статусу и времени,
+        каждая отдельным коротким запросом.
+        """
+        last_time, last_id = after, 0
+        while True:
+            conn = sqlite3.connect(self.db_name)
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, user_id, reminder_text, reminder_time, repeat_type, notify_before, notify_offsets
+                FROM reminders
+                WHERE status = 'active' AND (reminder_time, id) > (?, ?)
+                ORDER BY reminder_time, id
+                LIMIT ?
+            ''', (last_time, last_id, chunk_size))
+            reminders = cursor.fetchall()
+            conn.close()
+            
+            if not reminders:
+                break
+            yield reminders
+            last_time, last_id = reminders[-1][3], reminders[-1][0]
+
     def get_pending_reminders(self):
         """Получение всех ожидающих напоминаний (для планировщика)"""
         conn = sqlite3.connect(self.db_name)
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT id, user_id, reminder_text, reminder_time, repeat_type, notify_before
+            SELECT id, user_id, reminder_text, reminder_time, repeat_type, notify_before, notify_offsets
             FROM reminders 
             WHERE status = 'active' AND reminder_time > datetime('now') AND reminder_time <= datetime('now', '+1 hour')
             ORDER BY reminder_time
@@ -289,31 +1071,402 @@ class Database:
         
         return reminders
 
-    def get_total_reminders_count(self):
-        """Получение общего количества напоминаний"""
-        try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM reminders')
-            count = cursor.fetchone()[0]
+    # Список уведомлений заранее в SQL: JSON из notify_offsets или единственное notify_before
+    NOTIFY_OFFSETS_SQL = 'COALESCE(notify_offsets, json_array(notify_before))'
+
+    def claim_due_reminders(self, owner, lease_seconds, shard_index=0, shard_count=1, limit=100, due_before=None):
+        """Атомарный захват наступивших напоминаний своего шарда.
+        
+        Одним UPDATE ... RETURNING напоминания помечаются владельцем и сроком аренды,
+        поэтому второй процесс их не получит, пока аренда не истечет. due_before
+        ограничивает выборку напоминаниями, просроченными к этому моменту.
+        """
+        now = datetime.utcnow()
+        due_before = due_before or now
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            UPDATE reminders
+            SET claimed_by = ?, claimed_until = ?, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM reminders
+                WHERE status = 'active' AND reminder_time <= ?
+                  AND (claimed_until IS NULL OR claimed_until <= ?)
+                  AND user_id % ? = ?
+                ORDER BY reminder_time
+                LIMIT ?
+            )
+            RETURNING {self.CLAIM_COLUMNS}
+        ''', (owner, now + timedelta(seconds=lease_seconds), due_before, now, shard_count, shard_index, limit))
+        
+        reminders = cursor.fetchall()
+        conn.commit()
+        conn.close()
+        
+        return reminders
+
+    def claim_reminder(self, reminder_id, owner, lease_seconds):
+        """Атомарный захват конкретного напоминания (для встроенного планировщика)"""
+        now = datetime.utcnow()
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            UPDATE reminders
+            SET claimed_by = ?, claimed_until = ?, attempts = attempts + 1
+            WHERE id = ? AND status = 'active' AND (claimed_until IS NULL OR claimed_until <= ?)
+            RETURNING {self.CLAIM_COLUMNS}
+        ''', (owner, now + timedelta(seconds=lease_seconds), reminder_id, now))
+        
+        reminder = cursor.fetchone()
+        conn.commit()
+        conn.close()
+        
+        return reminder
+
+    def release_reminder(self, reminder_id, owner, retry_in_seconds):
+        """Снятие захвата после неудачной отправки.
+        
+        claimed_until сдвигается на время следующей попытки, так что до него
+        напоминание никто не захватит.
+        """
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE reminders
+            SET claimed_by = NULL, claimed_until = ?
+            WHERE id = ? AND claimed_by = ?
+        ''', (datetime.utcnow() + timedelta(seconds=retry_in_seconds), reminder_id, owner))
+        
+        conn.commit()
+        conn.close()
+
+    def complete_delivery(self, reminder_id, owner, next_time=None):
+        """Завершение успешной доставки в одной транзакции.
+        
+        Напоминание помечается выполненным, а для повторяющихся сразу создается
+        следующее. Возвращает (успех, id следующего напоминания).
+        """
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE reminders
+            SET status = 'completed', claimed_by = NULL, claimed_until = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND claimed_by = ?
+            RETURNING user_id
+        ''', (reminder_id, owner))
+        row = cursor.fetchone()
+        
+        if not row:
+            # Аренда истекла и напоминание забрал другой процесс
             conn.close()
-            return count
-        except Exception as e:
-            logging.error(f"Error getting reminders count: {e}")
-            return 0
+            return False, None
+        
+        user_id = row[0]
+        cursor.execute('''
+            UPDATE user_stats 
+            SET completed_reminders = completed_reminders + 1
+            WHERE user_id = ?
+        ''', (user_id,))
+        
+        next_reminder_id = None
+        if next_time:
+            # forecast_next переходит к следующему повторению: его срабатывания уже учтены в прогнозе
+            cursor.execute('''
+                INSERT INTO reminders (user_id, reminder_text, reminder_time, category, repeat_type, notify_before, notify_offsets,
+                                       forecast_next)
+                SELECT user_id, reminder_text, ?, category, repeat_type, notify_before, notify_offsets, forecast_next
+                FROM reminders WHERE id = ?
+            ''', (next_time, reminder_id))
+            next_reminder_id = cursor.lastrowid
+            
+            cursor.execute('''
+                INSERT INTO user_stats (user_id, total_reminders, last_active)
+                VALUES (?, 1, CURRENT_TIMESTAMP)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    total_reminders = total_reminders + 1, last_active = CURRENT_TIMESTAMP
+            ''', (user_id,))
+        
+        conn.commit()
+        conn.close()
+        logging.info(f"Reminder {reminder_id} delivered (next: {next_reminder_id})")
+        return True, next_reminder_id
 
-    def get_total_users_count(self):
-        """Получение общего количества пользователей"""
+    def complete_deliveries(self, owner, deliveries):
+        """Завершение пачки доставок в одной транзакции.
+        
+        deliveries - пары (id напоминания, время следующего повторения или None).
+        Возвращает пары (id напоминания, id следующего напоминания или None) для
+        напоминаний, аренда которых еще принадлежала owner.
+        """
+        if not deliveries:
+            return []
+        next_times = dict(deliveries)
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        # Список id передается одним JSON параметром, без ограничения на число плейсхолдеров
+        cursor.execute('''
+            UPDATE reminders
+            SET status = 'completed', claimed_by = NULL, claimed_until = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id IN (SELECT value FROM json_each(?)) AND claimed_by = ?
+            RETURNING id, user_id
+        ''', (json.dumps(list(next_times)), owner))
+        completed = cursor.fetchall()
+        
+        # Статистика обновляется одним запросом на пользователя
+        completed_by_user = {}
+        for reminder_id, user_id in completed:
+            completed_by_user[user_id] = completed_by_user.get(user_id, 0) + 1
+        cursor.executemany('''
+            UPDATE user_stats
+            SET completed_reminders = completed_reminders + ?
+            WHERE user_id = ?
+        ''', [(count, user_id) for user_id, count in completed_by_user.items()])
+        
+        results = []
+        created_by_user = {}
+        for reminder_id, user_id in completed:
+            next_reminder_id = None
+            if next_times[reminder_id]:
+                cursor.execute('''
+                    INSERT INTO reminders (user_id, reminder_text, reminder_time, category, repeat_type, notify_before, notify_offsets,
+                                           forecast_next)
+                    SELECT user_id, reminder_text, ?, category, repeat_type, notify_before, notify_offsets, forecast_next
+                    FROM reminders WHERE id = ?
+                ''', (next_times[reminder_id], reminder_id))
+                next_reminder_id = cursor.lastrowid
+                created_by_user[user_id] = created_by_user.get(user_id, 0) + 1
+            results.append((reminder_id, next_reminder_id))
+        
+        cursor.executemany('''
+            INSERT INTO user_stats (user_id, total_reminders, last_active)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(user_id) DO UPDATE SET
+                total_reminders = total_reminders + excluded.total_reminders, last_active = CURRENT_TIMESTAMP
+        ''', list(created_by_user.items()))
+        
+        conn.commit()
+        conn.close()
+        logging.info(f"Completed {len(completed)} deliveries ({sum(created_by_user.values())} repetitions created)")
+        return results
+
+    def release_reminders(self, reminder_ids, owner, retry_in_seconds):
+        """Снятие захвата с пачки напоминаний после неудачной отправки (см. release_reminder)"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE reminders
+            SET claimed_by = NULL, claimed_until = ?
+            WHERE id IN (SELECT value FROM json_each(?)) AND claimed_by = ?
+        ''', (datetime.utcnow() + timedelta(seconds=retry_in_seconds), json.dumps(list(reminder_ids)), owner))
+        
+        conn.commit()
+        conn.close()
+
+    def claim_due_notifications(self, shard_index=0, shard_count=1, limit=100):
+        """Атомарный захват наступивших уведомлений заранее своего шарда.
+        
+        notified - число уже отправленных уведомлений, следующее берется из списка
+        минут по этому номеру. Уведомление после неудачной отправки ждет notify_retry_at.
+        Возвращает NOTIFICATION_COLUMNS и номер захваченного уведомления.
+        """
+        now = datetime.utcnow()
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        # Уведомления бывают не раньше чем за сутки, поэтому диапазон по времени ограничен индексом
+        cursor.execute(f'''
+            UPDATE reminders
+            SET notified = notified + 1, notify_retry_at = NULL,
+                notify_attempts = CASE WHEN notify_retry_at IS NULL THEN 1 ELSE notify_attempts + 1 END
+            WHERE id IN (
+                SELECT id FROM reminders
+                WHERE status = 'active' AND reminder_time > ? AND reminder_time <= ?
+                  AND notify_before > 0
+                  AND notified < json_array_length({self.NOTIFY_OFFSETS_SQL})
+                  AND datetime(reminder_time, '-' || json_extract({self.NOTIFY_OFFSETS_SQL}, '$[' || notified || ']')
+                               || ' minutes') <= datetime(?)
+                  AND (notify_retry_at IS NULL OR notify_retry_at <= ?)
+                  AND user_id % ? = ?
+                ORDER BY reminder_time
+                LIMIT ?
+            )
+            RETURNING {self.NOTIFICATION_COLUMNS}, notified - 1
+        ''', (now, now + timedelta(days=1), now, now, shard_count, shard_index, limit))
+        
+        reminders = cursor.fetchall()
+        conn.commit()
+        conn.close()
+        
+        return reminders
+
+    def claim_notification(self, reminder_id, index=0):
+        """Атомарная отметка уведомления заранее с номером index.
+        
+        Возвращает номер попытки или 0, если уведомление уже отправил другой процесс.
+        """
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        # Пропущенные более ранние уведомления считаются отправленными
+        cursor.execute('''
+            UPDATE reminders
+            SET notified = ?, notify_retry_at = NULL,
+                notify_attempts = CASE WHEN notify_retry_at IS NOT NULL AND notified = ? THEN notify_attempts + 1 ELSE 1 END
+            WHERE id = ? AND status = 'active' AND notified <= ?
+            RETURNING notify_attempts
+        ''', (index + 1, index, reminder_id, index))
+        row = cursor.fetchone()
+        
+        conn.commit()
+        conn.close()
+        return row[0] if row else 0
+
+    def release_notification(self, reminder_id, index=0, retry_in_seconds=0):
+        """Возврат уведомления в очередь после неудачной отправки; до retry_in_seconds его не захватят"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE reminders SET notified = ?, notify_retry_at = ?
+            WHERE id = ? AND notified = ?
+        ''', (index, datetime.utcnow() + timedelta(seconds=retry_in_seconds), reminder_id, index + 1))
+        conn.commit()
+        conn.close()
+
+    def heartbeat_worker(self, worker_id, hostname=None, pid=None):
+        """Регистрация процесса доставки или продление его heartbeat"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO delivery_workers (worker_id, hostname, pid, heartbeat)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(worker_id) DO UPDATE SET heartbeat = CURRENT_TIMESTAMP
+        ''', (worker_id, hostname, pid))
+        
+        conn.commit()
+        conn.close()
+
+    def get_live_workers(self, timeout_seconds):
+        """Список живых процессов доставки, отсортированный по worker_id"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT worker_id FROM delivery_workers
+            WHERE heartbeat >= datetime('now', ?)
+            ORDER BY worker_id
+        ''', (f'-{int(timeout_seconds)} seconds',))
+        
+        workers = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        
+        return workers
+
+    def remove_worker(self, worker_id):
+        """Удаление процесса доставки при штатной остановке"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM delivery_workers WHERE worker_id = ?', (worker_id,))
+        conn.commit()
+        conn.close()
+        logging.info(f"Delivery worker {worker_id} removed")
+
+    def count_due_reminders(self, until):
+        """Число активных напоминаний, которые сработают с этого момента до until.
+        
+        Просроченные (ждущие повторной попытки или пропущенные за время простоя) не считаются.
+        """
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT COUNT(*) FROM reminders 
+            WHERE status = 'active' AND reminder_time > ? AND reminder_time <= ?
+        ''', (datetime.utcnow(), until))
+        count = cursor.fetchone()[0]
+        conn.close()
+        
+        return count
+
+    def run_maintenance(self, task, vacuum_pages=1000):
+        """Выполнение одной операции обслуживания базы; возвращает описание результата"""
+        # isolation_level=None - PRAGMA и VACUUM выполняются вне транзакции
+        conn = sqlite3.connect(self.db_name, isolation_level=None)
+        cursor = conn.cursor()
+        
         try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM users')
-            count = cursor.fetchone()[0]
+            if task == 'optimize':
+                cursor.execute('PRAGMA analysis_limit = 400')
+                cursor.execute('PRAGMA optimize')
+                return 'ok'
+            
+            if task == 'analyze':
+                # С analysis_limit ANALYZE читает только часть каждого индекса
+                cursor.execute('PRAGMA analysis_limit = 1000')
+                cursor.execute('ANALYZE')
+                return 'ok'
+            
+            if task == 'checkpoint':
+                journal_mode = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+                if journal_mode != 'wal':
+                    return f'skipped (journal_mode={journal_mode})'
+                busy, log_pages, checkpointed = cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+                return f'{checkpointed}/{log_pages} pages' + (' (busy)' if busy else '')
+            
+            if task == 'vacuum':
+                freelist = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+                if not freelist:
+                    return 'no free pages'
+                auto_vacuum = cursor.execute('PRAGMA auto_vacuum').fetchone()[0]
+                if auto_vacuum != 2:
+                    # Перевод требует полного VACUUM, который блокирует базу: только вручную при остановленном боте
+                    logging.warning(f"Database {self.db_name} has auto_vacuum={auto_vacuum}, "
+                                    f"convert it to incremental offline to reclaim {freelist} free pages")
+                    return f'skipped: {freelist} free pages, auto_vacuum is not incremental (convert offline)'
+                # Через execute прагма освобождает только одну страницу, executescript выполняет ее до конца
+                cursor.executescript(f'PRAGMA incremental_vacuum({int(vacuum_pages)})')
+                left = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+                return f'freed {freelist - left} pages, {left} left'
+            
+            raise ValueError(f"Unknown maintenance task: {task}")
+        finally:
             conn.close()
-            return count
-        except Exception as e:
-            logging.error(f"Error getting users count: {e}")
-            return 0
+
+    def record_maintenance(self, task, duration_ms, result):
+        """Сохранение результата операции обслуживания"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO maintenance_log (task, last_run, duration_ms, result)
+            VALUES (?, CURRENT_TIMESTAMP, ?, ?)
+            ON CONFLICT(task) DO UPDATE SET
+                last_run = excluded.last_run,
+                duration_ms = excluded.duration_ms,
+                result = excluded.result
+        ''', (task, duration_ms, result))
+        
+        conn.commit()
+        conn.close()
+
+    def get_maintenance_log(self):
+        """Последние запуски обслуживания: task -> (last_run, duration_ms, result)"""
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT task, last_run, duration_ms, result FROM maintenance_log')
+        log = {task: (last_run, duration_ms, result) for task, last_run, duration_ms, result in cursor.fetchall()}
+        conn.close()
+        
+        return log
 
     def create_backup(self):
         """Создание бэкапа базы данных"""
@@ -326,8 +1479,9 @@ class Database:
             backup_filename = f"reminders_backup_{timestamp}.db"
             backup_path = os.path.join(Config.BACKUP_DIR, backup_filename)
             
-            # Копируем базу данных
-            shutil.copy2(self.db_name, backup_path)
+            # Копируем базу через backup API: изменения из WAL, еще не перенесенные в файл базы,
+            # тоже попадают в копию
+            self._copy_database(self.db_name, backup_path)
             
             # Получаем статистику бэкапа
             file_size = os.path.getsize(backup_path) // 1024  # размер в KB
@@ -351,6 +1505,17 @@ class Database:
             logging.error(f"Error creating backup: {e}")
             return None
 
+    @staticmethod
+    def _copy_database(source_path, target_path):
+        """Постраничная копия базы source_path в target_path через sqlite3 backup API"""
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
     def get_backup_list(self):
         """Получение списка бэкапов"""
         try:
@@ -378,8 +1543,9 @@ class Database:
             # Создаем бэкап текущей базы
             current_backup = self.create_backup()
             
-            # Заменяем текущую базу данных бэкапом
-            shutil.copy2(backup_path, self.db_name)
+            # Заменяем содержимое текущей базы бэкапом (копирование файла поверх базы в режиме WAL ее повредит)
+            self._copy_database(backup_path, self.db_name)
+            self._counters_cache = None
             
             logging.info(f"Database restored from backup: {backup_filename}")
             return True
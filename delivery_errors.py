@@ -0,0 +1,24 @@
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from config import Config
+
+# Ответы Bot API на BadRequest, после которых писать в чат бессмысленно
+CHAT_GONE_MESSAGES = ('chat not found', 'user is deactivated', 'peer_id_invalid', 'bot was blocked')
+
+
+def is_chat_unavailable(error):
+    """Постоянная ошибка отправки: бот заблокирован, аккаунт удален или чат не найден.
+
+    Повтор такой отправки не поможет, в отличие от сетевых ошибок, таймаутов и RetryAfter.
+    """
+    if isinstance(error, Forbidden):
+        return True
+    return isinstance(error, BadRequest) and any(message in str(error).lower() for message in CHAT_GONE_MESSAGES)
+
+
+def retry_delay(error, attempts):
+    """Задержка повторной попытки: экспоненциальная, но не меньше паузы, которую просит Telegram"""
+    delay = min(Config.DELIVERY_RETRY_BASE * 2 ** (attempts - 1), Config.DELIVERY_RETRY_MAX)
+    if isinstance(error, RetryAfter):
+        delay = max(delay, int(error.retry_after))
+    return delay
@@ -0,0 +1,78 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+import recurrence
+from config import MAX_MESSAGE_LENGTH, MOSCOW_OFFSET
+from recurrence import EPSILON
+from utils import TimeParser
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def minute_of(moment):
+    """Начало минуты, в которую попадает moment"""
+    return moment.replace(second=0, microsecond=0)
+
+
+def count_fires(reminder_time, repeat_type, notify_before, notify_offsets, since, until, now):
+    """Срабатывания напоминания по минутам для гистограммы прогноза.
+
+    Учитываются повторения, самое раннее срабатывание которых (первое уведомление
+    заранее или само напоминание) лежит в [since, until); since=None - с начала
+    серии. Срабатывания раньше now не считаются. Возвращает (Counter минута -> число
+    срабатываний, самое раннее срабатывание следующего неучтенного повторения или None).
+    """
+    if isinstance(reminder_time, str):
+        reminder_time = TimeParser.parse_db_time(reminder_time)
+    offsets = [timedelta(minutes=minutes) for minutes in TimeParser.parse_notify_offsets(notify_before, notify_offsets)]
+    lead = offsets[0] if offsets else timedelta(0)
+    # Повторения, все срабатывания которых уже прошли, не перебираются
+    since = now - lead if since is None else max(since, now - lead)
+
+    counts = Counter()
+    for moment in recurrence.occurrences_between(repeat_type, reminder_time, since + lead, until + lead):
+        for fire in (moment, *(moment - offset for offset in offsets)):
+            if fire >= now:
+                counts[minute_of(fire)] += 1
+
+    if recurrence.rule_for(repeat_type) is None:
+        upcoming = reminder_time if reminder_time >= until + lead else None
+    else:
+        upcoming = recurrence.next_occurrence(repeat_type, reminder_time, until + lead - EPSILON)
+    return counts, (upcoming - lead if upcoming is not None else None)
+
+
+def summarize(buckets):
+    """Итоги прогноза по списку (минута UTC, срабатывания) для /forecast и метрик"""
+    by_hour = Counter()
+    for minute, fires in buckets:
+        by_hour[minute.replace(minute=0)] += fires
+    peaks = sorted(buckets, key=lambda bucket: (-bucket[1], bucket[0]))
+    return {
+        'total': sum(fires for _, fires in buckets),
+        'peak': peaks[0] if peaks else None,
+        'top': peaks[:5],
+        'hours': sorted(by_hour.items()),
+    }
+
+
+def format_forecast(buckets, hours):
+    """Текст прогноза нагрузки: пиковые минуты и срабатывания по часам (время московское)"""
+    summary = summarize(buckets)
+    if not summary['total']:
+        return f"📭 В ближайшие {hours} ч срабатываний нет."
+
+    lines = [f"📈 Прогноз на {hours} ч: {summary['total']} срабатываний", "", "🔝 Пиковые минуты:"]
+    for minute, fires in summary['top']:
+        lines.append(f"  {(minute + MOSCOW_OFFSET).strftime('%d.%m %H:%M')} - {fires}")
+
+    lines += ["", "🕒 По часам:"]
+    busiest = max(fires for _, fires in summary['hours'])
+    for hour, fires in summary['hours']:
+        bar = '█' * max(1, round(fires / busiest * 20))
+        lines.append(f"  {(hour + MOSCOW_OFFSET).strftime('%d.%m %H:00')} {bar} {fires}")
+
+    text = '\n'.join(lines)
+    if len(text) > MAX_MESSAGE_LENGTH:
+        text = text[:MAX_MESSAGE_LENGTH - 2].rsplit('\n', 1)[0] + '\n…'
+    return text
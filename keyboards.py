@@ -15,9 +15,25 @@ class Keyboards:
         keyboard = []
         for key, value in Config.REPEAT_OPTIONS.items():
             keyboard.append([InlineKeyboardButton(value, callback_data=f"repeat_{key}")])
+        keyboard.append([InlineKeyboardButton("⚙️ Свое правило", callback_data="repeat_custom")])
         keyboard.append([InlineKeyboardButton("❌ Отмена", callback_data="cancel")])
         return InlineKeyboardMarkup(keyboard)
     
+    @staticmethod
+    def notify_options():
+        keyboard = [
+            [
+                InlineKeyboardButton("За 15 минут", callback_data="notify_15"),
+                InlineKeyboardButton("За 30 минут", callback_data="notify_30")
+            ],
+            [
+                InlineKeyboardButton("За 60 минут", callback_data="notify_60"),
+                InlineKeyboardButton("Не уведомлять", callback_data="notify_0")
+            ],
+            [InlineKeyboardButton("❌ Отмена", callback_data="cancel")]
+        ]
+        return InlineKeyboardMarkup(keyboard)
+    
     @staticmethod
     def categories():
         keyboard = []
@@ -60,4 +76,20 @@ class Keyboards:
             ],
             [InlineKeyboardButton("📋 Назад", callback_data=f"back_to_reminder_{reminder_id}")]
         ]
-        return InlineKeyboardMarkup(keyboard)
\ No newline at end of file
+        return InlineKeyboardMarkup(keyboard)
+    
+    @staticmethod
+    def search_results(reminders, offset, has_next):
+        """Кнопки найденных напоминаний и переход между страницами поиска"""
+        keyboard = [
+            [InlineKeyboardButton(f"{number}. {text[:40]}", callback_data=f"back_to_reminder_{rem_id}")]
+            for number, (rem_id, text, *_) in enumerate(reminders, offset + 1)
+        ]
+        pages = []
+        if offset > 0:
+            pages.append(InlineKeyboardButton("◀️ Назад", callback_data=f"find_page_{max(0, offset - Config.SEARCH_PAGE_SIZE)}"))
+        if has_next:
+            pages.append(InlineKeyboardButton("Далее ▶️", callback_data=f"find_page_{offset + Config.SEARCH_PAGE_SIZE}"))
+        if pages:
+            keyboard.append(pages)
+        return InlineKeyboardMarkup(keyboard)
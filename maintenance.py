@@ -0,0 +1,63 @@
+import logging
+import time
+from datetime import datetime, timedelta
+
+from config import Config
+from utils import TimeParser
+
+
+class DatabaseMaintenance:
+    """Периодическое обслуживание SQLite.
+
+    Каждая операция выполняется не чаще своего периода и только в тихое время,
+    когда в ближайшие MAINTENANCE_QUIET_WINDOW секунд нет напоминаний. Длительность
+    и результат каждого запуска сохраняются в maintenance_log и показываются в /dbinfo.
+    """
+
+    # Операция -> минимальный период между запусками, секунд
+    TASKS = {
+        'checkpoint': 3600,
+        'optimize': 3600,
+        'vacuum': 6 * 3600,
+        'analyze': 24 * 3600,
+    }
+
+    def __init__(self, db):
+        self.db = db
+
+    def is_quiet(self):
+        until = datetime.utcnow() + timedelta(seconds=Config.MAINTENANCE_QUIET_WINDOW)
+        return self.db.count_due_reminders(until) == 0
+
+    def due_tasks(self):
+        log = self.db.get_maintenance_log()
+        now = datetime.utcnow()
+        due = []
+        for task, period in self.TASKS.items():
+            last_run = log.get(task, (None,))[0]
+            if last_run is None or TimeParser.parse_db_time(last_run) + timedelta(seconds=period) <= now:
+                due.append(task)
+        return due
+
+    def run_due(self):
+        """Запуск операций, у которых прошел период; возвращает {операция: (мс, результат)}"""
+        results = {}
+        for task in self.due_tasks():
+            # Тишина проверяется перед каждой операцией: напоминания могли появиться
+            if not self.is_quiet():
+                logging.info("Database maintenance postponed: reminders are due soon")
+                break
+            results[task] = self.run_task(task)
+        return results
+
+    def run_task(self, task):
+        started = time.perf_counter()
+        try:
+            result = self.db.run_maintenance(task, Config.MAINTENANCE_VACUUM_PAGES)
+        except Exception as e:
+            result = f'error: {e}'
+            logging.error(f"Database maintenance {task} failed: {e}")
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.db.record_maintenance(task, duration_ms, result)
+        logging.info(f"Database maintenance {task}: {result} in {duration_ms} ms")
+        return duration_ms, result
@@ -0,0 +1,742 @@
+import copy
+import json
+import logging
+import pickle
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import forecast
+from config import Config
+from storage import Storage
+from utils import TimeParser
+
+# Колонки в порядке SELECT * из SQLite-версии
+USER_FIELDS = ('user_id', 'username', 'first_name', 'last_name', 'created_at', 'last_active', 'is_active')
+REMINDER_FIELDS = ('id', 'user_id', 'reminder_text', 'reminder_time', 'category', 'repeat_type', 'status',
+                   'notify_before', 'created_at', 'updated_at', 'notified', 'claimed_by', 'claimed_until',
+                   'attempts', 'notify_offsets', 'forecast_next', 'notify_attempts', 'notify_retry_at')
+BROADCAST_FIELDS = ('id', 'admin_id', 'message_text', 'status', 'last_user_id', 'sent_count', 'failed_count',
+                    'progress_message_id')
+
+
+def db_time(value):
+    """Время в том виде, в котором его хранит SQLite: datetime -> 'YYYY-MM-DD HH:MM:SS[.ffffff]'"""
+    return str(value) if isinstance(value, datetime) else value
+
+
+def now_text():
+    """Аналог CURRENT_TIMESTAMP"""
+    return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def columns(names):
+    """Список полей из строки колонок SQL ('id, user_id, ...')"""
+    return tuple(name.strip() for name in names.split(','))
+
+
+class MemoryStorage(Storage):
+    """Хранилище в памяти процесса для тестов и бенчмарков.
+
+    Те же методы и те же строки результатов, что у Database, но без диска и SQL:
+    таблицы - словари под общей блокировкой. Данные теряются при остановке,
+    процессы доставки (workers.py) его не разделяют.
+    """
+
+    # Таблицы, которые сохраняются в бэкап
+    TABLES = ('users', 'reminders', 'archive', 'user_stats', 'broadcasts', 'workers',
+              'maintenance_log', 'load_forecast', 'backup_history', 'forecast_until', 'last_ids')
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.users = {}
+        self.reminders = {}
+        self.archive = {}
+        self.user_stats = {}  # user_id -> [всего, выполнено, отменено]
+        self.broadcasts = {}
+        self.workers = {}
+        self.maintenance_log = {}
+        self.load_forecast = Counter()  # минута UTC -> число срабатываний
+        self.backup_history = []
+        self.forecast_until = datetime.utcnow() + timedelta(hours=Config.FORECAST_HOURS)
+        self.last_ids = Counter()  # таблица -> последний выданный id
+        self._backups = {}  # имя бэкапа -> снимок таблиц
+        self._reindex()
+        logging.info("In-memory storage initialized")
+
+    def _reindex(self):
+        """Индексы по владельцу для напоминаний и архива"""
+        self._user_reminders = defaultdict(set)
+        self._user_archive = defaultdict(set)
+        for reminder in self.reminders.values():
+            self._user_reminders[reminder['user_id']].add(reminder['id'])
+        for reminder in self.archive.values():
+            self._user_archive[reminder['user_id']].add(reminder['id'])
+
+    def _next_id(self, table):
+        self.last_ids[table] += 1
+        return self.last_ids[table]
+
+    @staticmethod
+    def _row(record, fields):
+        return tuple(record[field] for field in fields)
+
+    def get_counters(self):
+        """Число пользователей и напоминаний (включая архив)"""
+        with self._lock:
+            return {
+                'users': len(self.users),
+                'reminders': len(self.reminders) + len(self.archive),
+                'archived': len(self.archive),
+            }
+
+    # ===== Прогноз нагрузки =====
+
+    def _forecast_rows(self, reminder_ids):
+        fields = columns(self.FORECAST_COLUMNS)
+        rows = []
+        for reminder_id in reminder_ids:
+            reminder = self.reminders.get(reminder_id)
+            if reminder and reminder['status'] == 'active':
+                rows.append(self._row(reminder, fields))
+        return rows
+
+    def _forecast_track_rows(self, rows, until, from_marks=False):
+        total, marks = self._forecast_counts(rows, until, from_marks)
+        for mark, reminder_id in marks:
+            self.reminders[reminder_id]['forecast_next'] = db_time(mark)
+        self.load_forecast.update(total)
+
+    def _forecast_track(self, reminder_ids):
+        self._forecast_track_rows(self._forecast_rows(reminder_ids), self.forecast_until)
+
+    def _forecast_untrack(self, reminder_ids):
+        total = self._forecast_counted(self._forecast_rows(reminder_ids), self.forecast_until)
+        for reminder_id in reminder_ids:
+            if reminder_id in self.reminders:
+                self.reminders[reminder_id]['forecast_next'] = None
+        self.load_forecast.subtract(total)
+        for minute in total:
+            if self.load_forecast[minute] <= 0:
+                del self.load_forecast[minute]
+
+    def roll_forecast(self, hours):
+        """Сдвиг окна прогноза к now + hours; возвращает число обработанных напоминаний"""
+        now = datetime.utcnow()
+        with self._lock:
+            until = max(self.forecast_until, now + timedelta(hours=hours))
+            edge = db_time(until)
+            fields = columns(self.FORECAST_COLUMNS)
+            rows = [
+                self._row(reminder, fields) for reminder in self.reminders.values()
+                if reminder['status'] == 'active' and reminder['forecast_next'] is not None
+                and reminder['forecast_next'] < edge
+            ]
+            self._forecast_track_rows(rows, until, from_marks=True)
+
+            current = forecast.minute_of(now)
+            for minute in [minute for minute in self.load_forecast if minute < current]:
+                del self.load_forecast[minute]
+            self.forecast_until = until
+        return len(rows)
+
+    def get_load_forecast(self, start, end):
+        """Гистограмма прогноза: (минута UTC, число срабатываний) в [start, end) по возрастанию"""
+        with self._lock:
+            return sorted((minute, fires) for minute, fires in self.load_forecast.items() if start <= minute < end)
+
+    # ===== Пользователи =====
+
+    def _touch_user(self, user_id):
+        """Пользователь для нового напоминания: создается или обновляется время активности"""
+        if user_id in self.users:
+            self.users[user_id]['last_active'] = now_text()
+        else:
+            self.users[user_id] = dict(zip(USER_FIELDS, (user_id, None, None, None, now_text(), now_text(), 1)))
+
+    def add_or_update_user(self, user_id, username=None, first_name=None, last_name=None):
+        """Добавление или обновление информации о пользователе"""
+        with self._lock:
+            self._touch_user(user_id)
+            self.users[user_id].update(username=username, first_name=first_name, last_name=last_name)
+        logging.info(f"User updated: {user_id}")
+
+    def get_user_info(self, user_id):
+        """Получение информации о пользователе"""
+        with self._lock:
+            user = self.users.get(user_id)
+            return self._row(user, USER_FIELDS) if user else None
+
+    def deactivate_user(self, user_id):
+        """Пометка пользователя недоступным и приостановка всех его активных напоминаний"""
+        with self._lock:
+            if user_id in self.users:
+                self.users[user_id]['is_active'] = 0
+            reminder_ids = sorted(
+                reminder_id for reminder_id in self._user_reminders.get(user_id, ())
+                if self.reminders[reminder_id]['status'] == 'active'
+            )
+            self._forecast_untrack(reminder_ids)
+            for reminder_id in reminder_ids:
+                self.reminders[reminder_id].update(
+                    status='paused', claimed_by=None, claimed_until=None, updated_at=now_text()
+                )
+        logging.info(f"User {user_id} deactivated, {len(reminder_ids)} reminders paused")
+        return reminder_ids
+
+    def reactivate_user(self, user_id):
+        """Снятие пометки недоступности и возобновление приостановленных напоминаний"""
+        fields = ('id', 'user_id', 'reminder_text', 'reminder_time', 'repeat_type', 'notify_before', 'notify_offsets')
+        with self._lock:
+            user = self.users.get(user_id)
+            if user is None or user['is_active']:
+                return []
+            user['is_active'] = 1
+            reminder_ids = sorted(
+                reminder_id for reminder_id in self._user_reminders.get(user_id, ())
+                if self.reminders[reminder_id]['status'] == 'paused'
+            )
+            for reminder_id in reminder_ids:
+                self.reminders[reminder_id].update(status='active', attempts=0, updated_at=now_text())
+            self._forecast_track(reminder_ids)
+            reminders = [self._row(self.reminders[reminder_id], fields) for reminder_id in reminder_ids]
+        logging.info(f"User {user_id} reactivated, {len(reminders)} reminders resumed")
+        return reminders
+
+    def get_all_users(self):
+        """Получение списка всех пользователей"""
+        with self._lock:
+            users = sorted(self.users.values(), key=lambda user: user['created_at'], reverse=True)
+            return [self._row(user, USER_FIELDS[:5]) for user in users]
+
+    def iter_users(self, after_user_id=0, chunk_size=1000, active_only=False):
+        """Обход пользователей пачками по возрастанию user_id (active_only - без заблокировавших бота)"""
+        while True:
+            with self._lock:
+                user_ids = sorted(
+                    user_id for user_id, user in self.users.items()
+                    if user_id > after_user_id and (not active_only or user['is_active'])
+                )[:chunk_size]
+                users = [self._row(self.users[user_id], USER_FIELDS[:5]) for user_id in user_ids]
+            if not users:
+                break
+            yield users
+            after_user_id = users[-1][0]
+
+    # ===== Рассылки =====
+
+    def create_broadcast(self, admin_id, message_text):
+        """Создание рассылки"""
+        with self._lock:
+            broadcast_id = self._next_id('broadcasts')
+            self.broadcasts[broadcast_id] = dict(
+                zip(BROADCAST_FIELDS, (broadcast_id, admin_id, message_text, 'running', 0, 0, 0, None)),
+                created_at=now_text(), updated_at=now_text(),
+            )
+        logging.info(f"Broadcast {broadcast_id} created by {admin_id}")
+        return broadcast_id
+
+    def get_broadcast(self, broadcast_id):
+        """Получение рассылки"""
+        with self._lock:
+            broadcast = self.broadcasts.get(broadcast_id)
+            return self._row(broadcast, BROADCAST_FIELDS) if broadcast else None
+
+    def get_running_broadcasts(self):
+        """Незавершенные рассылки (для продолжения после перезапуска)"""
+        with self._lock:
+            return sorted(broadcast_id for broadcast_id, broadcast in self.broadcasts.items()
+                          if broadcast['status'] == 'running')
+
+    def update_broadcast(self, broadcast_id, **kwargs):
+        """Сохранение прогресса и статуса рассылки"""
+        allowed_fields = ['status', 'last_user_id', 'sent_count', 'failed_count', 'progress_message_id']
+        updates = {key: value for key, value in kwargs.items() if key in allowed_fields}
+        if not updates:
+            return
+        with self._lock:
+            if broadcast_id in self.broadcasts:
+                self.broadcasts[broadcast_id].update(updates, updated_at=now_text())
+
+    # ===== Напоминания =====
+
+    def _insert_reminder(self, user_id, reminder_text, reminder_time, category, repeat_type, notify_before,
+                         notify_offsets, forecast_next=None):
+        reminder_id = self._next_id('reminders')
+        self.reminders[reminder_id] = dict(zip(REMINDER_FIELDS, (
+            reminder_id, user_id, reminder_text, db_time(reminder_time), category, repeat_type, 'active',
+            notify_before, now_text(), now_text(), 0, None, None, 0, notify_offsets, forecast_next, 0, None,
+        )))
+        self._user_reminders[user_id].add(reminder_id)
+        return reminder_id
+
+    def _count_created(self, user_id, count):
+        stats = self.user_stats.setdefault(user_id, [0, 0, 0])
+        stats[0] += count
+
+    def _count_status(self, user_id, status, count=1):
+        stats = self.user_stats.get(user_id)
+        if stats is None:
+            return
+        if status == 'completed':
+            stats[1] += count
+        elif status == 'cancelled':
+            stats[2] += count
+
+    def add_reminder(self, user_id, reminder_text, reminder_time, category='other', repeat_type='once', notify_before=0):
+        """Добавление напоминания с дополнительными параметрами (notify_before - минуты или список минут)"""
+        # Сначала убедимся, что пользователь существует
+        self.add_or_update_user(user_id)
+
+        notify_before, notify_offsets = self._notify_columns(notify_before)
+        with self._lock:
+            reminder_id = self._insert_reminder(
+                user_id, reminder_text, reminder_time, category, repeat_type, notify_before, notify_offsets
+            )
+            self._forecast_track([reminder_id])
+            self._count_created(user_id, 1)
+
+        logging.info(f"Reminder added for user {user_id}: {reminder_text}")
+        return reminder_id
+
+    def add_reminders_bulk(self, user_id, reminders):
+        """Добавление пачки напоминаний (text, reminder_time, category, repeat_type, notify_before)"""
+        reminders = list(reminders)
+        if not reminders:
+            return []
+
+        with self._lock:
+            self._touch_user(user_id)
+            reminder_ids = [
+                self._insert_reminder(user_id, *reminder[:4], *self._notify_columns(reminder[4]))
+                for reminder in reminders
+            ]
+            self._forecast_track(reminder_ids)
+            self._count_created(user_id, len(reminders))
+
+        logging.info(f"{len(reminders)} reminders imported for user {user_id}")
+        return reminder_ids
+
+    def _user_rows(self, user_id, status, fields, with_archive=False):
+        """Строки напоминаний пользователя (и архива) по времени"""
+        records = [self.reminders[reminder_id] for reminder_id in self._user_reminders.get(user_id, ())]
+        if with_archive:
+            records += [self.archive[reminder_id] for reminder_id in self._user_archive.get(user_id, ())]
+        if status:
+            records = [record for record in records if record['status'] == status]
+        records.sort(key=lambda record: (record['reminder_time'], record['id']))
+        return [self._row(record, fields) for record in records]
+
+    def iter_user_reminders(self, user_id, status=None, chunk_size=500):
+        """Напоминания пользователя по времени (для экспорта)"""
+        with self._lock:
+            rows = self._user_rows(
+                user_id, status, ('reminder_text', 'reminder_time', 'category', 'repeat_type', 'notify_before')
+            )
+        yield from rows
+
+    def _owned(self, reminder_id, user_id):
+        """Напоминание по id, если user_id не задан или совпадает с владельцем"""
+        reminder = self.reminders.get(reminder_id)
+        if reminder is None or (user_id is not None and reminder['user_id'] != user_id):
+            return None
+        return reminder
+
+    def get_reminder(self, reminder_id, user_id=None):
+        """Получение конкретного напоминания (с user_id - только если оно принадлежит пользователю)"""
+        with self._lock:
+            reminder = self._owned(reminder_id, user_id)
+            return self._row(reminder, REMINDER_FIELDS) if reminder else None
+
+    def get_user_reminders(self, user_id, status=None):
+        """Получить напоминания пользователя с фильтрацией по статусу (включая архив)"""
+        with self._lock:
+            # В архиве только выполненные и отмененные, для активных его не читаем
+            return self._user_rows(
+                user_id, status, ('id', 'reminder_text', 'reminder_time', 'category', 'repeat_type', 'status'),
+                with_archive=status != 'active',
+            )
+
+    def search_reminders(self, user_id, text, limit=10, offset=0):
+        """Поиск по началу слов в напоминаниях пользователя (как FTS5 в Database, без архива)"""
+        words = self._search_words(text)
+        if not words:
+            return []
+        prefixes = [word[:self.SEARCH_PREFIX_LENGTH] for word in words]
+
+        with self._lock:
+            rows = self._user_rows(user_id, None, ('id', 'reminder_text', 'reminder_time', 'category', 'repeat_type', 'status'))
+        matches = []
+        for row in rows:
+            tokens = self._search_tokens(row[1])
+            if all(any(token.startswith(prefix) for token in tokens) for prefix in prefixes):
+                matches.append(row)
+        return self._rank_search(matches[:Config.SEARCH_MAX_MATCHES], words, limit, offset)
+
+    def get_agenda_reminders(self, user_id, until):
+        """Активные напоминания пользователя, первое срабатывание которых раньше until (для повестки)"""
+        until = db_time(until)
+        with self._lock:
+            rows = self._user_rows(user_id, 'active', ('id', 'reminder_text', 'reminder_time', 'category', 'repeat_type'))
+        return [row for row in rows if row[2] < until]
+
+    def update_reminder_status(self, reminder_id, status, user_id=None):
+        """Обновление статуса напоминания (с user_id - только у владельца); возвращает, нашлось ли оно"""
+        with self._lock:
+            reminder = self._owned(reminder_id, user_id)
+            if reminder is None:
+                return False
+            self._forecast_untrack([reminder_id])
+            reminder.update(status=status, claimed_by=None, claimed_until=None, updated_at=now_text())
+            self._forecast_track([reminder_id])
+            self._count_status(reminder['user_id'], status)
+        logging.info(f"Reminder {reminder_id} status updated to {status}")
+        return True
+
+    def set_notify_offsets(self, reminder_id, offsets):
+        """Замена списка уведомлений заранее; отметки об отправленных уведомлениях сбрасываются"""
+        with self._lock:
+            if reminder_id in self.reminders:
+                self._set_notify_offsets(self.reminders[reminder_id], offsets)
+        logging.info(f"Reminder {reminder_id} notifications set to {offsets}")
+
+    def _set_notify_offsets(self, reminder, offsets):
+        """Замена уведомлений заранее у записи напоминания (под блокировкой)"""
+        notify_before, notify_offsets = self._notify_columns(offsets)
+        self._forecast_untrack([reminder['id']])
+        reminder.update(notify_before=notify_before, notify_offsets=notify_offsets, notified=0, notify_retry_at=None,
+                        updated_at=now_text())
+        self._forecast_track([reminder['id']])
+
+    def add_notify_offset(self, reminder_id, minutes, user_id=None):
+        """Добавление уведомления заранее к уже настроенным; возвращает напоминание или None"""
+        with self._lock:
+            reminder = self._owned(reminder_id, user_id)
+            if reminder is None:
+                return None
+            offsets = self._merge_notify_offset(reminder['notify_before'], reminder['notify_offsets'], minutes)
+            self._set_notify_offsets(reminder, offsets)
+            row = self._row(reminder, REMINDER_FIELDS)
+        logging.info(f"Reminder {reminder_id} notifications set to {offsets}")
+        return row
+
+    def delete_reminder(self, reminder_id, user_id=None):
+        """Удаление напоминания (с user_id - только у владельца); возвращает, нашлось ли оно"""
+        with self._lock:
+            if self._owned(reminder_id, user_id) is None:
+                return False
+            self._forecast_untrack([reminder_id])
+            reminder = self.reminders.pop(reminder_id)
+            self._user_reminders[reminder['user_id']].discard(reminder_id)
+        logging.info(f"Reminder {reminder_id} deleted")
+        return True
+
+    def update_reminder(self, reminder_id, **kwargs):
+        """Обновление напоминания"""
+        if not kwargs:
+            return
+        unknown = set(kwargs) - set(REMINDER_FIELDS[1:])
+        if unknown:
+            raise ValueError(f"Unknown reminder columns: {', '.join(sorted(unknown))}")
+
+        with self._lock:
+            reminder = self.reminders.get(reminder_id)
+            if reminder is not None:
+                self._forecast_untrack([reminder_id])
+                if 'user_id' in kwargs:
+                    self._user_reminders[reminder['user_id']].discard(reminder_id)
+                    self._user_reminders[kwargs['user_id']].add(reminder_id)
+                reminder.update({key: db_time(value) for key, value in kwargs.items()}, updated_at=now_text())
+                self._forecast_track([reminder_id])
+        logging.info(f"Reminder {reminder_id} updated")
+
+    def get_user_stats(self, user_id):
+        """Получение статистики пользователя"""
+        with self._lock:
+            stats = self.user_stats.get(user_id)
+            categories = Counter(row[0] for row in self._user_rows(user_id, None, ('category',), with_archive=True))
+
+        if stats:
+            return {
+                'total': stats[0],
+                'completed': stats[1],
+                'cancelled': stats[2],
+                'active': stats[0] - stats[1] - stats[2],
+                'categories': dict(categories)
+            }
+        return {
+            'total': 0, 'completed': 0, 'cancelled': 0, 'active': 0, 'categories': {}
+        }
+
+    def archive_reminders(self, older_than, batch_size=500):
+        """Перенос пачки выполненных и отмененных напоминаний, не менявшихся с older_than, в архив"""
+        older_than = older_than.strftime('%Y-%m-%d %H:%M:%S')
+        fields = columns(self.ARCHIVE_COLUMNS)
+        with self._lock:
+            reminder_ids = sorted(
+                reminder_id for reminder_id, reminder in self.reminders.items()
+                if reminder['status'] in ('completed', 'cancelled') and reminder['updated_at'] < older_than
+            )[:batch_size]
+            for reminder_id in reminder_ids:
+                reminder = self.reminders.pop(reminder_id)
+                self._user_reminders[reminder['user_id']].discard(reminder_id)
+                self.archive[reminder_id] = dict(zip(fields, self._row(reminder, fields)), archived_at=now_text())
+                self._user_archive[reminder['user_id']].add(reminder_id)
+        return len(reminder_ids)
+
+    def iter_pending_reminders(self, after, chunk_size=1000):
+        """Активные напоминания позже after пачками по возрастанию времени (для фоновой загрузки в планировщик).
+
+        Порядок обхода фиксируется один раз, пачки берут напоминания, еще активные к моменту чтения.
+        """
+        after = db_time(after)
+        fields = ('id', 'user_id', 'reminder_text', 'reminder_time', 'repeat_type', 'notify_before', 'notify_offsets')
+        with self._lock:
+            keys = sorted(
+                (reminder['reminder_time'], reminder_id) for reminder_id, reminder in self.reminders.items()
+                if reminder['status'] == 'active' and reminder['reminder_time'] > after
+            )
+        for start in range(0, len(keys), chunk_size):
+            with self._lock:
+                reminders = [
+                    self._row(self.reminders[reminder_id], fields) for _, reminder_id in keys[start:start + chunk_size]
+                    if reminder_id in self.reminders and self.reminders[reminder_id]['status'] == 'active'
+                ]
+            if reminders:
+                yield reminders
+
+    def _active(self, until=None, after=None):
+        """Активные напоминания в (after, until] по времени"""
+        until, after = db_time(until), db_time(after)
+        reminders = [
+            reminder for reminder in self.reminders.values()
+            if reminder['status'] == 'active'
+            and (until is None or reminder['reminder_time'] <= until)
+            and (after is None or reminder['reminder_time'] > after)
+        ]
+        reminders.sort(key=lambda reminder: (reminder['reminder_time'], reminder['id']))
+        return reminders
+
+    def get_pending_reminders(self):
+        """Получение всех ожидающих напоминаний (для планировщика)"""
+        now = datetime.utcnow().replace(microsecond=0)
+        fields = ('id', 'user_id', 'reminder_text', 'reminder_time', 'repeat_type', 'notify_before', 'notify_offsets')
+        with self._lock:
+            return [self._row(reminder, fields) for reminder in self._active(now + timedelta(hours=1), now)]
+
+    def count_due_reminders(self, until):
+        """Число активных напоминаний, которые сработают с этого момента до until"""
+        with self._lock:
+            return len(self._active(until, datetime.utcnow()))
+
+    # ===== Доставка =====
+
+    def _claim(self, reminder, owner, lease_until):
+        reminder.update(claimed_by=owner, claimed_until=db_time(lease_until), attempts=reminder['attempts'] + 1)
+        return self._row(reminder, columns(self.CLAIM_COLUMNS))
+
+    @staticmethod
+    def _claimable(reminder, now):
+        return reminder['claimed_until'] is None or reminder['claimed_until'] <= db_time(now)
+
+    def claim_due_reminders(self, owner, lease_seconds, shard_index=0, shard_count=1, limit=100, due_before=None):
+        """Захват наступивших напоминаний своего шарда (под блокировкой хранилища)"""
+        now = datetime.utcnow()
+        due_before = due_before or now
+        with self._lock:
+            due = [
+                reminder for reminder in self._active(due_before)
+                if self._claimable(reminder, now) and reminder['user_id'] % shard_count == shard_index
+            ]
+            return [self._claim(reminder, owner, now + timedelta(seconds=lease_seconds)) for reminder in due[:limit]]
+
+    def claim_reminder(self, reminder_id, owner, lease_seconds):
+        """Захват конкретного напоминания (для встроенного планировщика)"""
+        now = datetime.utcnow()
+        with self._lock:
+            reminder = self.reminders.get(reminder_id)
+            if reminder is None or reminder['status'] != 'active' or not self._claimable(reminder, now):
+                return None
+            return self._claim(reminder, owner, now + timedelta(seconds=lease_seconds))
+
+    def release_reminder(self, reminder_id, owner, retry_in_seconds):
+        """Снятие захвата после неудачной отправки до времени следующей попытки"""
+        self.release_reminders([reminder_id], owner, retry_in_seconds)
+
+    def release_reminders(self, reminder_ids, owner, retry_in_seconds):
+        """Снятие захвата с пачки напоминаний после неудачной отправки"""
+        retry_at = db_time(datetime.utcnow() + timedelta(seconds=retry_in_seconds))
+        with self._lock:
+            for reminder_id in reminder_ids:
+                reminder = self.reminders.get(reminder_id)
+                if reminder is not None and reminder['claimed_by'] == owner:
+                    reminder.update(claimed_by=None, claimed_until=retry_at)
+
+    def _complete(self, reminder_id, owner, next_time):
+        """Завершение доставки одного напоминания; возвращает (успех, id следующего напоминания)"""
+        reminder = self.reminders.get(reminder_id)
+        if reminder is None or reminder['claimed_by'] != owner:
+            # Аренда истекла и напоминание забрал другой процесс
+            return False, None
+        reminder.update(status='completed', claimed_by=None, claimed_until=None, updated_at=now_text())
+        self._count_status(reminder['user_id'], 'completed')
+        if not next_time:
+            return True, None
+        # forecast_next переходит к следующему повторению: его срабатывания уже учтены в прогнозе
+        self._count_created(reminder['user_id'], 1)
+        return True, self._insert_reminder(
+            reminder['user_id'], reminder['reminder_text'], next_time, reminder['category'], reminder['repeat_type'],
+            reminder['notify_before'], reminder['notify_offsets'], reminder['forecast_next'],
+        )
+
+    def complete_delivery(self, reminder_id, owner, next_time=None):
+        """Завершение успешной доставки; возвращает (успех, id следующего напоминания)"""
+        with self._lock:
+            completed, next_reminder_id = self._complete(reminder_id, owner, next_time)
+        if completed:
+            logging.info(f"Reminder {reminder_id} delivered (next: {next_reminder_id})")
+        return completed, next_reminder_id
+
+    def complete_deliveries(self, owner, deliveries):
+        """Завершение пачки доставок; возвращает (id напоминания, id следующего или None)"""
+        results = []
+        with self._lock:
+            for reminder_id, next_time in deliveries:
+                completed, next_reminder_id = self._complete(reminder_id, owner, next_time)
+                if completed:
+                    results.append((reminder_id, next_reminder_id))
+        if results:
+            created = sum(1 for _, next_reminder_id in results if next_reminder_id)
+            logging.info(f"Completed {len(results)} deliveries ({created} repetitions created)")
+        return results
+
+    def claim_due_notifications(self, shard_index=0, shard_count=1, limit=100):
+        """Захват наступивших уведомлений заранее своего шарда; NOTIFICATION_COLUMNS и номер уведомления"""
+        now = datetime.utcnow()
+        claimed = []
+        with self._lock:
+            for reminder in self._active(now + timedelta(days=1), now):
+                if len(claimed) >= limit:
+                    break
+                if reminder['notify_before'] <= 0 or reminder['user_id'] % shard_count != shard_index:
+                    continue
+                offsets = json.loads(reminder['notify_offsets']) if reminder['notify_offsets'] else [reminder['notify_before']]
+                index = reminder['notified']
+                if index >= len(offsets):
+                    continue
+                if TimeParser.parse_db_time(reminder['reminder_time']) - timedelta(minutes=offsets[index]) > now:
+                    continue
+                if reminder['notify_retry_at'] is not None and reminder['notify_retry_at'] > db_time(now):
+                    continue
+                self._claim_notification(reminder, index)
+                claimed.append(self._row(reminder, columns(self.NOTIFICATION_COLUMNS)) + (index,))
+        return claimed
+
+    def claim_notification(self, reminder_id, index=0):
+        """Отметка уведомления заранее с номером index; номер попытки или 0 - его уже отправил другой процесс"""
+        with self._lock:
+            reminder = self.reminders.get(reminder_id)
+            # Пропущенные более ранние уведомления считаются отправленными
+            if reminder is None or reminder['status'] != 'active' or reminder['notified'] > index:
+                return 0
+            self._claim_notification(reminder, index)
+            return reminder['notify_attempts']
+
+    @staticmethod
+    def _claim_notification(reminder, index):
+        # Повтор того же уведомления после неудачи - следующая попытка, иначе первая
+        retrying = reminder['notify_retry_at'] is not None and reminder['notified'] == index
+        reminder['notify_attempts'] = reminder['notify_attempts'] + 1 if retrying else 1
+        reminder['notify_retry_at'] = None
+        reminder['notified'] = index + 1
+
+    def release_notification(self, reminder_id, index=0, retry_in_seconds=0):
+        """Возврат уведомления в очередь после неудачной отправки; до retry_in_seconds его не захватят"""
+        with self._lock:
+            reminder = self.reminders.get(reminder_id)
+            if reminder is not None and reminder['notified'] == index + 1:
+                reminder['notified'] = index
+                reminder['notify_retry_at'] = db_time(datetime.utcnow() + timedelta(seconds=retry_in_seconds))
+
+    # ===== Процессы доставки =====
+
+    def heartbeat_worker(self, worker_id, hostname=None, pid=None):
+        """Регистрация процесса доставки или продление его heartbeat"""
+        with self._lock:
+            worker = self.workers.setdefault(worker_id, {'hostname': hostname, 'pid': pid, 'started_at': now_text()})
+            worker['heartbeat'] = datetime.utcnow()
+
+    def get_live_workers(self, timeout_seconds):
+        """Список живых процессов доставки, отсортированный по worker_id"""
+        since = datetime.utcnow() - timedelta(seconds=int(timeout_seconds))
+        with self._lock:
+            return sorted(worker_id for worker_id, worker in self.workers.items() if worker['heartbeat'] >= since)
+
+    def remove_worker(self, worker_id):
+        """Удаление процесса доставки при штатной остановке"""
+        with self._lock:
+            self.workers.pop(worker_id, None)
+        logging.info(f"Delivery worker {worker_id} removed")
+
+    # ===== Обслуживание и бэкапы =====
+
+    def run_maintenance(self, task, vacuum_pages=1000):
+        """Обслуживание хранилищу в памяти не нужно: операции только проверяются"""
+        if task not in ('optimize', 'analyze', 'checkpoint', 'vacuum'):
+            raise ValueError(f"Unknown maintenance task: {task}")
+        return 'skipped (in-memory storage)'
+
+    def record_maintenance(self, task, duration_ms, result):
+        """Сохранение результата операции обслуживания"""
+        with self._lock:
+            self.maintenance_log[task] = (now_text(), duration_ms, result)
+
+    def get_maintenance_log(self):
+        """Последние запуски обслуживания: task -> (last_run, duration_ms, result)"""
+        with self._lock:
+            return dict(self.maintenance_log)
+
+    def create_backup(self):
+        """Снимок всех таблиц в памяти процесса"""
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_filename = f"reminders_backup_{timestamp}.memory"
+            with self._lock:
+                snapshot = copy.deepcopy({table: getattr(self, table) for table in self.TABLES})
+                self._backups[backup_filename] = snapshot
+                file_size = len(pickle.dumps(snapshot)) // 1024
+                counters = self.get_counters()
+                self.backup_history.append(
+                    (backup_filename, now_text(), file_size, counters['reminders'], counters['users'])
+                )
+
+            logging.info(f"Backup created: {backup_filename} ({file_size} KB, {counters['reminders']} reminders, "
+                         f"{counters['users']} users)")
+            return backup_filename, file_size, counters['reminders'], counters['users']
+        except Exception as e:
+            logging.error(f"Error creating backup: {e}")
+            return None
+
+    def get_backup_list(self):
+        """Получение списка бэкапов"""
+        with self._lock:
+            return sorted(self.backup_history, key=lambda backup: backup[1], reverse=True)
+
+    def restore_from_backup(self, backup_filename):
+        """Восстановление из снимка"""
+        try:
+            if backup_filename not in self._backups:
+                raise FileNotFoundError(f"Backup not found: {backup_filename}")
+
+            # Создаем бэкап текущего состояния
+            self.create_backup()
+            with self._lock:
+                for table, value in copy.deepcopy(self._backups[backup_filename]).items():
+                    setattr(self, table, value)
+                self._reindex()
+
+            logging.info(f"Database restored from backup: {backup_filename}")
+            return True
+        except Exception as e:
+            logging.error(f"Error restoring from backup: {e}")
+            return False
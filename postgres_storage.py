@@ -0,0 +1,1068 @@
+import logging
+import os
+import shutil
+import subprocess
+import time
+from datetime import datetime, timedelta
+
+import forecast
+from config import Config
+from storage import Storage
+from utils import TimeParser
+
+try:
+    import psycopg
+    from psycopg.types.string import TextLoader
+    from psycopg_pool import ConnectionPool
+except ImportError:  # хранилище PostgreSQL необязательно: pip install "psycopg[binary,pool]"
+    psycopg = None
+
+
+class PostgresStorage(Storage):
+    """Хранилище в PostgreSQL с пулом соединений.
+
+    Схема и строки результатов те же, что у Database; запросы выполняются параллельно
+    из разных процессов и потоков, захват напоминаний идет через FOR UPDATE SKIP LOCKED.
+    Время хранится в колонках TIMESTAMP (UTC) и читается строками того же вида, что в SQLite.
+    """
+
+    # Версия схемы в global_counters; увеличивается при любом изменении init_db
+    SCHEMA_VERSION = 3
+    # Ключ advisory lock, под которым схему создает только один процесс
+    SCHEMA_LOCK = 4_047_001
+    # Список уведомлений заранее в SQL: JSON из notify_offsets или единственное notify_before
+    NOTIFY_OFFSETS_SQL = 'COALESCE(notify_offsets::jsonb, jsonb_build_array(notify_before))'
+
+    def __init__(self, dsn=None):
+        if psycopg is None:
+            raise RuntimeError('PostgreSQL storage requires psycopg: pip install "psycopg[binary,pool]"')
+        self.dsn = Config.POSTGRES_DSN if dsn is None else dsn
+        self._counters_cache = None  # (время устаревания, счетчики)
+        self.pool = ConnectionPool(
+            self.dsn, min_size=Config.POSTGRES_POOL_MIN, max_size=Config.POSTGRES_POOL_MAX,
+            configure=self._configure, open=True,
+        )
+        self.init_db()
+
+    @staticmethod
+    def _configure(conn):
+        """Настройка нового соединения пула.
+
+        Колонки TIMESTAMP читаются строкой 'YYYY-MM-DD HH:MM:SS[.ffffff]', как их возвращает SQLite,
+        а LOCALTIMESTAMP считается в UTC, как CURRENT_TIMESTAMP в SQLite.
+        """
+        conn.adapters.register_loader('timestamp', TextLoader)
+        conn.execute("SET TIME ZONE 'UTC'")
+        conn.commit()
+
+    def init_db(self):
+        """Создание схемы; при актуальной версии DDL не выполняется"""
+        with self.pool.connection() as conn:
+            conn.execute('SELECT pg_advisory_xact_lock(%s)', (self.SCHEMA_LOCK,))
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS global_counters (
+                    name TEXT PRIMARY KEY,
+                    value BIGINT NOT NULL
+                )
+            ''')
+            row = conn.execute("SELECT value FROM global_counters WHERE name = 'schema_version'").fetchone()
+            if row and row[0] == self.SCHEMA_VERSION:
+                logging.info(f"Database schema v{self.SCHEMA_VERSION} is up to date at PostgreSQL")
+                return
+
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id BIGINT PRIMARY KEY,
+                    username TEXT,
+                    first_name TEXT,
+                    last_name TEXT,
+                    created_at TIMESTAMP DEFAULT LOCALTIMESTAMP(0),
+                    last_active TIMESTAMP DEFAULT LOCALTIMESTAMP(0),
+                    is_active INTEGER DEFAULT 1
+                )
+            ''')
+            # Схема v1 была без is_active
+            conn.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS is_active INTEGER DEFAULT 1')
+            # Порядок колонок как в SQLite после всех миграций: get_reminder возвращает SELECT *
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS reminders (
+                    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                    user_id BIGINT NOT NULL REFERENCES users (user_id),
+                    reminder_text TEXT NOT NULL,
+                    reminder_time TIMESTAMP NOT NULL,
+                    category TEXT DEFAULT 'other',
+                    repeat_type TEXT DEFAULT 'once',
+                    status TEXT DEFAULT 'active',
+                    notify_before INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT LOCALTIMESTAMP(0),
+                    updated_at TIMESTAMP DEFAULT LOCALTIMESTAMP(0),
+                    notified INTEGER DEFAULT 0,
+                    claimed_by TEXT,
+                    claimed_until TIMESTAMP,
+                    attempts INTEGER DEFAULT 0,
+                    notify_offsets TEXT,
+                    forecast_next TIMESTAMP,
+                    notify_attempts INTEGER DEFAULT 0,
+                    notify_retry_at TIMESTAMP
+                )
+            ''')
+            # Схема v2 была без попыток уведомлений заранее
+            conn.execute('ALTER TABLE reminders ADD COLUMN IF NOT EXISTS notify_attempts INTEGER DEFAULT 0')
+            conn.execute('ALTER TABLE reminders ADD COLUMN IF NOT EXISTS notify_retry_at TIMESTAMP')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS user_stats (
+                    user_id BIGINT PRIMARY KEY REFERENCES users (user_id),
+                    total_reminders INTEGER DEFAULT 0,
+                    completed_reminders INTEGER DEFAULT 0,
+                    cancelled_reminders INTEGER DEFAULT 0,
+                    last_active TIMESTAMP DEFAULT LOCALTIMESTAMP(0)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS backup_history (
+                    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT LOCALTIMESTAMP(0),
+                    size_kb INTEGER,
+                    reminder_count INTEGER,
+                    user_count INTEGER
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS delivery_workers (
+                    worker_id TEXT PRIMARY KEY,
+                    hostname TEXT,
+                    pid INTEGER,
+                    started_at TIMESTAMP DEFAULT LOCALTIMESTAMP(0),
+                    heartbeat TIMESTAMP DEFAULT LOCALTIMESTAMP(0)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS broadcasts (
+                    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                    admin_id BIGINT NOT NULL,
+                    message_text TEXT NOT NULL,
+                    status TEXT DEFAULT 'running',
+                    last_user_id BIGINT DEFAULT 0,
+                    sent_count INTEGER DEFAULT 0,
+                    failed_count INTEGER DEFAULT 0,
+                    progress_message_id BIGINT,
+                    created_at TIMESTAMP DEFAULT LOCALTIMESTAMP(0),
+                    updated_at TIMESTAMP DEFAULT LOCALTIMESTAMP(0)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS maintenance_log (
+                    task TEXT PRIMARY KEY,
+                    last_run TIMESTAMP,
+                    duration_ms DOUBLE PRECISION,
+                    result TEXT
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS load_forecast (
+                    minute TIMESTAMP PRIMARY KEY,
+                    fires INTEGER NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS reminders_archive (
+                    id BIGINT PRIMARY KEY,
+                    user_id BIGINT NOT NULL,
+                    reminder_text TEXT NOT NULL,
+                    reminder_time TIMESTAMP NOT NULL,
+                    category TEXT,
+                    repeat_type TEXT,
+                    status TEXT,
+                    notify_before INTEGER,
+                    created_at TIMESTAMP,
+                    updated_at TIMESTAMP,
+                    archived_at TIMESTAMP DEFAULT LOCALTIMESTAMP(0)
+                )
+            ''')
+
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_reminders_archive_user ON reminders_archive (user_id, reminder_time)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_reminders_status_time ON reminders (status, reminder_time)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_reminders_user_status ON reminders (user_id, status)')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_reminders_forecast
+                ON reminders (forecast_next) WHERE forecast_next IS NOT NULL
+            ''')
+            # Полнотекстовый индекс вместо FTS5: слова в нижнем регистре без стемминга, ё как е
+            conn.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_reminders_search
+                ON reminders USING gin ({self._search_vector()})
+            ''')
+            self._init_forecast(conn)
+
+            conn.execute('''
+                INSERT INTO global_counters (name, value) VALUES ('schema_version', %s)
+                ON CONFLICT (name) DO UPDATE SET value = excluded.value
+            ''', (self.SCHEMA_VERSION,))
+        logging.info("Database initialized successfully at PostgreSQL")
+
+    def _search_vector(self):
+        return f"to_tsvector('simple', {self.SEARCH_TEXT_SQL.format('reminder_text')})"
+
+    def get_counters(self):
+        """Число пользователей и напоминаний с кэшем на COUNTERS_CACHE_TTL секунд.
+
+        Счетчики считаются COUNT(*), а не триггерами: строка общего счетчика, которую
+        обновляет каждая вставка, выстроила бы параллельные транзакции в очередь.
+        """
+        cache = self._counters_cache
+        if cache is not None and cache[0] > time.monotonic():
+            return cache[1]
+
+        with self.pool.connection() as conn:
+            users, reminders, archived = conn.execute('''
+                SELECT
+                    (SELECT COUNT(*) FROM users),
+                    (SELECT COUNT(*) FROM reminders),
+                    (SELECT COUNT(*) FROM reminders_archive)
+            ''').fetchone()
+
+        counters = {'users': users, 'reminders': reminders + archived, 'archived': archived}
+        self._counters_cache = (time.monotonic() + Config.COUNTERS_CACHE_TTL, counters)
+        return counters
+
+    # ===== Прогноз нагрузки =====
+
+    def _init_forecast(self, conn):
+        """Начальное заполнение гистограммы прогноза по всей таблице (один раз)"""
+        if conn.execute("SELECT 1 FROM global_counters WHERE name = 'forecast_until'").fetchone():
+            return
+        until = datetime.utcnow() + timedelta(hours=Config.FORECAST_HOURS)
+        rows = conn.execute(f"SELECT {self.FORECAST_COLUMNS} FROM reminders WHERE status = 'active'").fetchall()
+        self._forecast_track_rows(conn, rows, until)
+        conn.execute('''
+            INSERT INTO global_counters (name, value) VALUES ('forecast_until', %s)
+        ''', (int((until - forecast.EPOCH).total_seconds()),))
+        logging.info("Load forecast initialized")
+
+    def _forecast_until(self, conn, lock='SHARE'):
+        """Граница окна прогноза. Изменения напоминаний читают ее FOR SHARE и идут параллельно,
+        сдвиг окна берет FOR UPDATE и ждет их завершения"""
+        row = conn.execute(
+            f"SELECT value FROM global_counters WHERE name = 'forecast_until' FOR {lock}"
+        ).fetchone()
+        return forecast.EPOCH + timedelta(seconds=row[0]) if row else None
+
+    def _forecast_rows(self, conn, reminder_ids):
+        return conn.execute(f'''
+            SELECT {self.FORECAST_COLUMNS} FROM reminders
+            WHERE id = ANY(%s) AND status = 'active'
+            ORDER BY id
+            FOR UPDATE
+        ''', (list(reminder_ids),)).fetchall()
+
+    def _forecast_apply(self, conn, counts, sign):
+        """Прибавление (sign=1) или вычитание (sign=-1) срабатываний по минутам.
+
+        Минуты обновляются по возрастанию: параллельные транзакции блокируют строки
+        гистограммы в одном порядке и не попадают во взаимную блокировку.
+        """
+        if not counts:
+            return
+        minutes = sorted(counts)
+        with conn.cursor() as cursor:
+            if sign > 0:
+                cursor.executemany('''
+                    INSERT INTO load_forecast (minute, fires) VALUES (%s, %s)
+                    ON CONFLICT (minute) DO UPDATE SET fires = load_forecast.fires + excluded.fires
+                ''', [(minute, counts[minute]) for minute in minutes])
+            else:
+                cursor.executemany('UPDATE load_forecast SET fires = fires - %s WHERE minute = %s',
+                                   [(counts[minute], minute) for minute in minutes])
+                cursor.execute('DELETE FROM load_forecast WHERE minute = ANY(%s) AND fires <= 0', (minutes,))
+
+    def _forecast_track_rows(self, conn, rows, until, from_marks=False):
+        """Учет срабатываний напоминаний до границы окна и сдвиг их forecast_next (см. _forecast_counts)"""
+        total, marks = self._forecast_counts(rows, until, from_marks)
+        with conn.cursor() as cursor:
+            cursor.executemany('UPDATE reminders SET forecast_next = %s WHERE id = %s', marks)
+        self._forecast_apply(conn, total, 1)
+
+    def _forecast_track(self, conn, reminder_ids):
+        """Учет активных напоминаний в прогнозе (после вставки или изменения, в той же транзакции)"""
+        until = self._forecast_until(conn)
+        if until is not None:
+            self._forecast_track_rows(conn, self._forecast_rows(conn, reminder_ids), until)
+
+    def _forecast_untrack(self, conn, reminder_ids):
+        """Вычитание учтенных будущих срабатываний; строки напоминаний блокируются до конца транзакции"""
+        until = self._forecast_until(conn)
+        if until is None:
+            return
+        total = self._forecast_counted(self._forecast_rows(conn, reminder_ids), until)
+        conn.execute('UPDATE reminders SET forecast_next = NULL WHERE id = ANY(%s)', (list(reminder_ids),))
+        self._forecast_apply(conn, total, -1)
+
+    def roll_forecast(self, hours):
+        """Сдвиг окна прогноза к now + hours по индексу forecast_next; возвращает число обработанных напоминаний"""
+        now = datetime.utcnow()
+        with self.pool.connection() as conn:
+            until = max(self._forecast_until(conn, 'UPDATE') or now, now + timedelta(hours=hours))
+            rows = conn.execute(f'''
+                SELECT {self.FORECAST_COLUMNS} FROM reminders
+                WHERE forecast_next < %s AND status = 'active'
+                ORDER BY id
+                FOR UPDATE
+            ''', (until,)).fetchall()
+            self._forecast_track_rows(conn, rows, until, from_marks=True)
+
+            conn.execute('DELETE FROM load_forecast WHERE minute < %s', (forecast.minute_of(now),))
+            conn.execute('''
+                INSERT INTO global_counters (name, value) VALUES ('forecast_until', %s)
+                ON CONFLICT (name) DO UPDATE SET value = excluded.value
+            ''', (int((until - forecast.EPOCH).total_seconds()),))
+        return len(rows)
+
+    def get_load_forecast(self, start, end):
+        """Гистограмма прогноза: (минута UTC, число срабатываний) в [start, end) по возрастанию"""
+        with self.pool.connection() as conn:
+            rows = conn.execute('''
+                SELECT minute, fires FROM load_forecast
+                WHERE minute >= %s AND minute < %s
+                ORDER BY minute
+            ''', (start, end)).fetchall()
+        return [(TimeParser.parse_db_time(minute), fires) for minute, fires in rows]
+
+    # ===== Пользователи =====
+
+    def add_or_update_user(self, user_id, username=None, first_name=None, last_name=None):
+        """Добавление или обновление информации о пользователе"""
+        with self.pool.connection() as conn:
+            conn.execute('''
+                INSERT INTO users (user_id, username, first_name, last_name, last_active)
+                VALUES (%s, %s, %s, %s, LOCALTIMESTAMP(0))
+                ON CONFLICT (user_id) DO UPDATE SET
+                    username = excluded.username,
+                    first_name = excluded.first_name,
+                    last_name = excluded.last_name,
+                    last_active = LOCALTIMESTAMP(0)
+            ''', (user_id, username, first_name, last_name))
+        logging.info(f"User updated: {user_id}")
+
+    def get_user_info(self, user_id):
+        """Получение информации о пользователе"""
+        with self.pool.connection() as conn:
+            return conn.execute('SELECT * FROM users WHERE user_id = %s', (user_id,)).fetchone()
+
+    def deactivate_user(self, user_id):
+        """Пометка пользователя недоступным и приостановка всех его активных напоминаний.
+
+        Напоминания блокируются FOR UPDATE в порядке id до вычитания из прогноза, захваты
+        процессов доставки снимаются. Возвращает id приостановленных напоминаний.
+        """
+        with self.pool.connection() as conn:
+            conn.execute('UPDATE users SET is_active = 0 WHERE user_id = %s', (user_id,))
+            reminder_ids = [row[0] for row in conn.execute('''
+                SELECT id FROM reminders WHERE user_id = %s AND status = 'active' ORDER BY id FOR UPDATE
+            ''', (user_id,)).fetchall()]
+            self._forecast_untrack(conn, reminder_ids)
+            conn.execute('''
+                UPDATE reminders
+                SET status = 'paused', claimed_by = NULL, claimed_until = NULL, updated_at = LOCALTIMESTAMP(0)
+                WHERE id = ANY(%s)
+            ''', (reminder_ids,))
+        logging.info(f"User {user_id} deactivated, {len(reminder_ids)} reminders paused")
+        return reminder_ids
+
+    def reactivate_user(self, user_id):
+        """Снятие пометки недоступности и возобновление приостановленных напоминаний.
+
+        Для активного пользователя - один UPDATE без изменений. Возвращает возобновленные
+        напоминания (id, user_id, текст, время, повтор, notify_before, notify_offsets).
+        """
+        with self.pool.connection() as conn:
+            if not conn.execute(
+                'UPDATE users SET is_active = 1 WHERE user_id = %s AND is_active = 0 RETURNING user_id', (user_id,)
+            ).fetchone():
+                return []
+            reminders = conn.execute('''
+                UPDATE reminders
+                SET status = 'active', attempts = 0, updated_at = LOCALTIMESTAMP(0)
+                WHERE user_id = %s AND status = 'paused'
+                RETURNING id, user_id, reminder_text, reminder_time, repeat_type, notify_before, notify_offsets
+            ''', (user_id,)).fetchall()
+            self._forecast_track(conn, [reminder[0] for reminder in reminders])
+        logging.info(f"User {user_id} reactivated, {len(reminders)} reminders resumed")
+        return reminders
+
+    def get_all_users(self):
+        """Получение списка всех пользователей"""
+        with self.pool.connection() as conn:
+            return conn.execute('''
+                SELECT user_id, username, first_name, last_name, created_at FROM users ORDER BY created_at DESC
+            ''').fetchall()
+
+    def iter_users(self, after_user_id=0, chunk_size=1000, active_only=False):
+        """Обход пользователей пачками по возрастанию user_id, каждая пачка - отдельный запрос по ключу;
+        active_only - без пользователей, заблокировавших бота
+        """
+        active_clause = 'AND is_active = 1' if active_only else ''
+        while True:
+            with self.pool.connection() as conn:
+                users = conn.execute(f'''
+                    SELECT user_id, username, first_name, last_name, created_at
+                    FROM users
+                    WHERE user_id > %s {active_clause}
+                    ORDER BY user_id
+                    LIMIT %s
+                ''', (after_user_id, chunk_size)).fetchall()
+
+            if not users:
+                break
+            yield users
+            after_user_id = users[-1][0]
+
+    # ===== Рассылки =====
+
+    def create_broadcast(self, admin_id, message_text):
+        """Создание рассылки"""
+        with self.pool.connection() as conn:
+            broadcast_id = conn.execute('''
+                INSERT INTO broadcasts (admin_id, message_text) VALUES (%s, %s) RETURNING id
+            ''', (admin_id, message_text)).fetchone()[0]
+        logging.info(f"Broadcast {broadcast_id} created by {admin_id}")
+        return broadcast_id
+
+    def get_broadcast(self, broadcast_id):
+        """Получение рассылки"""
+        with self.pool.connection() as conn:
+            return conn.execute('''
+                SELECT id, admin_id, message_text, status, last_user_id, sent_count, failed_count, progress_message_id
+                FROM broadcasts WHERE id = %s
+            ''', (broadcast_id,)).fetchone()
+
+    def get_running_broadcasts(self):
+        """Незавершенные рассылки (для продолжения после перезапуска)"""
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT id FROM broadcasts WHERE status = 'running' ORDER BY id").fetchall()
+        return [row[0] for row in rows]
+
+    def update_broadcast(self, broadcast_id, **kwargs):
+        """Сохранение прогресса и статуса рассылки"""
+        allowed_fields = ['status', 'last_user_id', 'sent_count', 'failed_count', 'progress_message_id']
+        updates = {key: value for key, value in kwargs.items() if key in allowed_fields}
+        if not updates:
+            return
+
+        set_clause = ', '.join(f"{field} = %s" for field in updates)
+        with self.pool.connection() as conn:
+            conn.execute(f'''
+                UPDATE broadcasts
+                SET {set_clause}, updated_at = LOCALTIMESTAMP(0)
+                WHERE id = %s
+            ''', list(updates.values()) + [broadcast_id])
+
+    # ===== Напоминания =====
+
+    @staticmethod
+    def _count_created(conn, counts):
+        """Рост total_reminders: counts - пары (user_id, число новых напоминаний)"""
+        with conn.cursor() as cursor:
+            cursor.executemany('''
+                INSERT INTO user_stats (user_id, total_reminders, last_active)
+                VALUES (%s, %s, LOCALTIMESTAMP(0))
+                ON CONFLICT (user_id) DO UPDATE SET
+                    total_reminders = user_stats.total_reminders + excluded.total_reminders,
+                    last_active = LOCALTIMESTAMP(0)
+            ''', sorted(counts))
+
+    def add_reminder(self, user_id, reminder_text, reminder_time, category='other', repeat_type='once', notify_before=0):
+        """Добавление напоминания с дополнительными параметрами (notify_before - минуты или список минут)"""
+        # Сначала убедимся, что пользователь существует
+        self.add_or_update_user(user_id)
+
+        notify_before, notify_offsets = self._notify_columns(notify_before)
+        with self.pool.connection() as conn:
+            reminder_id = conn.execute('''
+                INSERT INTO reminders (user_id, reminder_text, reminder_time, category, repeat_type, notify_before, notify_offsets)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+            ''', (user_id, reminder_text, reminder_time, category, repeat_type, notify_before, notify_offsets)).fetchone()[0]
+            self._forecast_track(conn, [reminder_id])
+            self._count_created(conn, [(user_id, 1)])
+
+        logging.info(f"Reminder added for user {user_id}: {reminder_text}")
+        return reminder_id
+
+    def add_reminders_bulk(self, user_id, reminders):
+        """Добавление пачки напоминаний одной транзакцией; id возвращаются в том же порядке"""
+        reminders = list(reminders)
+        if not reminders:
+            return []
+
+        with self.pool.connection() as conn:
+            conn.execute('''
+                INSERT INTO users (user_id) VALUES (%s)
+                ON CONFLICT (user_id) DO UPDATE SET last_active = LOCALTIMESTAMP(0)
+            ''', (user_id,))
+            with conn.cursor() as cursor:
+                cursor.executemany('''
+                    INSERT INTO reminders (user_id, reminder_text, reminder_time, category, repeat_type, notify_before, notify_offsets)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                ''', [(user_id, *reminder[:4], *self._notify_columns(reminder[4])) for reminder in reminders],
+                    returning=True)
+                reminder_ids = []
+                while True:
+                    reminder_ids.append(cursor.fetchone()[0])
+                    if not cursor.nextset():
+                        break
+            self._forecast_track(conn, reminder_ids)
+            self._count_created(conn, [(user_id, len(reminders))])
+
+        logging.info(f"{len(reminders)} reminders imported for user {user_id}")
+        return reminder_ids
+
+    def iter_user_reminders(self, user_id, status=None, chunk_size=500):
+        """Потоковое чтение напоминаний пользователя пачками через серверный курсор (для экспорта)"""
+        query = '''
+            SELECT reminder_text, reminder_time, category, repeat_type, notify_before
+            FROM reminders
+            WHERE user_id = %s
+        '''
+        params = [user_id]
+        if status:
+            query += ' AND status = %s'
+            params.append(status)
+
+        with self.pool.connection() as conn:
+            with conn.cursor(name='user_reminders') as cursor:
+                cursor.execute(query + ' ORDER BY reminder_time', params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield from rows
+
+    def get_reminder(self, reminder_id, user_id=None):
+        """Получение конкретного напоминания (с user_id - только если оно принадлежит пользователю)"""
+        owner_clause, params = self._owner_clause(reminder_id, user_id, '%s')
+        with self.pool.connection() as conn:
+            return conn.execute(f'SELECT * FROM reminders WHERE {owner_clause}', params).fetchone()
+
+    def get_user_reminders(self, user_id, status=None):
+        """Получить напоминания пользователя с фильтрацией по статусу (включая архив)"""
+        condition = 'user_id = %s' + (' AND status = %s' if status else '')
+        params = [user_id, status] if status else [user_id]
+        query = f'''
+            SELECT id, reminder_text, reminder_time, category, repeat_type, status
+            FROM reminders
+            WHERE {condition}
+        '''
+        # В архиве только выполненные и отмененные, для активных его не читаем
+        if status != 'active':
+            query += f'''
+                UNION ALL
+                SELECT id, reminder_text, reminder_time, category, repeat_type, status
+                FROM reminders_archive
+                WHERE {condition}
+            '''
+            params = params * 2
+        with self.pool.connection() as conn:
+            return conn.execute(query + ' ORDER BY reminder_time', params).fetchall()
+
+    def search_reminders(self, user_id, text, limit=10, offset=0):
+        """Полнотекстовый поиск по напоминаниям пользователя.
+
+        Слова ищутся по началу через GIN индекс (префиксные лексемы tsquery), порядок
+        результатов тот же, что у Database.
+        """
+        words = self._search_words(text)
+        if not words:
+            return []
+        query = ' & '.join(f'{word[:self.SEARCH_PREFIX_LENGTH]}:*' for word in words)
+
+        with self.pool.connection() as conn:
+            matches = conn.execute(f'''
+                SELECT id, reminder_text, reminder_time, category, repeat_type, status
+                FROM reminders
+                WHERE {self._search_vector()} @@ to_tsquery('simple', %s) AND user_id = %s
+                LIMIT %s
+            ''', (query, user_id, Config.SEARCH_MAX_MATCHES)).fetchall()
+        return self._rank_search(matches, words, limit, offset)
+
+    def get_agenda_reminders(self, user_id, until):
+        """Активные напоминания пользователя, первое срабатывание которых раньше until (для повестки)"""
+        with self.pool.connection() as conn:
+            return conn.execute('''
+                SELECT id, reminder_text, reminder_time, category, repeat_type
+                FROM reminders
+                WHERE user_id = %s AND status = 'active' AND reminder_time < %s
+            ''', (user_id, until)).fetchall()
+
+    def update_reminder_status(self, reminder_id, status, user_id=None):
+        """Обновление статуса напоминания.
+
+        С user_id напоминание меняется, только если принадлежит пользователю: проверка владельца,
+        снятие захвата процессом доставки и статистика - в одной транзакции. Возвращает, нашлось ли
+        напоминание.
+        """
+        owner_clause, params = self._owner_clause(reminder_id, user_id, '%s')
+        with self.pool.connection() as conn:
+            self._forecast_untrack(conn, [reminder_id])
+            row = conn.execute(f'''
+                UPDATE reminders
+                SET status = %s, claimed_by = NULL, claimed_until = NULL, updated_at = LOCALTIMESTAMP(0)
+                WHERE {owner_clause}
+                RETURNING user_id
+            ''', (status, *params)).fetchone()
+            if not row:
+                conn.rollback()
+                return False
+            self._forecast_track(conn, [reminder_id])
+
+            # Обновляем статистику
+            if status in ('completed', 'cancelled'):
+                conn.execute(f'''
+                    UPDATE user_stats
+                    SET {status}_reminders = {status}_reminders + 1
+                    WHERE user_id = %s
+                ''', (row[0],))
+        logging.info(f"Reminder {reminder_id} status updated to {status}")
+        return True
+
+    def set_notify_offsets(self, reminder_id, offsets):
+        """Замена списка уведомлений заранее; отметки об отправленных уведомлениях сбрасываются"""
+        with self.pool.connection() as conn:
+            self._set_notify_offsets(conn, reminder_id, offsets)
+        logging.info(f"Reminder {reminder_id} notifications set to {offsets}")
+
+    def _set_notify_offsets(self, conn, reminder_id, offsets):
+        """Замена уведомлений заранее в транзакции conn; возвращает напоминание как get_reminder"""
+        notify_before, notify_offsets = self._notify_columns(offsets)
+        self._forecast_untrack(conn, [reminder_id])
+        reminder = conn.execute('''
+            UPDATE reminders
+            SET notify_before = %s, notify_offsets = %s, notified = 0, notify_retry_at = NULL, updated_at = LOCALTIMESTAMP(0)
+            WHERE id = %s
+            RETURNING *
+        ''', (notify_before, notify_offsets, reminder_id)).fetchone()
+        self._forecast_track(conn, [reminder_id])
+        return reminder
+
+    def add_notify_offset(self, reminder_id, minutes, user_id=None):
+        """Добавление уведомления заранее к уже настроенным одной транзакцией.
+
+        Строка блокируется FOR UPDATE, поэтому одновременные нажатия не теряют уведомления.
+        Возвращает обновленное напоминание (как get_reminder) или None, если оно не найдено.
+        """
+        owner_clause, params = self._owner_clause(reminder_id, user_id, '%s')
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                f'SELECT notify_before, notify_offsets FROM reminders WHERE {owner_clause} FOR UPDATE', params
+            ).fetchone()
+            if not row:
+                return None
+            offsets = self._merge_notify_offset(row[0], row[1], minutes)
+            reminder = self._set_notify_offsets(conn, reminder_id, offsets)
+        logging.info(f"Reminder {reminder_id} notifications set to {offsets}")
+        return reminder
+
+    def delete_reminder(self, reminder_id, user_id=None):
+        """Удаление напоминания (с user_id - только у владельца); возвращает, нашлось ли оно"""
+        owner_clause, params = self._owner_clause(reminder_id, user_id, '%s')
+        with self.pool.connection() as conn:
+            self._forecast_untrack(conn, [reminder_id])
+            if not conn.execute(f'DELETE FROM reminders WHERE {owner_clause} RETURNING id', params).fetchone():
+                conn.rollback()
+                return False
+        logging.info(f"Reminder {reminder_id} deleted")
+        return True
+
+    def update_reminder(self, reminder_id, **kwargs):
+        """Обновление напоминания"""
+        if not kwargs:
+            return
+
+        set_clause = ", ".join([f"{key} = %s" for key in kwargs.keys()])
+        with self.pool.connection() as conn:
+            self._forecast_untrack(conn, [reminder_id])
+            conn.execute(f'''
+                UPDATE reminders
+                SET {set_clause}, updated_at = LOCALTIMESTAMP(0)
+                WHERE id = %s
+            ''', list(kwargs.values()) + [reminder_id])
+            self._forecast_track(conn, [reminder_id])
+        logging.info(f"Reminder {reminder_id} updated")
+
+    def get_user_stats(self, user_id):
+        """Получение статистики пользователя"""
+        with self.pool.connection() as conn:
+            stats = conn.execute('''
+                SELECT total_reminders, completed_reminders, cancelled_reminders
+                FROM user_stats
+                WHERE user_id = %s
+            ''', (user_id,)).fetchone()
+            categories = conn.execute('''
+                SELECT category, COUNT(*) FROM (
+                    SELECT category FROM reminders WHERE user_id = %s
+                    UNION ALL
+                    SELECT category FROM reminders_archive WHERE user_id = %s
+                ) AS owned
+                GROUP BY category
+            ''', (user_id, user_id)).fetchall()
+
+        if stats:
+            return {
+                'total': stats[0],
+                'completed': stats[1],
+                'cancelled': stats[2],
+                'active': stats[0] - stats[1] - stats[2],
+                'categories': dict(categories)
+            }
+        return {
+            'total': 0, 'completed': 0, 'cancelled': 0, 'active': 0, 'categories': {}
+        }
+
+    def archive_reminders(self, older_than, batch_size=500):
+        """Перенос пачки выполненных и отмененных напоминаний в архив одним запросом; возвращает их число"""
+        replace = ', '.join(f'{column} = excluded.{column}' for column in self.ARCHIVE_COLUMNS.split(', ')[1:])
+        with self.pool.connection() as conn:
+            cursor = conn.execute(f'''
+                WITH moved AS (
+                    DELETE FROM reminders
+                    WHERE id IN (
+                        SELECT id FROM reminders
+                        WHERE status IN ('completed', 'cancelled') AND updated_at < %s
+                        ORDER BY id
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING {self.ARCHIVE_COLUMNS}
+                )
+                INSERT INTO reminders_archive ({self.ARCHIVE_COLUMNS})
+                SELECT {self.ARCHIVE_COLUMNS} FROM moved
+                ON CONFLICT (id) DO UPDATE SET {replace}
+            ''', (older_than.replace(microsecond=0), batch_size))
+            return cursor.rowcount
+
+    def iter_pending_reminders(self, after, chunk_size=1000):
+        """Активные напоминания позже after пачками по ключу (reminder_time, id)"""
+        last_time, last_id = after, 0
+        while True:
+            with self.pool.connection() as conn:
+                reminders = conn.execute('''
+                    SELECT id, user_id, reminder_text, reminder_time, repeat_type, notify_before, notify_offsets
+                    FROM reminders
+                    WHERE status = 'active' AND (reminder_time, id) > (%s, %s)
+                    ORDER BY reminder_time, id
+                    LIMIT %s
+                ''', (last_time, last_id, chunk_size)).fetchall()
+
+            if not reminders:
+                break
+            yield reminders
+            last_time, last_id = reminders[-1][3], reminders[-1][0]
+
+    def get_pending_reminders(self):
+        """Получение всех ожидающих напоминаний (для планировщика)"""
+        with self.pool.connection() as conn:
+            return conn.execute('''
+                SELECT id, user_id, reminder_text, reminder_time, repeat_type, notify_before, notify_offsets
+                FROM reminders
+                WHERE status = 'active' AND reminder_time > LOCALTIMESTAMP(0)
+                  AND reminder_time <= LOCALTIMESTAMP(0) + interval '1 hour'
+                ORDER BY reminder_time
+            ''').fetchall()
+
+    def count_due_reminders(self, until):
+        """Число активных напоминаний, которые сработают с этого момента до until"""
+        with self.pool.connection() as conn:
+            return conn.execute('''
+                SELECT COUNT(*) FROM reminders
+                WHERE status = 'active' AND reminder_time > %s AND reminder_time <= %s
+            ''', (datetime.utcnow(), until)).fetchone()[0]
+
+    # ===== Доставка =====
+
+    def claim_due_reminders(self, owner, lease_seconds, shard_index=0, shard_count=1, limit=100, due_before=None):
+        """Атомарный захват наступивших напоминаний своего шарда.
+
+        Строки, которые в этот момент захватывает другой процесс, пропускаются
+        (SKIP LOCKED), а не ждут его транзакции.
+        """
+        now = datetime.utcnow()
+        due_before = due_before or now
+        with self.pool.connection() as conn:
+            return conn.execute(f'''
+                UPDATE reminders
+                SET claimed_by = %s, claimed_until = %s, attempts = attempts + 1
+                WHERE id IN (
+                    SELECT id FROM reminders
+                    WHERE status = 'active' AND reminder_time <= %s
+                      AND (claimed_until IS NULL OR claimed_until <= %s)
+                      AND user_id %% %s = %s
+                    ORDER BY reminder_time
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING {self.CLAIM_COLUMNS}
+            ''', (owner, now + timedelta(seconds=lease_seconds), due_before, now, shard_count, shard_index,
+                  limit)).fetchall()
+
+    def claim_reminder(self, reminder_id, owner, lease_seconds):
+        """Атомарный захват конкретного напоминания (для встроенного планировщика)"""
+        now = datetime.utcnow()
+        with self.pool.connection() as conn:
+            return conn.execute(f'''
+                UPDATE reminders
+                SET claimed_by = %s, claimed_until = %s, attempts = attempts + 1
+                WHERE id = %s AND status = 'active' AND (claimed_until IS NULL OR claimed_until <= %s)
+                RETURNING {self.CLAIM_COLUMNS}
+            ''', (owner, now + timedelta(seconds=lease_seconds), reminder_id, now)).fetchone()
+
+    def release_reminder(self, reminder_id, owner, retry_in_seconds):
+        """Снятие захвата после неудачной отправки до времени следующей попытки"""
+        self.release_reminders([reminder_id], owner, retry_in_seconds)
+
+    def release_reminders(self, reminder_ids, owner, retry_in_seconds):
+        """Снятие захвата с пачки напоминаний после неудачной отправки"""
+        with self.pool.connection() as conn:
+            conn.execute('''
+                UPDATE reminders
+                SET claimed_by = NULL, claimed_until = %s
+                WHERE id = ANY(%s) AND claimed_by = %s
+            ''', (datetime.utcnow() + timedelta(seconds=retry_in_seconds), list(reminder_ids), owner))
+
+    def _complete(self, conn, owner, next_times):
+        """Завершение доставок в транзакции conn; возвращает пары (id, id следующего или None) и число повторений"""
+        completed = conn.execute('''
+            UPDATE reminders
+            SET status = 'completed', claimed_by = NULL, claimed_until = NULL, updated_at = LOCALTIMESTAMP(0)
+            WHERE id = ANY(%s) AND claimed_by = %s
+            RETURNING id, user_id
+        ''', (list(next_times), owner)).fetchall()
+
+        # Статистика обновляется одним запросом на пользователя
+        completed_by_user = {}
+        for reminder_id, user_id in completed:
+            completed_by_user[user_id] = completed_by_user.get(user_id, 0) + 1
+        with conn.cursor() as cursor:
+            cursor.executemany('''
+                UPDATE user_stats
+                SET completed_reminders = completed_reminders + %s
+                WHERE user_id = %s
+            ''', [(count, user_id) for user_id, count in sorted(completed_by_user.items())])
+
+        results = []
+        created_by_user = {}
+        for reminder_id, user_id in completed:
+            next_reminder_id = None
+            if next_times[reminder_id]:
+                # forecast_next переходит к следующему повторению: его срабатывания уже учтены в прогнозе
+                next_reminder_id = conn.execute('''
+                    INSERT INTO reminders (user_id, reminder_text, reminder_time, category, repeat_type, notify_before,
+                                           notify_offsets, forecast_next)
+                    SELECT user_id, reminder_text, %s, category, repeat_type, notify_before, notify_offsets, forecast_next
+                    FROM reminders WHERE id = %s
+                    RETURNING id
+                ''', (next_times[reminder_id], reminder_id)).fetchone()[0]
+                created_by_user[user_id] = created_by_user.get(user_id, 0) + 1
+            results.append((reminder_id, next_reminder_id))
+        self._count_created(conn, created_by_user.items())
+        return results, sum(created_by_user.values())
+
+    def complete_delivery(self, reminder_id, owner, next_time=None):
+        """Завершение успешной доставки в одной транзакции; возвращает (успех, id следующего напоминания)"""
+        with self.pool.connection() as conn:
+            results, _ = self._complete(conn, owner, {reminder_id: next_time})
+        if not results:
+            # Аренда истекла и напоминание забрал другой процесс
+            return False, None
+        next_reminder_id = results[0][1]
+        logging.info(f"Reminder {reminder_id} delivered (next: {next_reminder_id})")
+        return True, next_reminder_id
+
+    def complete_deliveries(self, owner, deliveries):
+        """Завершение пачки доставок в одной транзакции.
+
+        deliveries - пары (id напоминания, время следующего повторения или None).
+        Возвращает пары (id напоминания, id следующего напоминания или None) для
+        напоминаний, аренда которых еще принадлежала owner.
+        """
+        if not deliveries:
+            return []
+        with self.pool.connection() as conn:
+            results, created = self._complete(conn, owner, dict(deliveries))
+        logging.info(f"Completed {len(results)} deliveries ({created} repetitions created)")
+        return results
+
+    def claim_due_notifications(self, shard_index=0, shard_count=1, limit=100):
+        """Атомарный захват наступивших уведомлений заранее своего шарда; NOTIFICATION_COLUMNS и номер уведомления"""
+        now = datetime.utcnow()
+        with self.pool.connection() as conn:
+            return conn.execute(f'''
+                UPDATE reminders
+                SET notified = notified + 1, notify_retry_at = NULL,
+                    notify_attempts = CASE WHEN notify_retry_at IS NULL THEN 1 ELSE notify_attempts + 1 END
+                WHERE id IN (
+                    SELECT id FROM reminders
+                    WHERE status = 'active' AND reminder_time > %s AND reminder_time <= %s
+                      AND notify_before > 0
+                      AND notified < jsonb_array_length({self.NOTIFY_OFFSETS_SQL})
+                      AND reminder_time - make_interval(mins => ({self.NOTIFY_OFFSETS_SQL} ->> notified)::int) <= %s
+                      AND (notify_retry_at IS NULL OR notify_retry_at <= %s)
+                      AND user_id %% %s = %s
+                    ORDER BY reminder_time
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING {self.NOTIFICATION_COLUMNS}, notified - 1
+            ''', (now, now + timedelta(days=1), now, now, shard_count, shard_index, limit)).fetchall()
+
+    def claim_notification(self, reminder_id, index=0):
+        """Атомарная отметка уведомления заранее с номером index; номер попытки или 0 - его уже отправил другой процесс"""
+        with self.pool.connection() as conn:
+            # Пропущенные более ранние уведомления считаются отправленными
+            row = conn.execute('''
+                UPDATE reminders
+                SET notified = %s, notify_retry_at = NULL,
+                    notify_attempts = CASE WHEN notify_retry_at IS NOT NULL AND notified = %s
+                                           THEN notify_attempts + 1 ELSE 1 END
+                WHERE id = %s AND status = 'active' AND notified <= %s
+                RETURNING notify_attempts
+            ''', (index + 1, index, reminder_id, index)).fetchone()
+            return row[0] if row else 0
+
+    def release_notification(self, reminder_id, index=0, retry_in_seconds=0):
+        """Возврат уведомления в очередь после неудачной отправки; до retry_in_seconds его не захватят"""
+        with self.pool.connection() as conn:
+            conn.execute('''
+                UPDATE reminders SET notified = %s, notify_retry_at = %s
+                WHERE id = %s AND notified = %s
+            ''', (index, datetime.utcnow() + timedelta(seconds=retry_in_seconds), reminder_id, index + 1))
+
+    # ===== Процессы доставки =====
+
+    def heartbeat_worker(self, worker_id, hostname=None, pid=None):
+        """Регистрация процесса доставки или продление его heartbeat"""
+        with self.pool.connection() as conn:
+            conn.execute('''
+                INSERT INTO delivery_workers (worker_id, hostname, pid, heartbeat)
+                VALUES (%s, %s, %s, LOCALTIMESTAMP(0))
+                ON CONFLICT (worker_id) DO UPDATE SET heartbeat = LOCALTIMESTAMP(0)
+            ''', (worker_id, hostname, pid))
+
+    def get_live_workers(self, timeout_seconds):
+        """Список живых процессов доставки, отсортированный по worker_id"""
+        with self.pool.connection() as conn:
+            rows = conn.execute('''
+                SELECT worker_id FROM delivery_workers
+                WHERE heartbeat >= LOCALTIMESTAMP(0) - make_interval(secs => %s)
+                ORDER BY worker_id
+            ''', (int(timeout_seconds),)).fetchall()
+        return [row[0] for row in rows]
+
+    def remove_worker(self, worker_id):
+        """Удаление процесса доставки при штатной остановке"""
+        with self.pool.connection() as conn:
+            conn.execute('DELETE FROM delivery_workers WHERE worker_id = %s', (worker_id,))
+        logging.info(f"Delivery worker {worker_id} removed")
+
+    # ===== Обслуживание и бэкапы =====
+
+    def run_maintenance(self, task, vacuum_pages=1000):
+        """Операция обслуживания: ANALYZE и VACUUM горячих таблиц; контрольные точки и
+        оптимизацию планировщика сервер выполняет сам"""
+        if task in ('checkpoint', 'optimize'):
+            return 'skipped (handled by the server)'
+        if task not in ('analyze', 'vacuum'):
+            raise ValueError(f"Unknown maintenance task: {task}")
+
+        # VACUUM не выполняется внутри транзакции
+        with self.pool.connection() as conn:
+            conn.autocommit = True
+            try:
+                if task == 'analyze':
+                    conn.execute('ANALYZE')
+                else:
+                    conn.execute('VACUUM reminders, load_forecast, delivery_workers')
+                return 'ok'
+            finally:
+                conn.autocommit = False
+
+    def record_maintenance(self, task, duration_ms, result):
+        """Сохранение результата операции обслуживания"""
+        with self.pool.connection() as conn:
+            conn.execute('''
+                INSERT INTO maintenance_log (task, last_run, duration_ms, result)
+                VALUES (%s, LOCALTIMESTAMP(0), %s, %s)
+                ON CONFLICT (task) DO UPDATE SET
+                    last_run = excluded.last_run,
+                    duration_ms = excluded.duration_ms,
+                    result = excluded.result
+            ''', (task, duration_ms, result))
+
+    def get_maintenance_log(self):
+        """Последние запуски обслуживания: task -> (last_run, duration_ms, result)"""
+        with self.pool.connection() as conn:
+            rows = conn.execute('SELECT task, last_run, duration_ms, result FROM maintenance_log').fetchall()
+        return {task: (last_run, duration_ms, result) for task, last_run, duration_ms, result in rows}
+
+    def create_backup(self):
+        """Бэкап базы через pg_dump (формат custom) в BACKUP_DIR"""
+        try:
+            if shutil.which('pg_dump') is None:
+                raise FileNotFoundError("pg_dump not found")
+            os.makedirs(Config.BACKUP_DIR, exist_ok=True)
+
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_filename = f"reminders_backup_{timestamp}.dump"
+            backup_path = os.path.join(Config.BACKUP_DIR, backup_filename)
+            subprocess.run(['pg_dump', '--format=custom', f'--file={backup_path}', f'--dbname={self.dsn}'],
+                           check=True, capture_output=True)
+
+            file_size = os.path.getsize(backup_path) // 1024  # размер в KB
+            reminder_count = self.get_total_reminders_count()
+            user_count = self.get_total_users_count()
+            with self.pool.connection() as conn:
+                conn.execute('''
+                    INSERT INTO backup_history (filename, size_kb, reminder_count, user_count)
+                    VALUES (%s, %s, %s, %s)
+                ''', (backup_filename, file_size, reminder_count, user_count))
+
+            logging.info(f"Backup created: {backup_path} ({file_size} KB, {reminder_count} reminders, {user_count} users)")
+            return backup_filename, file_size, reminder_count, user_count
+
+        except Exception as e:
+            logging.error(f"Error creating backup: {e}")
+            return None
+
+    def get_backup_list(self):
+        """Получение списка бэкапов"""
+        try:
+            with self.pool.connection() as conn:
+                return conn.execute('''
+                    SELECT filename, created_at, size_kb, reminder_count, user_count
+                    FROM backup_history
+                    ORDER BY created_at DESC
+                ''').fetchall()
+        except Exception as e:
+            logging.error(f"Error getting backup list: {e}")
+            return []
+
+    def restore_from_backup(self, backup_filename):
+        """Восстановление из бэкапа через pg_restore (таблицы пересоздаются)"""
+        try:
+            backup_path = os.path.join(Config.BACKUP_DIR, backup_filename)
+            if not os.path.exists(backup_path):
+                raise FileNotFoundError(f"Backup file not found: {backup_path}")
+
+            # Создаем бэкап текущей базы
+            self.create_backup()
+
+            subprocess.run(['pg_restore', '--clean', '--if-exists', '--single-transaction',
+                            f'--dbname={self.dsn}', backup_path], check=True, capture_output=True)
+            self._counters_cache = None
+
+            logging.info(f"Database restored from backup: {backup_filename}")
+            return True
+
+        except Exception as e:
+            logging.error(f"Error restoring from backup: {e}")
+            return False
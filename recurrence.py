@@ -0,0 +1,440 @@
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from calendar import monthrange
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from config import Config, MOSCOW_OFFSET
+
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+WEEKDAY_NAMES = ['пн', 'вт', 'ср', 'чт', 'пт', 'сб', 'вс']
+FREQS = ('MINUTELY', 'HOURLY', 'DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+# Прежние типы повторения - частные случаи правил и хранятся под старыми именами
+LEGACY = {'daily': 'DAILY', 'weekly': 'WEEKLY', 'monthly': 'MONTHLY', 'yearly': 'YEARLY'}
+LEGACY_BY_FREQ = {freq: name for name, freq in LEGACY.items()}
+FIXED_PERIODS = {'MINUTELY': timedelta(minutes=1), 'HOURLY': timedelta(hours=1), 'DAILY': timedelta(days=1)}
+# Поиск следующего месяца с подходящим днем (например, 31 число) ограничен
+MAX_MONTH_STEPS = 120
+EPSILON = timedelta(microseconds=1)
+
+
+class Recurrence:
+    """Правило повторения - подмножество RRULE (RFC 5545).
+
+    Поддерживаются FREQ, INTERVAL, BYDAY (с номером вхождения для MONTHLY,
+    например -1FR - последняя пятница), BYMONTHDAY и BYSETPOS для MONTHLY. Время суток и точка отсчета
+    интервалов берутся из времени напоминания. В базе правило хранится в колонке
+    repeat_type компактной строкой (str), простые правила - прежними именами daily,
+    weekly, monthly, yearly.
+
+    Следующее повторение вычисляется арифметикой от точки отсчета без перебора
+    предыдущих: за O(1) для фиксированных периодов и O(log n) по дням недели
+    или месяца для остальных.
+    """
+
+    __slots__ = ('freq', 'interval', 'byday', 'bymonthday', 'bysetpos')
+
+    def __init__(self, freq, interval=1, byday=(), bymonthday=(), bysetpos=()):
+        self.freq = freq
+        self.interval = interval
+        self.byday = tuple(sorted(byday, key=lambda item: (item[1], item[0])))  # (номер вхождения или 0, день недели)
+        self.bymonthday = tuple(sorted(bymonthday))
+        self.bysetpos = tuple(sorted(bysetpos))  # позиции среди дней месяца, выбранных BYDAY или BYMONTHDAY
+
+    def __repr__(self):
+        return f"Recurrence({str(self)!r})"
+
+    def __str__(self):
+        if self.interval == 1 and not self.byday and not self.bymonthday and self.freq in LEGACY_BY_FREQ:
+            return LEGACY_BY_FREQ[self.freq]
+        return self.to_rrule()
+
+    def to_rrule(self):
+        """Правило в формате RRULE без префикса (для базы и экспорта в iCalendar)"""
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.byday:
+            parts.append("BYDAY=" + ",".join(f"{ordinal or ''}{WEEKDAYS[day]}" for ordinal, day in self.byday))
+        if self.bymonthday:
+            parts.append("BYMONTHDAY=" + ",".join(str(day) for day in self.bymonthday))
+        if self.bysetpos:
+            parts.append("BYSETPOS=" + ",".join(str(position) for position in self.bysetpos))
+        return ";".join(parts)
+
+    @classmethod
+    def parse(cls, text):
+        """Правило из строки repeat_type или RRULE; None для однократных напоминаний"""
+        text = (text or 'once').strip()
+        if text == 'once':
+            return None
+        if text in LEGACY:
+            return cls(LEGACY[text])
+
+        text = text.upper()
+        if text.startswith('RRULE:'):
+            text = text[len('RRULE:'):]
+        rule = {}
+        for part in text.split(';'):
+            if not part:
+                continue
+            key, separator, value = part.partition('=')
+            if not separator or not value:
+                raise ValueError(f"некорректная часть правила '{part}'")
+            rule[key] = value
+
+        freq = rule.pop('FREQ', None)
+        if freq not in FREQS:
+            raise ValueError(f"неизвестная частота '{freq}'")
+        try:
+            interval = int(rule.pop('INTERVAL', 1))
+            byday = [cls._parse_byday(item) for item in rule.pop('BYDAY', '').split(',') if item]
+            bymonthday = [int(item) for item in rule.pop('BYMONTHDAY', '').split(',') if item]
+            bysetpos = [int(item) for item in rule.pop('BYSETPOS', '').split(',') if item]
+        except (TypeError, ValueError):
+            raise ValueError("некорректное значение в правиле")
+        if rule:
+            raise ValueError(f"не поддерживается: {', '.join(sorted(rule))}")
+        if interval < 1:
+            raise ValueError("INTERVAL должен быть положительным")
+        if any(day == 0 or not -31 <= day <= 31 for day in bymonthday):
+            raise ValueError("BYMONTHDAY должен быть от 1 до 31 или от -31 до -1")
+
+        if freq == 'DAILY' and byday and interval == 1:
+            # Каждый день по выбранным дням недели - то же, что еженедельно по этим дням
+            freq = 'WEEKLY'
+        if (byday or bymonthday) and freq not in ('WEEKLY', 'MONTHLY'):
+            raise ValueError("BYDAY и BYMONTHDAY поддерживаются только для WEEKLY и MONTHLY")
+        if bymonthday and freq != 'MONTHLY':
+            raise ValueError("BYMONTHDAY поддерживается только для MONTHLY")
+        if byday and bymonthday:
+            raise ValueError("BYDAY и BYMONTHDAY нельзя указывать вместе")
+        if freq == 'WEEKLY' and any(ordinal for ordinal, _ in byday):
+            raise ValueError("номер вхождения в BYDAY поддерживается только для MONTHLY")
+        if bysetpos and (freq != 'MONTHLY' or not (byday or bymonthday)):
+            raise ValueError("BYSETPOS поддерживается только для MONTHLY вместе с BYDAY или BYMONTHDAY")
+        if any(position == 0 or not -31 <= position <= 31 for position in bysetpos):
+            raise ValueError("BYSETPOS должен быть от 1 до 31 или от -31 до -1")
+        return cls(freq, interval, set(byday), set(bymonthday), set(bysetpos))
+
+    @staticmethod
+    def _parse_byday(item):
+        ordinal, day = item[:-2], item[-2:]
+        if day not in WEEKDAYS:
+            raise ValueError(f"неизвестный день недели '{day}'")
+        ordinal = int(ordinal) if ordinal not in ('', '+') else 0
+        if not -5 <= ordinal <= 5:
+            raise ValueError("номер вхождения дня недели должен быть от -5 до 5")
+        return ordinal, WEEKDAYS.index(day)
+
+    # ===== Вычисление повторений =====
+
+    def next_after(self, start, after=None):
+        """Первое повторение позже after (не раньше start); start - первое повторение, наивное время"""
+        after = start - EPSILON if after is None or after < start else after
+
+        period = self.period()
+        if period is not None:
+            steps = (after - start) // period + 1 if after >= start else 0
+            return start + period * steps
+
+        # Первая дата, в которую время повторения еще не прошло
+        clock = start.time()
+        day = after.date()
+        if datetime.combine(day, clock) <= after:
+            day += timedelta(days=1)
+
+        if self.freq == 'WEEKLY':
+            found = self._next_weekly_day(start.date(), day)
+        elif self.freq == 'MONTHLY':
+            found = self._next_monthly_day(start, day)
+        else:
+            return self._next_yearly(start, after)
+        return datetime.combine(found, clock) if found is not None else None
+
+    def period(self):
+        """Фиксированный период повторения или None, если он зависит от календаря"""
+        if self.freq in FIXED_PERIODS:
+            return FIXED_PERIODS[self.freq] * self.interval
+        if self.freq == 'WEEKLY' and not self.byday:
+            return timedelta(weeks=self.interval)
+        return None
+
+    def _next_weekly_day(self, start_day, day):
+        days = [weekday for _, weekday in self.byday]
+        first_monday = start_day - timedelta(days=start_day.weekday())
+        week = (day - first_monday).days // 7
+        if week % self.interval == 0:
+            index = bisect_left(days, day.weekday())
+            if index < len(days):
+                return day + timedelta(days=days[index] - day.weekday())
+            week += 1
+        # Следующая неделя, кратная интервалу, первый выбранный день
+        week = -(-week // self.interval) * self.interval
+        return first_monday + timedelta(weeks=week, days=days[0])
+
+    def _next_monthly_day(self, start, day):
+        first_month = start.year * 12 + start.month - 1
+        month = day.year * 12 + day.month - 1
+        aligned = first_month + -(-(month - first_month) // self.interval) * self.interval
+        from_day = day.day if aligned == month else 1
+        for _ in range(MAX_MONTH_STEPS):
+            days = self.month_days(aligned // 12, aligned % 12 + 1, start.day)
+            index = bisect_left(days, from_day)
+            if index < len(days):
+                return day.replace(year=aligned // 12, month=aligned % 12 + 1, day=days[index])
+            aligned += self.interval
+            from_day = 1
+        return None
+
+    def month_days(self, year, month, anchor_day):
+        """Отсортированные дни месяца, в которые срабатывает правило MONTHLY"""
+        days = self._month_days(year, month, anchor_day)
+        if self.bysetpos:
+            # Из выбранных дней остаются только стоящие на позициях BYSETPOS
+            days = sorted({days[position - 1 if position > 0 else position] for position in self.bysetpos
+                           if -len(days) <= position <= len(days)})
+        return days
+
+    def _month_days(self, year, month, anchor_day):
+        first_weekday, length = monthrange(year, month)
+        if self.bymonthday:
+            days = {day if day > 0 else length + day + 1 for day in self.bymonthday}
+            return sorted(day for day in days if 1 <= day <= length)
+        if self.byday:
+            days = set()
+            for ordinal, weekday in self.byday:
+                first = (weekday - first_weekday) % 7 + 1
+                matches = list(range(first, length + 1, 7))
+                if ordinal == 0:
+                    days.update(matches)
+                elif -len(matches) <= ordinal <= len(matches):
+                    days.add(matches[ordinal - 1 if ordinal > 0 else ordinal])
+            return sorted(days)
+        # Как у relativedelta: 31 число в коротком месяце становится последним днем
+        return [min(anchor_day, length)]
+
+    def _next_yearly(self, start, after):
+        years = max(0, (after.year - start.year) // self.interval)
+        candidate = start + relativedelta(years=years * self.interval)
+        while candidate <= after:
+            years += 1
+            candidate = start + relativedelta(years=years * self.interval)
+        return candidate
+
+    def between(self, start, range_start, range_end, limit=None):
+        """Все повторения в [range_start, range_end) по возрастанию (для повестки и прогнозов)"""
+        period = self.period()
+        if period is not None:
+            first = self.next_after(start, range_start - EPSILON)
+            count = max(0, -(-(range_end - first) // period))
+            if limit is not None:
+                count = min(count, limit)
+            return [first + period * step for step in range(count)]
+
+        occurrences = []
+        moment = self.next_after(start, range_start - EPSILON)
+        while moment is not None and moment < range_end and (limit is None or len(occurrences) < limit):
+            occurrences.append(moment)
+            moment = self.next_after(start, moment)
+        return occurrences
+
+    # ===== Описание для пользователя =====
+
+    def describe(self):
+        """Описание правила по-русски"""
+        name = str(self)
+        if name in Config.REPEAT_OPTIONS:
+            return Config.REPEAT_OPTIONS[name]
+
+        # Правило привязки к 29 или 30 числу: в коротком месяце - последний день
+        pinned = self.bysetpos == (-1,) and self.bymonthday and min(self.bymonthday) == 28
+        if self.bysetpos and not pinned:
+            return name
+        if self.interval == 1 and self.freq in ('MINUTELY', 'HOURLY'):
+            return "Каждую минуту" if self.freq == 'MINUTELY' else "Каждый час"
+        units = {'MINUTELY': 'мин.', 'HOURLY': 'ч', 'DAILY': 'дн.', 'WEEKLY': 'нед.', 'MONTHLY': 'мес.', 'YEARLY': 'г.'}
+        every = f"Каждые {self.interval} {units[self.freq]}" if self.interval > 1 else None
+        days = [weekday for _, weekday in self.byday]
+        if days == [0, 1, 2, 3, 4] and not every:
+            return "По будням"
+        if days == [5, 6] and not every:
+            return "По выходным"
+
+        if self.byday and self.freq == 'WEEKLY':
+            detail = "по " + ", ".join(WEEKDAY_NAMES[day] for day in days)
+        elif self.byday:
+            ordinals = {-1: 'последн.', 1: '1-й', 2: '2-й', 3: '3-й', 4: '4-й', 5: '5-й', -2: 'предпоследн.'}
+            detail = "в " + ", ".join(
+                f"{ordinals.get(ordinal, str(ordinal)) + ' ' if ordinal else 'каждый '}{WEEKDAY_NAMES[day]}"
+                for ordinal, day in self.byday
+            ) + " месяца"
+        elif pinned:
+            detail = f"{max(self.bymonthday)} числа (в коротком месяце - последний день)"
+        elif self.bymonthday:
+            parts = []
+            positive = [str(day) for day in self.bymonthday if day > 0]
+            if positive:
+                parts.append(", ".join(positive) + " числа")
+            parts.extend("последний день месяца" if day == -1 else f"{-day}-й день с конца месяца"
+                         for day in self.bymonthday if day < 0)
+            detail = ", ".join(parts)
+        else:
+            return every or Config.REPEAT_OPTIONS.get(LEGACY_BY_FREQ.get(self.freq), self.freq)
+        return f"{every} {detail}" if every else detail.capitalize()
+
+
+# ===== Разбор правил, введенных пользователем =====
+
+RU_WEEKDAYS = [
+    ('понедельн', 0), ('вторн', 1), ('сред', 2), ('четверг', 3), ('пятниц', 4), ('суббот', 5), ('воскрес', 6),
+]
+RU_ORDINALS = [('последн', -1), ('перв', 1), ('втор', 2), ('трет', 3), ('четверт', 4)]
+RU_UNITS = [
+    ('минут', 'MINUTELY'), ('час', 'HOURLY'), ('дн', 'DAILY'), ('день', 'DAILY'),
+    ('недел', 'WEEKLY'), ('месяц', 'MONTHLY'), ('год', 'YEARLY'), ('лет', 'YEARLY'),
+]
+
+RU_ADVERBS = [
+    ('ежеминут', 'MINUTELY'), ('ежечас', 'HOURLY'), ('ежеднев', 'DAILY'), ('еженедел', 'WEEKLY'),
+    ('ежемесяч', 'MONTHLY'), ('ежегод', 'YEARLY'),
+]
+
+
+def _weekdays_in(words):
+    return [day for word in words for stem, day in RU_WEEKDAYS if word.startswith(stem)]
+
+
+def parse_phrase(text):
+    """Правило из фразы: 'по будням', 'каждые 2 часа', 'по понедельникам и средам',
+    'в последнюю пятницу месяца', '15 числа каждого месяца' или строка RRULE.
+    Время суток берется из времени напоминания.
+    """
+    phrase = text.lower().strip()
+    words = re.findall(r'[а-яё]+|-?\d+', phrase)
+
+    if 'будн' in phrase:
+        return Recurrence('WEEKLY', byday={(0, day) for day in range(5)})
+    if 'выходн' in phrase:
+        return Recurrence('WEEKLY', byday={(0, 5), (0, 6)})
+
+    if 'месяц' in phrase:
+        if 'последн' in phrase and 'день' in phrase:
+            return Recurrence('MONTHLY', bymonthday={-1})
+        weekdays = _weekdays_in(words)
+        if weekdays:
+            ordinal = next((value for word in words for stem, value in RU_ORDINALS
+                            if word.startswith(stem) and not _weekdays_in([word])), 0)
+            return Recurrence('MONTHLY', byday={(ordinal, day) for day in weekdays})
+        if 'числ' in phrase:
+            days = [int(word) for word in words if word.lstrip('-').isdigit()]
+            if days:
+                return Recurrence.parse(f"FREQ=MONTHLY;BYMONTHDAY={','.join(str(day) for day in days)}")
+
+    if phrase.startswith('кажд') or phrase.startswith('раз в'):
+        numbers = [int(word) for word in words if word.isdigit()]
+        interval = numbers[0] if numbers else 1
+        weekdays = _weekdays_in(words[1:])
+        if weekdays:
+            return Recurrence('WEEKLY', interval, byday={(0, day) for day in weekdays})
+        if interval < 1:
+            raise ValueError("Интервал повторения должен быть положительным")
+        for stem, freq in RU_UNITS:
+            if any(word.startswith(stem) for word in words):
+                return Recurrence(freq, interval)
+
+    for stem, freq in RU_ADVERBS:
+        if phrase.startswith(stem):
+            return Recurrence(freq)
+
+    weekdays = _weekdays_in(words)
+    if weekdays and (phrase.startswith('по ') or phrase.startswith('в ')):
+        return Recurrence('WEEKLY', byday={(0, day) for day in weekdays})
+
+    if '=' not in phrase:
+        raise ValueError("нужна фраза из примеров или строка RRULE")
+    rule = Recurrence.parse(text)
+    if rule is None:
+        raise ValueError("нужна фраза из примеров или строка RRULE")
+    return rule
+
+
+# ===== Функции для значений колонки repeat_type =====
+
+@lru_cache(maxsize=1024)
+def rule_for(repeat_type):
+    """Разобранное правило для значения repeat_type (различных правил немного, разбор кешируется)"""
+    return Recurrence.parse(repeat_type)
+
+
+def normalize(repeat_type):
+    """Каноническая строка repeat_type; ValueError для неподдерживаемых правил"""
+    rule = rule_for(repeat_type)
+    return str(rule) if rule is not None else 'once'
+
+
+def describe(repeat_type):
+    """Описание repeat_type для сообщений бота"""
+    try:
+        rule = rule_for(repeat_type)
+    except ValueError:
+        return repeat_type
+    return rule.describe() if rule is not None else Config.REPEAT_OPTIONS['once']
+
+
+def next_occurrence(repeat_type, start, after=None):
+    """Следующее повторение (UTC) позже after; None для однократных.
+
+    Дни недели и месяца считаются по московскому времени, как их видит пользователь.
+    """
+    rule = rule_for(repeat_type)
+    if rule is None:
+        return None
+    after = start if after is None else after
+    if rule.period() is not None:
+        return rule.next_after(start, after)
+    local = rule.next_after(start + MOSCOW_OFFSET, after + MOSCOW_OFFSET)
+    return local - MOSCOW_OFFSET if local is not None else None
+
+
+def anchored(repeat_type, start):
+    """Правило, привязанное к дню первого срабатывания start (UTC).
+
+    Ежемесячное правило без дней месяца считает следующее повторение от текущего, поэтому
+    после короткого месяца 31 число съехало бы на 28-е. Для 29-31 числа день фиксируется
+    в самом правиле (BYMONTHDAY с BYSETPOS), а ежегодное с 29 февраля становится
+    последним днем февраля: доставка, повестка и прогноз раскрывают одну и ту же серию.
+    """
+    rule = rule_for(repeat_type)
+    if rule is None or rule.byday or rule.bymonthday:
+        return repeat_type
+    local = start + MOSCOW_OFFSET
+    if rule.freq == 'MONTHLY' and local.day > 28:
+        if local.day == monthrange(local.year, local.month)[1]:
+            return str(Recurrence('MONTHLY', rule.interval, bymonthday={-1}))
+        return str(Recurrence('MONTHLY', rule.interval, bymonthday=range(28, local.day + 1), bysetpos={-1}))
+    if rule.freq == 'YEARLY' and (local.month, local.day) == (2, 29):
+        return str(Recurrence('MONTHLY', rule.interval * 12, bymonthday={-1}))
+    return repeat_type
+
+
+def first_occurrence(repeat_type, start):
+    """Первое срабатывание не раньше start: для правил по дням недели или месяца start
+    сдвигается на ближайший подходящий день, чтобы первое напоминание совпадало с правилом
+    """
+    if rule_for(repeat_type) is None:
+        return start
+    return next_occurrence(repeat_type, start, start - EPSILON) or start
+
+
+def occurrences_between(repeat_type, start, range_start, range_end, limit=None):
+    """Повторения (UTC) в [range_start, range_end); для однократных - само start, если попадает в диапазон"""
+    rule = rule_for(repeat_type)
+    if rule is None:
+        return [start] if range_start <= start < range_end else []
+    return [
+        moment - MOSCOW_OFFSET
+        for moment in rule.between(start + MOSCOW_OFFSET, range_start + MOSCOW_OFFSET, range_end + MOSCOW_OFFSET, limit)
+    ]
@@ -1,173 +1,475 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.base import BaseTrigger
+from apscheduler.util import convert_to_datetime
 from datetime import datetime, timedelta
 import logging
 import asyncio
-import sqlite3
-from database import Database
+import os
+import socket
+import threading
+import time
+import forecast
+from catchup import MissedReminders
+from coalescing import ChatCoalescer
+from config import Config
+from delivery_errors import is_chat_unavailable, retry_delay
+from maintenance import DatabaseMaintenance
+from storage import create_database
+from timer_wheel import TimerWheelThread
 from utils import TimeParser
 
+
+class FirePointsTrigger(BaseTrigger):
+    """Триггер с несколькими моментами срабатывания одной задачи.
+
+    Уведомления заранее и само напоминание - точки одной задачи планировщика,
+    поэтому на напоминание приходится одна запись независимо от числа уведомлений.
+    """
+
+    __slots__ = ('run_dates',)
+
+    def __init__(self, run_dates, timezone):
+        # Время без зоны трактуется в часовом поясе планировщика, как в DateTrigger
+        self.run_dates = sorted(convert_to_datetime(run_date, timezone, 'run_date') for run_date in run_dates)
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        for run_date in self.run_dates:
+            if previous_fire_time is None or run_date > previous_fire_time:
+                return run_date
+        return None
+
+    def __str__(self):
+        return 'fire points: ' + ', '.join(run_date.isoformat() for run_date in self.run_dates)
+
+
 class ReminderScheduler:
-    def __init__(self, bot):
+    def __init__(self, bot, owner_id=None, db=None, loop=None):
         self.scheduler = BackgroundScheduler()
-        self.db = Database()
+        # Напоминания: задачи APScheduler или компактное колесо таймеров (id и секунда срабатывания)
+        self.wheel = TimerWheelThread(self.fire_from_wheel) if Config.SCHEDULER_BACKEND == 'wheel' else None
+        # Бот передает свое хранилище, чтобы слой базы создавался один раз
+        self.db = db or create_database()
+        self.maintenance = DatabaseMaintenance(self.db)
         self.bot = bot
+        # Идентификатор владельца захваченных напоминаний
+        self.owner_id = owner_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.missed = MissedReminders(bot, self.db, self.owner_id, pause_user=self.pause_user)
+        # Текущий проход по пропущенным напоминаниям (concurrent.futures.Future задачи в цикле отправки)
+        self._catchup = None
+        # Сообщения одному чату, наступившие в одно окно, уходят одним send_message
+        self.outbox = ChatCoalescer(bot)
+        # Цикл событий отправки: цикл приложения, в котором живут соединения бота с Bot API,
+        # или собственный поток, если цикл не передан
+        self.loop = loop
+        self._own_loop = loop is None
         self.start_scheduler()
         self.restore_pending_reminders()
 
     def start_scheduler(self):
         """Запуск планировщика"""
+        # Отправка идет в одном цикле событий: задачи планировщика только передают в него
+        # напоминания и не ждут окна объединения сообщений
+        if self._own_loop:
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, name='reminder-delivery', daemon=True).start()
         self.scheduler.start()
+        if self.wheel is not None:
+            self.wheel.start()
+        self.scheduler.add_job(
+            self.archive_old_reminders, 'interval', seconds=Config.ARCHIVE_INTERVAL,
+            id='archive_old_reminders', max_instances=1, coalesce=True
+        )
+        self.scheduler.add_job(
+            self.run_maintenance, 'interval', seconds=Config.MAINTENANCE_INTERVAL,
+            id='database_maintenance', max_instances=1, coalesce=True
+        )
+        # При старте - все наступившие напоминания (загружаются только будущие),
+        # затем периодически - просроченные из-за зависаний
+        self.scheduler.add_job(self.catch_up_missed, args=[0], id='catch_up_startup')
+        self.scheduler.add_job(
+            self.catch_up_missed, 'interval', seconds=Config.CATCHUP_INTERVAL,
+            id='catch_up_missed', max_instances=1, coalesce=True
+        )
+        # Окно прогноза нагрузки сдвигается сразу при старте: за время простоя оно могло устареть
+        self.scheduler.add_job(
+            self.roll_forecast, 'interval', seconds=Config.FORECAST_ROLL_INTERVAL, next_run_time=datetime.now(),
+            id='roll_forecast', max_instances=1, coalesce=True
+        )
         logging.info("Scheduler started")
 
+    def archive_old_reminders(self):
+        """Перенос старых выполненных и отмененных напоминаний в архив небольшими пачками"""
+        older_than = datetime.utcnow() - timedelta(days=Config.ARCHIVE_AFTER_DAYS)
+        archived = 0
+        try:
+            while True:
+                moved = self.db.archive_reminders(older_than, Config.ARCHIVE_BATCH_SIZE)
+                archived += moved
+                if moved < Config.ARCHIVE_BATCH_SIZE:
+                    break
+                # Пауза между пачками, чтобы не занимать базу надолго
+                time.sleep(Config.ARCHIVE_BATCH_PAUSE)
+        except Exception as e:
+            logging.error(f"Error archiving reminders: {e}")
+        if archived:
+            logging.info(f"Archived {archived} reminders")
+        return archived
+
+    def catch_up_missed(self, grace_seconds=None):
+        """Запуск прохода по пропущенным напоминаниям задачей в цикле отправки.
+        
+        Поток планировщика не ждет окончания прохода: стартовый проход ограничен CATCHUP_RATE
+        и может идти минутами. Пока предыдущий проход не закончен, новый не запускается.
+        """
+        if self._catchup is not None and not self._catchup.done():
+            logging.info("Previous catch-up pass is still running, skipping")
+            return None
+        self._catchup = self.submit(self.catch_up(grace_seconds))
+        return self._catchup
+
+    async def catch_up(self, grace_seconds=None):
+        """Сводки пропущенных напоминаний и планирование их следующих повторений"""
+        try:
+            repetitions = await self.missed.run(grace_seconds=grace_seconds)
+        except Exception as e:
+            logging.error(f"Error catching up missed reminders: {e}")
+            return 0
+        for reminder_id, user_id, reminder_text, next_time, notify_offsets in repetitions:
+            self.schedule_next_repetition(reminder_id, user_id, reminder_text, next_time, notify_offsets)
+        return len(repetitions)
+
+    def roll_forecast(self):
+        """Сдвиг окна прогноза нагрузки; прогноз на ближайший час пишется в лог как метрика"""
+        try:
+            rolled = self.db.roll_forecast(Config.FORECAST_HOURS)
+            now = datetime.utcnow()
+            summary = forecast.summarize(self.db.get_load_forecast(now, now + timedelta(hours=1)))
+        except Exception as e:
+            logging.error(f"Error rolling load forecast: {e}")
+            return None
+        peak_minute, peak_fires = summary['peak'] or (now, 0)
+        logging.info(
+            f"Load forecast: {summary['total']} fires in the next hour, "
+            f"peak {peak_fires}/min at {peak_minute:%H:%M} UTC ({rolled} series rolled)"
+        )
+        return summary
+
+    def run_maintenance(self):
+        """Обслуживание базы в тихое время"""
+        try:
+            return self.maintenance.run_due()
+        except Exception as e:
+            logging.error(f"Error in database maintenance: {e}")
+            return {}
+
     def restore_pending_reminders(self):
-        """Восстановление напоминаний при перезапуске бота"""
+        """Восстановление напоминаний при перезапуске бота в фоновом потоке.
+        
+        Бот начинает принимать обновления сразу, а напоминания загружаются в планировщик
+        пачками, начиная с ближайших.
+        """
+        self.hydrated = threading.Event()
+        threading.Thread(target=self.hydrate_pending_reminders, name='scheduler-hydration', daemon=True).start()
+
+    def hydrate_pending_reminders(self):
+        """Загрузка всех будущих активных напоминаний в планировщик пачками"""
+        started = time.perf_counter()
+        restored_count = 0
+        chunks = 0
         try:
-            # Получаем все активные напоминания
-            reminders = self.db.get_pending_reminders()
-            
-            restored_count = 0
-            for rem_id, user_id, text, reminder_time_str, repeat_type, notify_before in reminders:
-                try:
-                    # Парсим время из базы
-                    if '.' in reminder_time_str:
-                        reminder_time = datetime.strptime(reminder_time_str, '%Y-%m-%d %H:%M:%S.%f')
-                    else:
-                        reminder_time = datetime.strptime(reminder_time_str, '%Y-%m-%d %H:%M:%S')
-                    
-                    # Планируем основное напоминание
-                    self.add_reminder(user_id, text, reminder_time, rem_id)
-                    
-                    # Планируем уведомление заранее
-                    if notify_before > 0:
-                        notify_time = reminder_time - timedelta(minutes=notify_before)
-                        if notify_time > datetime.utcnow():
-                            self.add_notification(user_id, text, notify_time, rem_id, True)
-                    
-                    restored_count += 1
-                    
-                except Exception as e:
-                    logging.error(f"Error restoring reminder {rem_id}: {e}")
-                    continue
-            
-            logging.info(f"Restored {restored_count} pending reminders")
-            
+            for reminders in self.db.iter_pending_reminders(datetime.utcnow(), Config.HYDRATION_CHUNK_SIZE):
+                for rem_id, user_id, text, reminder_time_str, repeat_type, notify_before, notify_offsets in reminders:
+                    try:
+                        # Одна задача: уведомления заранее и основное напоминание
+                        self.add_reminder(
+                            user_id, text, TimeParser.parse_db_time(reminder_time_str), rem_id,
+                            TimeParser.parse_notify_offsets(notify_before, notify_offsets)
+                        )
+                        restored_count += 1
+                    except Exception as e:
+                        logging.error(f"Error restoring reminder {rem_id}: {e}")
+                chunks += 1
+                # Пауза между пачками, чтобы не занимать базу и GIL во время старта
+                time.sleep(Config.HYDRATION_CHUNK_PAUSE)
         except Exception as e:
             logging.error(f"Error in restore_pending_reminders: {e}")
+        finally:
+            self.hydrated.set()
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logging.info(f"Restored {restored_count} pending reminders in {chunks} chunks, {elapsed_ms:.0f} ms")
+        return restored_count
 
-    def add_reminder(self, user_id, reminder_text, reminder_time, reminder_id, is_notification=False):
-        """Добавление напоминания в планировщик"""
+    @staticmethod
+    def fire_points(reminder_time, notify_offsets=(), now=None):
+        """Упорядоченные точки срабатывания: (время, номер уведомления заранее или None для напоминания).
+        
+        Уведомления, время которых уже прошло, не планируются.
+        """
+        now = now or datetime.utcnow()
+        points = []
+        for index, minutes in enumerate(notify_offsets):
+            notify_time = reminder_time - timedelta(minutes=minutes)
+            if notify_time > now:
+                points.append((notify_time, index))
+        points.append((reminder_time, None))
+        return points
+
+    def add_reminder(self, user_id, reminder_text, reminder_time, reminder_id, notify_offsets=()):
+        """Добавление напоминания в планировщик (заменяет уже запланированное с тем же id)"""
         try:
-            trigger = DateTrigger(run_date=reminder_time)
+            points = self.fire_points(reminder_time, notify_offsets)
             
-            job_id = f"notify_{reminder_id}" if is_notification else str(reminder_id)
+            if self.wheel is not None:
+                # В колесе только ближайшая точка, следующие вычисляются при срабатывании
+                self.wheel.add(reminder_id, points[0][0])
+                return
             
             self.scheduler.add_job(
                 self.send_reminder_wrapper,
-                trigger,
-                id=job_id,
-                args=[user_id, reminder_text, reminder_id, is_notification]
+                FirePointsTrigger([fire_time for fire_time, _ in points], self.scheduler.timezone),
+                id=str(reminder_id),
+                args=[user_id, reminder_text, reminder_id, points],
+                replace_existing=True
             )
             
-            logging.info(f"Reminder scheduled for user {user_id} at {reminder_time} (notification: {is_notification})")
+            logging.info(f"Reminder scheduled for user {user_id} at {reminder_time} "
+                         f"({len(points) - 1} notifications before)")
         except Exception as e:
             logging.error(f"Error scheduling reminder for user {user_id}: {e}")
 
-    def send_reminder_wrapper(self, user_id, reminder_text, reminder_id, is_notification=False):
-        """Обертка для асинхронной отправки напоминания"""
-        asyncio.run(self.send_reminder(user_id, reminder_text, reminder_id, is_notification))
+    def add_reminders_bulk(self, user_id, reminders):
+        """Планирование пачки напоминаний: пары (reminder_id, (text, time, category, repeat_type, notify_before))"""
+        for reminder_id, (reminder_text, reminder_time, _, _, notify_before) in reminders:
+            offsets = notify_before if isinstance(notify_before, (list, tuple)) else [notify_before]
+            self.add_reminder(
+                user_id, reminder_text, reminder_time, reminder_id,
+                sorted({minutes for minutes in offsets if minutes > 0}, reverse=True)
+            )
+
+    def submit(self, coro):
+        """Передача корутины в цикл отправки; возвращает concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def send_reminder_wrapper(self, user_id, reminder_text, reminder_id, points):
+        """Обертка для асинхронной отправки: определяет, какая точка задачи сработала"""
+        # Последняя наступившая точка (небольшой запас на разницу часов)
+        now = datetime.utcnow() + timedelta(seconds=1)
+        due = [index for fire_time, index in points if fire_time <= now]
+        notification_index = due[-1] if due else points[0][1]
+        self.submit(self.send_reminder(user_id, reminder_text, reminder_id, notification_index))
 
-    def add_notification(self, user_id, reminder_text, notify_time, reminder_id, is_notification=True):
-        """Добавление уведомления заранее"""
-        self.add_reminder(user_id, reminder_text, notify_time, reminder_id, is_notification)
+    def fire_from_wheel(self, reminder_id):
+        """Срабатывание записи колеса: данные напоминания читаются из базы"""
+        reminder = self.db.get_reminder(reminder_id)
+        if not reminder or reminder[6] != 'active':
+            return
+        
+        user_id, reminder_text = reminder[1], reminder[2]
+        offsets = TimeParser.parse_notify_offsets(reminder[7], reminder[14])
+        points = self.fire_points(TimeParser.parse_db_time(reminder[3]), offsets, now=datetime.min)
+        
+        now = datetime.utcnow() + timedelta(seconds=1)
+        due = [index for fire_time, index in points if fire_time <= now]
+        later = [fire_time for fire_time, _ in points if fire_time > now]
+        if later:
+            self.wheel.add(reminder_id, later[0])
+        notification_index = due[-1] if due else points[0][1]
+        self.submit(self.send_reminder(user_id, reminder_text, reminder_id, notification_index))
 
-    async def send_reminder(self, user_id, reminder_text, reminder_id, is_notification=False):
-        """Отправка напоминания пользователю"""
+    async def send_reminder(self, user_id, reminder_text, reminder_id, notification_index=None):
+        """Отправка напоминания пользователю (или уведомления заранее с номером notification_index)"""
+        if notification_index is not None:
+            await self.send_notification(user_id, reminder_text, reminder_id, notification_index)
+            return
+        
         try:
-            # Проверяем, существует ли еще пользователь и напоминание
-            reminder = self.db.get_reminder(reminder_id)
-            if not reminder:
-                logging.info(f"Reminder {reminder_id} not found, skipping")
-                return
-                
-            if reminder[1] != user_id:  # user_id в позиции 1
-                logging.warning(f"User ID mismatch for reminder {reminder_id}")
-                return
-            
-            if is_notification:
-                message = f"🔔 Скоро напоминание: {reminder_text}"
-            else:
-                message = f"⏰ Напоминание: {reminder_text}"
-                
-                # Помечаем как выполненное для одноразовых напоминаний
-                if reminder[5] == 'once':  # repeat_type в позиции 5
-                    self.db.update_reminder_status(reminder_id, 'completed')
-                elif reminder[5] != 'once':
-                    # Для повторяющихся - создаем следующее напоминание
-                    self.schedule_next_repetition(reminder_id, reminder)
-            
-            await self.bot.send_message(chat_id=user_id, text=message)
-            logging.info(f"Reminder sent to user {user_id} (notification: {is_notification})")
+            # Захватываем напоминание: другой процесс или повторный запуск задачи его не получит.
+            # Запросы к базе идут в пуле потоков: цикл отправки - это цикл приложения, и ожидание
+            # блокировки записи или соединения из пула не должно задерживать обработку обновлений
+            reminder = await asyncio.to_thread(
+                self.db.claim_reminder, reminder_id, self.owner_id, Config.DELIVERY_LEASE_SECONDS
+            )
+        except Exception as e:
+            logging.error(f"Failed to claim reminder {reminder_id}: {e}")
+            return
+        
+        if not reminder:
+            logging.info(f"Reminder {reminder_id} is not active or already claimed, skipping")
+            return
+        
+        if reminder[1] != user_id:  # user_id в позиции 1
+            logging.warning(f"User ID mismatch for reminder {reminder_id}")
+            return
+        
+        await self.deliver_claimed(reminder)
+
+    async def send_notification(self, user_id, reminder_text, reminder_id, index=0):
+        """Отправка уведомления заранее"""
+        try:
+            attempts = await asyncio.to_thread(self.db.claim_notification, reminder_id, index)
+        except Exception as e:
+            logging.error(f"Failed to claim notification for reminder {reminder_id}: {e}")
+            return
+        
+        if not attempts:
+            logging.info(f"Notification for reminder {reminder_id} already sent or not active, skipping")
+            return
+        
+        try:
+            await self.outbox.send(user_id, f"🔔 Скоро напоминание: {reminder_text}")
+            logging.info(f"Reminder sent to user {user_id} (notification: True)")
             
+        except Exception as e:
+            logging.error(f"Failed to send notification to user {user_id}: {e}")
+            await asyncio.to_thread(
+                self.handle_notification_failure, reminder_id, user_id, reminder_text, index, attempts, e
+            )
+
+    def send_notification_wrapper(self, user_id, reminder_text, reminder_id, index):
+        """Обертка для повторной отправки уведомления заранее из задачи планировщика"""
+        self.submit(self.send_notification(user_id, reminder_text, reminder_id, index))
+
+    async def deliver_claimed(self, reminder):
+        """Отправка захваченного напоминания; выполненным оно помечается только после успешной отправки"""
+        rem_id, user_id, reminder_text, reminder_time_str, repeat_type, notify_before, attempts, notify_offsets = reminder
+        
+        try:
+            await self.outbox.send(user_id, f"⏰ Напоминание: {reminder_text}")
         except Exception as e:
             logging.error(f"Failed to send reminder to user {user_id}: {e}")
+            await asyncio.to_thread(self.handle_send_failure, rem_id, user_id, reminder_text, attempts, e)
+            return
+        
+        logging.info(f"Reminder sent to user {user_id} (notification: False)")
+        
+        next_time = None
+        if repeat_type != 'once':
+            # Ближайшее будущее повторение: частые правила могли пройти за время повторных попыток
+            next_time = TimeParser.next_future_reminder(TimeParser.parse_db_time(reminder_time_str), repeat_type)
+        
+        completed, next_reminder_id = await asyncio.to_thread(
+            self.db.complete_delivery, rem_id, self.owner_id, next_time
+        )
+        if not completed:
+            logging.warning(f"Lease for reminder {rem_id} expired before completion")
+            return
+        
+        if next_reminder_id:
+            self.schedule_next_repetition(
+                next_reminder_id, user_id, reminder_text, next_time,
+                TimeParser.parse_notify_offsets(notify_before, notify_offsets)
+            )
+
+    def handle_send_failure(self, reminder_id, user_id, reminder_text, attempts, error=None):
+        """Повторная попытка с экспоненциальной задержкой или отказ после лимита попыток.
+        
+        Если чат недоступен (бот заблокирован, аккаунт удален), повторять бессмысленно:
+        приостанавливаются все напоминания пользователя.
+        """
+        if error is not None and is_chat_unavailable(error):
+            self.pause_user(user_id)
+            return
+        
+        if attempts >= Config.DELIVERY_MAX_ATTEMPTS:
+            logging.error(f"Reminder {reminder_id} failed {attempts} times, giving up")
+            self.db.update_reminder_status(reminder_id, 'cancelled')
+            return
+        
+        delay = retry_delay(error, attempts)
+        self.db.release_reminder(reminder_id, self.owner_id, delay)
+        self.add_reminder(user_id, reminder_text, datetime.utcnow() + timedelta(seconds=delay), reminder_id)
+        logging.info(f"Reminder {reminder_id} will be retried in {delay}s (attempt {attempts})")
+
+    def handle_notification_failure(self, reminder_id, user_id, reminder_text, index, attempts, error):
+        """Повтор уведомления заранее с экспоненциальной задержкой или отказ после лимита попыток.
+        
+        При недоступном чате уведомление возвращается в очередь, а напоминания пользователя
+        приостанавливаются.
+        """
+        if is_chat_unavailable(error):
+            self.db.release_notification(reminder_id, index)
+            self.pause_user(user_id)
+            return
+        
+        if attempts >= Config.DELIVERY_MAX_ATTEMPTS:
+            # Уведомление остается отмеченным: само напоминание придет в свое время
+            logging.error(f"Notification {index} for reminder {reminder_id} failed {attempts} times, giving up")
+            return
+        
+        delay = retry_delay(error, attempts)
+        self.db.release_notification(reminder_id, index, delay)
+        self.retry_notification(user_id, reminder_text, reminder_id, index, delay)
+        logging.info(f"Notification {index} for reminder {reminder_id} will be retried in {delay}s (attempt {attempts})")
+
+    def retry_notification(self, user_id, reminder_text, reminder_id, index, delay):
+        """Планирование повторной отправки уведомления заранее через delay секунд"""
+        self.scheduler.add_job(
+            self.send_notification_wrapper, 'date', run_date=datetime.utcnow() + timedelta(seconds=delay),
+            id=f"{reminder_id}:notification", args=[user_id, reminder_text, reminder_id, index],
+            replace_existing=True
+        )
+
+    def pause_user(self, user_id):
+        """Приостановка всех напоминаний пользователя, который заблокировал бота, до его /start"""
+        try:
+            reminder_ids = self.db.deactivate_user(user_id)
+        except Exception as e:
+            logging.error(f"Error pausing reminders of user {user_id}: {e}")
+            return []
+        for reminder_id in reminder_ids:
+            self.cancel_reminder(reminder_id)
+        logging.warning(f"Chat {user_id} is unavailable, {len(reminder_ids)} reminders paused until /start")
+        return reminder_ids
 
-    def schedule_next_repetition(self, reminder_id, reminder):
+    def schedule_next_repetition(self, reminder_id, user_id, reminder_text, next_time, notify_offsets=()):
         """Планирование следующего повторения"""
         try:
-            user_id, reminder_text, reminder_time_str, category, repeat_type, status = reminder[1:7]
-            
-            # Парсим время
-            try:
-                if '.' in reminder_time_str:
-                    reminder_time = datetime.strptime(reminder_time_str, '%Y-%m-%d %H:%M:%S.%f')
-                else:
-                    reminder_time = datetime.strptime(reminder_time_str, '%Y-%m-%d %H:%M:%S')
-            except ValueError as e:
-                logging.error(f"Ошибка парсинга времени для повторения: {e}")
-                return
-            
-            next_time = TimeParser.calculate_next_reminder(reminder_time, repeat_type)
-            
-            if next_time:
-                # Получаем notify_before из базы
-                full_reminder = self.db.get_reminder(reminder_id)
-                notify_before = full_reminder[7] if len(full_reminder) > 7 else 0
-                
-                # Создаем новое напоминание
-                new_reminder_id = self.db.add_reminder(
-                    user_id, reminder_text, next_time, category, repeat_type, notify_before
-                )
-                
-                # Планируем его
-                self.add_reminder(user_id, reminder_text, next_time, new_reminder_id)
-                
-                # Уведомление заранее
-                if notify_before > 0:
-                    notify_time = next_time - timedelta(minutes=notify_before)
-                    self.add_notification(user_id, reminder_text, notify_time, new_reminder_id, True)
-                
-                logging.info(f"Scheduled next repetition for user {user_id}, reminder {new_reminder_id} at {next_time}")
+            self.add_reminder(user_id, reminder_text, next_time, reminder_id, notify_offsets)
+            logging.info(f"Scheduled next repetition for user {user_id}, reminder {reminder_id} at {next_time}")
                 
         except Exception as e:
             logging.error(f"Error scheduling next repetition for user {user_id}: {e}")
 
     def cancel_reminder(self, reminder_id):
-        """Отмена напоминания в планировщике"""
+        """Отмена напоминания в планировщике (вместе с уведомлениями заранее)"""
         try:
-            # Удаляем основное напоминание
-            if self.scheduler.get_job(str(reminder_id)):
+            if self.wheel is not None:
+                self.wheel.cancel(reminder_id)
+            elif self.scheduler.get_job(str(reminder_id)):
                 self.scheduler.remove_job(str(reminder_id))
-            
-            # Удаляем уведомление
-            notification_job_id = f"notify_{reminder_id}"
-            if self.scheduler.get_job(notification_job_id):
-                self.scheduler.remove_job(notification_job_id)
                 
             logging.info(f"Cancelled reminder {reminder_id}")
         except Exception as e:
             logging.error(f"Error cancelling reminder {reminder_id}: {e}")
 
-    def shutdown(self):
-        """Остановка планировщика"""
-        self.scheduler.shutdown()
\ No newline at end of file
+    def shutdown(self, wait=True):
+        """Остановка планировщика; wait=False - не ждать уже запущенные задачи"""
+        if self.wheel is not None:
+            self.wheel.shutdown(wait)
+        self.scheduler.shutdown(wait=wait)
+        if self._catchup is not None:
+            # Незаконченный проход отменяется: захваченные напоминания вернутся после аренды
+            self._catchup.cancel()
+        if self._own_loop and self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class PassiveScheduler:
+    """Планировщик процесса бота в режиме workers.
+
+    Бот только пишет напоминания в базу, а отправкой занимаются процессы
+    доставки, поэтому планировать и отменять в памяти ничего не нужно.
+    """
+
+    def add_reminder(self, user_id, reminder_text, reminder_time, reminder_id, notify_offsets=()):
+        pass
+
+    def add_reminders_bulk(self, user_id, reminders):
+        pass
+
+    def cancel_reminder(self, reminder_id):
+        pass
+
+    def shutdown(self, wait=True):
+        pass
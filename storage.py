@@ -0,0 +1,361 @@
+import json
+import logging
+import re
+from collections import Counter
+from datetime import datetime
+
+import forecast
+from config import Config
+from utils import TimeParser
+
+
+class Storage:
+    """Интерфейс хранилища напоминаний.
+
+    Набор методов повторяет Database: бот, планировщик, процессы доставки и бенчмарки
+    работают с любым хранилищем только через них. Строки возвращаются кортежами
+    в порядке колонок SQLite-версии, время - строками 'YYYY-MM-DD HH:MM:SS[.ffffff]' (UTC).
+    Здесь же общий для всех хранилищ код, который не зависит от способа хранения.
+    """
+
+    # Поля, которые возвращают методы захвата напоминаний
+    CLAIM_COLUMNS = 'id, user_id, reminder_text, reminder_time, repeat_type, notify_before, attempts, notify_offsets'
+    # То же для уведомлений заранее: вместо попыток напоминания - попытки текущего уведомления
+    NOTIFICATION_COLUMNS = ('id, user_id, reminder_text, reminder_time, repeat_type, notify_before, '
+                            'notify_attempts, notify_offsets')
+    # Поля напоминания, по которым считаются срабатывания для прогноза
+    FORECAST_COLUMNS = 'id, reminder_time, repeat_type, notify_before, notify_offsets, forecast_next'
+    ARCHIVE_COLUMNS = ('id, user_id, reminder_text, reminder_time, category, repeat_type, '
+                       'status, notify_before, created_at, updated_at')
+
+    # Слова запроса длиннее этого ищутся по первым буквам: префиксный индекс FTS5 построен
+    # для 2-5 символов, а окончания русских слов меняются ("анализов" находит "анализы")
+    SEARCH_PREFIX_LENGTH = 5
+    # Текст для индекса: ё индексируется как е (remove_diacritics в unicode61 касается только латиницы)
+    SEARCH_TEXT_SQL = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+
+    # ===== Пользователи =====
+
+    def add_or_update_user(self, user_id, username=None, first_name=None, last_name=None):
+        """Добавление или обновление информации о пользователе"""
+        raise NotImplementedError
+
+    def get_user_info(self, user_id):
+        """(user_id, username, first_name, last_name, created_at, last_active, is_active) или None"""
+        raise NotImplementedError
+
+    def get_all_users(self):
+        """(user_id, username, first_name, last_name, created_at), новые первыми"""
+        raise NotImplementedError
+
+    def iter_users(self, after_user_id=0, chunk_size=1000, active_only=False):
+        """Пачки пользователей (как get_all_users) по возрастанию user_id, начиная после after_user_id;
+        active_only - без пользователей, заблокировавших бота
+        """
+        raise NotImplementedError
+
+    def deactivate_user(self, user_id):
+        """Пометка недоступным и приостановка (paused) активных напоминаний одной транзакцией; возвращает их id"""
+        raise NotImplementedError
+
+    def reactivate_user(self, user_id):
+        """Возобновление приостановленных напоминаний; возвращает строки как iter_pending_reminders"""
+        raise NotImplementedError
+
+    # ===== Рассылки =====
+
+    def create_broadcast(self, admin_id, message_text):
+        """Создание рассылки; возвращает ее id"""
+        raise NotImplementedError
+
+    def get_broadcast(self, broadcast_id):
+        """(id, admin_id, message_text, status, last_user_id, sent_count, failed_count, progress_message_id)"""
+        raise NotImplementedError
+
+    def get_running_broadcasts(self):
+        """id незавершенных рассылок по возрастанию"""
+        raise NotImplementedError
+
+    def update_broadcast(self, broadcast_id, **kwargs):
+        """Сохранение прогресса и статуса рассылки"""
+        raise NotImplementedError
+
+    # ===== Напоминания =====
+
+    def add_reminder(self, user_id, reminder_text, reminder_time, category='other', repeat_type='once', notify_before=0):
+        """Добавление напоминания (notify_before - минуты или список минут); возвращает его id"""
+        raise NotImplementedError
+
+    def add_reminders_bulk(self, user_id, reminders):
+        """Добавление пачки (text, reminder_time, category, repeat_type, notify_before) одной транзакцией; возвращает id"""
+        raise NotImplementedError
+
+    def iter_user_reminders(self, user_id, status=None, chunk_size=500):
+        """(text, reminder_time, category, repeat_type, notify_before) пользователя по времени (для экспорта)"""
+        raise NotImplementedError
+
+    def get_reminder(self, reminder_id, user_id=None):
+        """Все колонки напоминания (как SELECT * в SQLite) или None; с user_id - только напоминание пользователя"""
+        raise NotImplementedError
+
+    def get_user_reminders(self, user_id, status=None):
+        """(id, текст, время, категория, повтор, статус) пользователя по времени, включая архив"""
+        raise NotImplementedError
+
+    def search_reminders(self, user_id, text, limit=10, offset=0):
+        """Полнотекстовый поиск: строки как get_user_reminders, активные и более релевантные первыми"""
+        raise NotImplementedError
+
+    def get_agenda_reminders(self, user_id, until):
+        """(id, текст, время, категория, повтор) активных напоминаний с первым срабатыванием раньше until"""
+        raise NotImplementedError
+
+    def update_reminder_status(self, reminder_id, status, user_id=None):
+        """Статус, снятие захвата и статистика одной транзакцией (с user_id - у владельца); возвращает, нашлось ли"""
+        raise NotImplementedError
+
+    def set_notify_offsets(self, reminder_id, offsets):
+        """Замена списка уведомлений заранее; отметки об отправленных уведомлениях сбрасываются"""
+        raise NotImplementedError
+
+    def add_notify_offset(self, reminder_id, minutes, user_id=None):
+        """Добавление уведомления к настроенным одной транзакцией; возвращает напоминание как get_reminder или None"""
+        raise NotImplementedError
+
+    def delete_reminder(self, reminder_id, user_id=None):
+        """Удаление напоминания (с user_id - только у владельца); возвращает, нашлось ли оно"""
+        raise NotImplementedError
+
+    def update_reminder(self, reminder_id, **kwargs):
+        """Обновление колонок напоминания"""
+        raise NotImplementedError
+
+    def get_user_stats(self, user_id):
+        """{'total', 'completed', 'cancelled', 'active', 'categories'} пользователя"""
+        raise NotImplementedError
+
+    def archive_reminders(self, older_than, batch_size=500):
+        """Перенос пачки выполненных и отмененных напоминаний старше older_than в архив; возвращает их число"""
+        raise NotImplementedError
+
+    def iter_pending_reminders(self, after, chunk_size=1000):
+        """Пачки активных напоминаний позже after по (reminder_time, id) для загрузки в планировщик"""
+        raise NotImplementedError
+
+    def get_pending_reminders(self):
+        """Активные напоминания ближайшего часа (для планировщика)"""
+        raise NotImplementedError
+
+    def count_due_reminders(self, until):
+        """Число активных напоминаний, которые сработают с этого момента до until (без просроченных)"""
+        raise NotImplementedError
+
+    # ===== Доставка =====
+
+    def claim_due_reminders(self, owner, lease_seconds, shard_index=0, shard_count=1, limit=100, due_before=None):
+        """Атомарный захват наступивших напоминаний шарда; строки CLAIM_COLUMNS"""
+        raise NotImplementedError
+
+    def claim_reminder(self, reminder_id, owner, lease_seconds):
+        """Атомарный захват конкретного напоминания; строка CLAIM_COLUMNS или None"""
+        raise NotImplementedError
+
+    def release_reminder(self, reminder_id, owner, retry_in_seconds):
+        """Снятие захвата после неудачной отправки до времени следующей попытки"""
+        raise NotImplementedError
+
+    def release_reminders(self, reminder_ids, owner, retry_in_seconds):
+        """Снятие захвата с пачки напоминаний (см. release_reminder)"""
+        raise NotImplementedError
+
+    def complete_delivery(self, reminder_id, owner, next_time=None):
+        """Завершение доставки и создание следующего повторения; возвращает (успех, id следующего)"""
+        raise NotImplementedError
+
+    def complete_deliveries(self, owner, deliveries):
+        """Завершение пачки (id, время следующего или None); возвращает (id, id следующего или None)"""
+        raise NotImplementedError
+
+    def claim_due_notifications(self, shard_index=0, shard_count=1, limit=100):
+        """Атомарный захват наступивших уведомлений заранее, чья повторная попытка уже наступила;
+        строки NOTIFICATION_COLUMNS и номер уведомления
+        """
+        raise NotImplementedError
+
+    def claim_notification(self, reminder_id, index=0):
+        """Атомарная отметка уведомления с номером index; номер попытки или 0 - его уже отправил другой процесс"""
+        raise NotImplementedError
+
+    def release_notification(self, reminder_id, index=0, retry_in_seconds=0):
+        """Возврат уведомления в очередь после неудачной отправки; до retry_in_seconds его не захватят"""
+        raise NotImplementedError
+
+    # ===== Процессы доставки =====
+
+    def heartbeat_worker(self, worker_id, hostname=None, pid=None):
+        """Регистрация процесса доставки или продление его heartbeat"""
+        raise NotImplementedError
+
+    def get_live_workers(self, timeout_seconds):
+        """worker_id живых процессов доставки по возрастанию"""
+        raise NotImplementedError
+
+    def remove_worker(self, worker_id):
+        """Удаление процесса доставки при штатной остановке"""
+        raise NotImplementedError
+
+    # ===== Прогноз нагрузки =====
+
+    def roll_forecast(self, hours):
+        """Сдвиг окна прогноза к now + hours; возвращает число обработанных напоминаний"""
+        raise NotImplementedError
+
+    def get_load_forecast(self, start, end):
+        """(минута UTC, число срабатываний) в [start, end) по возрастанию"""
+        raise NotImplementedError
+
+    def _forecast_counts(self, rows, until, from_marks=False):
+        """Срабатывания строк FORECAST_COLUMNS до границы окна: (Counter по минутам, пары (forecast_next, id)).
+
+        from_marks - учитывать повторения начиная с forecast_next (сдвиг окна),
+        иначе - с начала серии (новое или измененное напоминание).
+        """
+        now = datetime.utcnow()
+        total = Counter()
+        marks = []
+        for reminder_id, *schedule, mark in rows:
+            since = TimeParser.parse_db_time(mark) if from_marks else None
+            counts, next_mark = forecast.count_fires(*schedule, since, until, now)
+            total.update(counts)
+            marks.append((next_mark, reminder_id))
+        return total, marks
+
+    def _forecast_counted(self, rows, until):
+        """Уже учтенные будущие срабатывания строк FORECAST_COLUMNS (для вычитания перед изменением)"""
+        now = datetime.utcnow()
+        total = Counter()
+        for reminder_id, *schedule, mark in rows:
+            # Учтены повторения с самым ранним срабатыванием до forecast_next, у исчерпанных серий - до границы окна
+            counted_until = TimeParser.parse_db_time(mark) if mark else until
+            total.update(forecast.count_fires(*schedule, None, counted_until, now)[0])
+        return total
+
+    # ===== Обслуживание и бэкапы =====
+
+    def get_counters(self):
+        """{'users', 'reminders', 'archived'} - число пользователей и напоминаний (включая архив)"""
+        raise NotImplementedError
+
+    def run_maintenance(self, task, vacuum_pages=1000):
+        """Одна операция обслуживания (checkpoint, optimize, vacuum, analyze); возвращает описание результата"""
+        raise NotImplementedError
+
+    def record_maintenance(self, task, duration_ms, result):
+        """Сохранение результата операции обслуживания"""
+        raise NotImplementedError
+
+    def get_maintenance_log(self):
+        """Последние запуски обслуживания: task -> (last_run, duration_ms, result)"""
+        raise NotImplementedError
+
+    def create_backup(self):
+        """Создание бэкапа; возвращает (имя, размер KB, напоминаний, пользователей) или None"""
+        raise NotImplementedError
+
+    def get_backup_list(self):
+        """(имя, создан, размер KB, напоминаний, пользователей), новые первыми"""
+        raise NotImplementedError
+
+    def restore_from_backup(self, backup_filename):
+        """Восстановление из бэкапа; True при успехе"""
+        raise NotImplementedError
+
+    def get_total_reminders_count(self):
+        """Получение общего количества напоминаний (включая архив)"""
+        try:
+            return self.get_counters()['reminders']
+        except Exception as e:
+            logging.error(f"Error getting reminders count: {e}")
+            return 0
+
+    def get_total_users_count(self):
+        """Получение общего количества пользователей"""
+        try:
+            return self.get_counters()['users']
+        except Exception as e:
+            logging.error(f"Error getting users count: {e}")
+            return 0
+
+    # ===== Общие преобразования =====
+
+    @staticmethod
+    def _owner_clause(reminder_id, user_id, placeholder='?'):
+        """Условие WHERE по id напоминания и, если user_id задан, по владельцу; возвращает (условие, параметры)"""
+        if user_id is None:
+            return f'id = {placeholder}', (reminder_id,)
+        return f'id = {placeholder} AND user_id = {placeholder}', (reminder_id, user_id)
+
+    @staticmethod
+    def _merge_notify_offset(notify_before, notify_offsets, minutes):
+        """Минуты уведомлений заранее с добавленным minutes, по убыванию"""
+        return sorted(set(TimeParser.parse_notify_offsets(notify_before, notify_offsets)) | {minutes}, reverse=True)
+
+    @staticmethod
+    def _notify_columns(notify_before):
+        """notify_before - минуты или список минут; возвращает значения колонок (notify_before, notify_offsets)"""
+        if not isinstance(notify_before, (list, tuple, set)):
+            return notify_before, None
+        offsets = sorted({int(minutes) for minutes in notify_before if int(minutes) > 0}, reverse=True)
+        if len(offsets) > 1:
+            return offsets[0], json.dumps(offsets)
+        return (offsets[0] if offsets else 0), None
+
+    @staticmethod
+    def _search_tokens(text):
+        """Слова текста в нижнем регистре, ё как е"""
+        return re.findall(r'\w+', text.lower().replace('ё', 'е'))
+
+    @classmethod
+    def _search_words(cls, text):
+        """Слова запроса (ё как е, без однобуквенных предлогов)"""
+        return [word for word in cls._search_tokens(text) if len(word) > 1][:Config.SEARCH_MAX_WORDS]
+
+    @classmethod
+    def _search_score(cls, text, words):
+        """Релевантность: совпадение слова целиком весит больше совпадения по началу, короткие тексты выше.
+
+        Считается по найденным строкам пользователя: bm25 по префиксным запросам FTS5 обходит
+        совпадения во всей таблице, чтобы посчитать частоту слова, и на миллионах строк медленный.
+        """
+        tokens = cls._search_tokens(text)
+        score = 0
+        for word in words:
+            if word in tokens:
+                score += 2
+            elif any(token.startswith(word[:cls.SEARCH_PREFIX_LENGTH]) for token in tokens):
+                score += 1
+        return score / (1 + len(tokens) / 10)
+
+    @classmethod
+    def _rank_search(cls, matches, words, limit, offset):
+        """Сортировка найденных строк (id, текст, время, категория, повтор, статус) и страница результатов"""
+        matches.sort(key=lambda row: (row[5] != 'active', -cls._search_score(row[1], words), row[2]))
+        return matches[offset:offset + limit]
+
+
+def create_database(backend=None):
+    """Хранилище напоминаний по настройке STORAGE_BACKEND (или явно указанному backend).
+
+    Модуль хранилища импортируется только при выборе: psycopg нужен лишь для 'postgres'.
+    """
+    backend = backend or Config.STORAGE_BACKEND
+    if backend == 'sqlite':
+        from database import Database
+        return Database()
+    if backend == 'memory':
+        from memory_storage import MemoryStorage
+        return MemoryStorage()
+    if backend == 'postgres':
+        from postgres_storage import PostgresStorage
+        return PostgresStorage()
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,41 @@
+import os
+import uuid
+
+import pytest
+
+from database import Database
+from memory_storage import MemoryStorage
+
+# Хранилища, на которых прогоняются общие тесты; PostgreSQL - только если задан POSTGRES_DSN
+BACKENDS = ['sqlite', 'memory', 'postgres']
+
+
+@pytest.fixture(params=BACKENDS)
+def db(request, tmp_path):
+    """Пустое хранилище каждого вида"""
+    if request.param == 'sqlite':
+        yield Database(str(tmp_path / 'reminders.db'))
+    elif request.param == 'memory':
+        yield MemoryStorage()
+    else:
+        dsn = os.getenv('POSTGRES_DSN')
+        if not dsn:
+            pytest.skip('POSTGRES_DSN is not set')
+        psycopg = pytest.importorskip('psycopg')
+        from psycopg.conninfo import conninfo_to_dict, make_conninfo
+
+        from postgres_storage import PostgresStorage
+
+        # Отдельная временная база рядом с базой из POSTGRES_DSN
+        name = f'reminders_test_{uuid.uuid4().hex[:12]}'
+        with psycopg.connect(dsn, autocommit=True) as conn:
+            conn.execute(f'CREATE DATABASE {name}')
+        params = conninfo_to_dict(dsn)
+        params['dbname'] = name
+        storage = PostgresStorage(make_conninfo(**params))
+        try:
+            yield storage
+        finally:
+            storage.pool.close()
+            with psycopg.connect(dsn, autocommit=True) as conn:
+                conn.execute(f'DROP DATABASE IF EXISTS {name} WITH (FORCE)')
@@ -0,0 +1,68 @@
+import asyncio
+
+from telegram.error import Forbidden, NetworkError
+
+from broadcast import Broadcast
+from memory_storage import MemoryStorage
+
+ADMIN_ID = 100
+
+
+class FakeBot:
+    """Бот, который отправляет всем, кроме заблокировавших его и чатов с сетевой ошибкой"""
+
+    def __init__(self, blocked=(), broken=()):
+        self.blocked = set(blocked)
+        self.broken = set(broken)
+        self.sent_to = []
+
+    async def send_message(self, chat_id, text):
+        if chat_id in self.blocked:
+            raise Forbidden('Forbidden: bot was blocked by the user')
+        if chat_id in self.broken:
+            raise NetworkError('connection reset')
+        self.sent_to.append(chat_id)
+        return type('Message', (), {'message_id': 1})()
+
+    async def edit_message_text(self, **kwargs):
+        pass
+
+
+def run_broadcast(bot, db):
+    broadcast_id = db.create_broadcast(ADMIN_ID, 'новости')
+    asyncio.run(Broadcast(bot, db, broadcast_id, rate=1000, senders=2, chunk_size=2).run())
+    return db.get_broadcast(broadcast_id)
+
+
+def test_broadcast_deactivates_blocked_users_and_skips_them_later(monkeypatch):
+    db = MemoryStorage()
+    for user_id in (1, 2, 3, 4):
+        db.add_or_update_user(user_id)
+    reminder_id = db.add_reminder(2, 'зарядка', '2099-01-01 08:00:00')
+    monkeypatch.setattr(Broadcast, 'MAX_ATTEMPTS', 1)
+
+    bot = FakeBot(blocked={2}, broken={4})
+    broadcast = run_broadcast(bot, db)
+    assert broadcast[5:7] == (2, 2)  # отправлено, не доставлено
+    assert db.get_user_info(2)[6] == 0
+    assert db.get_user_info(4)[6] == 1  # сетевая ошибка не делает чат недоступным
+    assert db.get_reminder(reminder_id)[6] == 'paused'
+
+    bot = FakeBot()
+    run_broadcast(bot, db)
+    assert sorted(chat_id for chat_id in bot.sent_to if chat_id != ADMIN_ID) == [1, 3, 4]
+
+
+def test_broadcast_completes_when_pausing_a_user_fails(monkeypatch):
+    db = MemoryStorage()
+    for user_id in (1, 2, 3):
+        db.add_or_update_user(user_id)
+
+    def broken_deactivate(user_id):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(db, 'deactivate_user', broken_deactivate)
+    bot = FakeBot(blocked={1, 2, 3})
+    broadcast = run_broadcast(bot, db)
+    assert broadcast[3] == 'completed'
+    assert broadcast[5:7] == (0, 3)
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+from coalescing import ChatCoalescer
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+
+
+def run_sends(outbox, messages, expect=False):
+    async def send_all():
+        if expect:
+            for chat_id, _ in messages:
+                outbox.expect(chat_id)
+        started = time.perf_counter()
+        await asyncio.gather(*(outbox.send(chat_id, text) for chat_id, text in messages))
+        return time.perf_counter() - started
+
+    return asyncio.run(send_all())
+
+
+def test_announced_messages_are_sent_without_waiting_for_the_window():
+    bot = FakeBot()
+    elapsed = run_sends(ChatCoalescer(bot, window=5), [(1, 'a'), (2, 'b'), (1, 'c')], expect=True)
+    assert elapsed < 1
+    assert sorted(bot.sent) == [(1, 'a\n\nc'), (2, 'b')]
+
+
+def test_unannounced_messages_wait_for_the_window():
+    bot = FakeBot()
+    elapsed = run_sends(ChatCoalescer(bot, window=0.2), [(1, 'a'), (1, 'b')])
+    assert elapsed >= 0.2
+    assert bot.sent == [(1, 'a\n\nb')]
+
+
+def test_missing_announced_message_does_not_hold_the_batch_past_the_window():
+    bot = FakeBot()
+    outbox = ChatCoalescer(bot, window=0.1)
+
+    async def send_one():
+        outbox.expect(1, count=2)
+        await outbox.send(1, 'a')
+
+    asyncio.run(send_one())
+    assert bot.sent == [(1, 'a')]
+    assert outbox._expected == {}
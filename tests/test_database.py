@@ -0,0 +1,36 @@
+import sqlite3
+
+from config import Config
+from database import Database
+
+
+def test_database_uses_wal_and_checkpoints_it(tmp_path):
+    db = Database(str(tmp_path / 'reminders.db'))
+    conn = sqlite3.connect(db.db_name)
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2  # incremental
+    conn.close()
+
+    db.add_or_update_user(1, 'user')
+    assert not db.run_maintenance('checkpoint', 100).startswith('skipped')
+
+
+def test_backup_includes_changes_not_yet_checkpointed(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'BACKUP_DIR', str(tmp_path / 'backups'))
+    db = Database(str(tmp_path / 'reminders.db'))
+    # Открытое соединение не дает закрывающимся соединениям перенести WAL в файл базы
+    reader = sqlite3.connect(db.db_name)
+    reader.execute('SELECT 1 FROM users').fetchall()
+    db.add_or_update_user(1, 'user')
+    reminder_id = db.add_reminder(1, 'зарядка', '2099-01-01 08:00:00')
+
+    filename = db.create_backup()[0]
+    backup = sqlite3.connect(str(tmp_path / 'backups' / filename))
+    assert backup.execute('SELECT reminder_text FROM reminders').fetchall() == [('зарядка',)]
+    backup.close()
+
+    db.delete_reminder(reminder_id, 1)
+    monkeypatch.setattr(db, 'create_backup', lambda: None)
+    assert db.restore_from_backup(filename)
+    assert db.get_reminder(reminder_id)[2] == 'зарядка'
+    reader.close()
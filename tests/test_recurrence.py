@@ -0,0 +1,173 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from dateutil.rrule import rrulestr
+
+import recurrence
+from recurrence import Recurrence
+
+
+def occurrences(rule, start, count):
+    """Первые count повторений через next_after"""
+    moments = [rule.next_after(start)]
+    while len(moments) < count:
+        moments.append(rule.next_after(start, moments[-1]))
+    return moments
+
+
+def dateutil_occurrences(text, start, count):
+    return list(rrulestr(f'RRULE:{text};COUNT={count}', dtstart=start))
+
+
+@pytest.mark.parametrize('text', [
+    'FREQ=WEEKLY;BYDAY=MO,WE,FR',
+    'FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,SU',
+    'FREQ=WEEKLY;INTERVAL=3;BYDAY=SA',
+    'FREQ=MONTHLY;BYMONTHDAY=31',
+    'FREQ=MONTHLY;BYMONTHDAY=1,15,-1',
+    'FREQ=MONTHLY;INTERVAL=2;BYMONTHDAY=-3',
+    'FREQ=MONTHLY;BYDAY=-1FR',
+    'FREQ=MONTHLY;BYDAY=1MO,3MO',
+    'FREQ=MONTHLY;INTERVAL=3;BYDAY=5TH',
+    'FREQ=MONTHLY;BYDAY=-2SU',
+    'FREQ=MONTHLY;BYDAY=TU',
+    'FREQ=MONTHLY;BYMONTHDAY=28,29,30;BYSETPOS=-1',
+    'FREQ=MONTHLY;INTERVAL=2;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=1,-1',
+])
+def test_rules_match_dateutil(text):
+    rule = Recurrence.parse(text)
+    for start in (datetime(2024, 1, 31, 9, 30), datetime(2024, 2, 29, 23, 59), datetime(2025, 12, 28, 0, 0)):
+        assert occurrences(rule, start, 40) == dateutil_occurrences(text, start, 40), (text, start)
+
+
+def test_random_weekly_and_monthly_rules_match_dateutil():
+    rng = random.Random(43)
+    weekdays = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+    for _ in range(200):
+        interval = rng.randint(1, 4)
+        if rng.random() < 0.5:
+            days = ','.join(rng.sample(weekdays, rng.randint(1, 7)))
+            text = f'FREQ=WEEKLY;INTERVAL={interval};BYDAY={days}'
+        elif rng.random() < 0.5:
+            days = ','.join(str(rng.choice([1, -1]) * rng.randint(1, 31)) for _ in range(rng.randint(1, 3)))
+            text = f'FREQ=MONTHLY;INTERVAL={interval};BYMONTHDAY={days}'
+        else:
+            days = ','.join(f'{rng.choice([-2, -1, 1, 2, 4])}{rng.choice(weekdays)}' for _ in range(rng.randint(1, 2)))
+            text = f'FREQ=MONTHLY;INTERVAL={interval};BYDAY={days}'
+        start = datetime(2024, 1, 1, 8) + timedelta(days=rng.randint(0, 730), minutes=rng.randint(0, 1439))
+        rule = Recurrence.parse(text)
+        assert occurrences(rule, start, 25) == dateutil_occurrences(text, start, 25), (text, start)
+
+
+def test_next_after_skips_ahead_without_iterating():
+    rule = Recurrence.parse('FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH')
+    start = datetime(2024, 1, 1, 10, 0)  # понедельник
+    after = datetime(2030, 6, 5, 12, 0)
+    expected = next(moment for moment in dateutil_occurrences(str(rule), start, 2000) if moment > after)
+    assert rule.next_after(start, after) == expected
+
+
+@pytest.mark.parametrize('text, start, expected', [
+    # Без BYMONTHDAY 31 число в коротком месяце становится последним днем, как у relativedelta
+    ('monthly', datetime(2024, 1, 31, 9), [datetime(2024, 2, 29, 9), datetime(2024, 3, 31, 9), datetime(2024, 4, 30, 9)]),
+    # 29 февраля в невисокосный год - 28 февраля
+    ('yearly', datetime(2024, 2, 29, 9), [datetime(2025, 2, 28, 9), datetime(2026, 2, 28, 9), datetime(2027, 2, 28, 9),
+                                              datetime(2028, 2, 29, 9)]),
+    ('FREQ=HOURLY;INTERVAL=5', datetime(2024, 1, 1, 22), [datetime(2024, 1, 2, 3), datetime(2024, 1, 2, 8)]),
+    ('FREQ=YEARLY;INTERVAL=2', datetime(2024, 3, 1, 7), [datetime(2026, 3, 1, 7), datetime(2028, 3, 1, 7)]),
+])
+def test_calendar_edge_cases(text, start, expected):
+    rule = Recurrence.parse(text)
+    assert occurrences(rule, start, len(expected) + 1)[1:] == expected
+
+
+def test_between_matches_next_after():
+    rule = Recurrence.parse('FREQ=MONTHLY;BYDAY=-1FR')
+    start = datetime(2024, 1, 26, 18)
+    found = rule.between(start, datetime(2024, 3, 1), datetime(2024, 9, 1))
+    assert found == [moment for moment in occurrences(rule, start, 12) if datetime(2024, 3, 1) <= moment < datetime(2024, 9, 1)]
+    assert rule.between(start, datetime(2024, 3, 1), datetime(2024, 9, 1), limit=2) == found[:2]
+
+
+@pytest.mark.parametrize('text, canonical', [
+    ('daily', 'daily'),
+    ('RRULE:FREQ=WEEKLY', 'weekly'),
+    ('FREQ=DAILY;BYDAY=MO,FR', 'FREQ=WEEKLY;BYDAY=MO,FR'),
+    ('FREQ=MONTHLY;BYDAY=-1FR', 'FREQ=MONTHLY;BYDAY=-1FR'),
+    ('once', 'once'),
+])
+def test_normalize(text, canonical):
+    assert recurrence.normalize(text) == canonical
+
+
+@pytest.mark.parametrize('text', [
+    'FREQ=SECONDLY',
+    'FREQ=DAILY;INTERVAL=0',
+    'FREQ=DAILY;BYMONTHDAY=1',
+    'FREQ=WEEKLY;BYDAY=1MO',
+    'FREQ=MONTHLY;BYMONTHDAY=32',
+    'FREQ=MONTHLY;BYDAY=MO;BYMONTHDAY=1',
+    'FREQ=WEEKLY;COUNT=3',
+    'FREQ=MONTHLY;BYSETPOS=-1',
+    'FREQ=WEEKLY;BYDAY=MO,TU;BYSETPOS=1',
+    'FREQ=MONTHLY;BYMONTHDAY=1;BYSETPOS=0',
+])
+def test_unsupported_rules(text):
+    with pytest.raises(ValueError):
+        Recurrence.parse(text)
+
+
+@pytest.mark.parametrize('phrase, rule', [
+    ('по будням', 'FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR'),
+    ('каждые 2 часа', 'FREQ=HOURLY;INTERVAL=2'),
+    ('по понедельникам и средам', 'FREQ=WEEKLY;BYDAY=MO,WE'),
+    ('в последнюю пятницу месяца', 'FREQ=MONTHLY;BYDAY=-1FR'),
+    ('15 числа каждого месяца', 'FREQ=MONTHLY;BYMONTHDAY=15'),
+    ('ежедневно', 'daily'),
+])
+def test_parse_phrase(phrase, rule):
+    assert str(recurrence.parse_phrase(phrase)) == rule
+
+
+def test_weekdays_follow_moscow_time():
+    # 22:30 UTC понедельника - уже вторник по Москве
+    start = datetime(2024, 1, 1, 22, 30)
+    first = recurrence.first_occurrence('FREQ=WEEKLY;BYDAY=TU', start)
+    assert first == start
+    assert recurrence.next_occurrence('FREQ=WEEKLY;BYDAY=TU', first) == start + timedelta(weeks=1)
+    assert recurrence.first_occurrence('FREQ=WEEKLY;BYDAY=MO', start) == start + timedelta(days=6)
+
+
+@pytest.mark.parametrize('repeat_type, start, anchored', [
+    ('monthly', datetime(2025, 1, 31, 6), 'FREQ=MONTHLY;BYMONTHDAY=-1'),
+    ('monthly', datetime(2025, 1, 30, 6), 'FREQ=MONTHLY;BYMONTHDAY=28,29,30;BYSETPOS=-1'),
+    ('FREQ=MONTHLY;INTERVAL=2', datetime(2025, 4, 29, 6), 'FREQ=MONTHLY;INTERVAL=2;BYMONTHDAY=28,29;BYSETPOS=-1'),
+    ('yearly', datetime(2024, 2, 29, 6), 'FREQ=MONTHLY;INTERVAL=12;BYMONTHDAY=-1'),
+    ('monthly', datetime(2025, 1, 28, 6), 'monthly'),
+    ('yearly', datetime(2025, 1, 31, 6), 'yearly'),
+    # 31 декабря 22:00 UTC - уже 1 января по Москве
+    ('monthly', datetime(2024, 12, 31, 22), 'monthly'),
+])
+def test_anchored_pins_the_day_of_month(repeat_type, start, anchored):
+    assert recurrence.anchored(repeat_type, start) == anchored
+
+
+@pytest.mark.parametrize('repeat_type, start', [
+    ('monthly', datetime(2025, 1, 31, 6)),
+    ('monthly', datetime(2025, 1, 30, 6)),
+    ('yearly', datetime(2024, 2, 29, 6)),
+])
+def test_delivered_series_matches_agenda(repeat_type, start):
+    repeat_type = recurrence.anchored(repeat_type, start)
+    # Доставка считает каждое следующее повторение от предыдущего, повестка - от строки напоминания
+    delivered = [start]
+    for _ in range(14):
+        delivered.append(recurrence.next_occurrence(repeat_type, delivered[-1]))
+    expanded = recurrence.occurrences_between(repeat_type, start, start, delivered[-1] + timedelta(days=1))
+    assert delivered == expanded
+    assert [moment.day for moment in delivered[:4]] == {
+        'FREQ=MONTHLY;BYMONTHDAY=-1': [31, 28, 31, 30],
+        'FREQ=MONTHLY;BYMONTHDAY=28,29,30;BYSETPOS=-1': [30, 28, 30, 30],
+        'FREQ=MONTHLY;INTERVAL=12;BYMONTHDAY=-1': [29, 28, 28, 28],
+    }[repeat_type]
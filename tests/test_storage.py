@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+
+from utils import TimeParser
+
+
+def add(db, user_id, text, minutes, **kwargs):
+    """Напоминание через minutes минут (отрицательные - уже наступившее)"""
+    return db.add_reminder(user_id, text, datetime.utcnow() + timedelta(minutes=minutes), **kwargs)
+
+
+def status(db, reminder_id):
+    return db.get_reminder(reminder_id)[6]
+
+
+def test_complete_and_delete_only_by_owner(db):
+    reminder_id = add(db, 1, 'полить цветы', 60)
+
+    assert db.get_reminder(reminder_id, user_id=2) is None
+    assert db.update_reminder_status(reminder_id, 'completed', user_id=2) is False
+    assert status(db, reminder_id) == 'active'
+    assert db.update_reminder_status(reminder_id, 'completed', user_id=1) is True
+    assert status(db, reminder_id) == 'completed'
+    assert db.get_user_stats(1)['completed'] == 1
+
+    assert db.delete_reminder(reminder_id, user_id=2) is False
+    assert db.get_reminder(reminder_id) is not None
+    assert db.delete_reminder(reminder_id, user_id=1) is True
+    assert db.get_reminder(reminder_id) is None
+    assert db.delete_reminder(reminder_id, user_id=1) is False
+
+
+def test_claim_release_and_complete(db):
+    reminder_id = add(db, 1, 'зарядка', -1, repeat_type='daily')
+
+    claimed = db.claim_due_reminders('worker-1', 60)
+    assert [row[0] for row in claimed] == [reminder_id]
+    assert claimed[0][6] == 1  # attempts
+    # Захваченное напоминание не достается другому процессу
+    assert db.claim_due_reminders('worker-2', 60) == []
+    assert db.claim_reminder(reminder_id, 'worker-2', 60) is None
+
+    # До времени повторной попытки напоминание никто не захватит
+    db.release_reminder(reminder_id, 'worker-1', 60)
+    assert db.claim_due_reminders('worker-2', 60) == []
+    db.release_reminders([reminder_id], 'worker-1', 0)  # захват уже снят: ничего не меняется
+    assert db.claim_due_reminders('worker-2', 60) == []
+
+    db.update_reminder(reminder_id, claimed_until=datetime.utcnow() - timedelta(seconds=1))
+    claimed = db.claim_reminder(reminder_id, 'worker-2', 60)
+    assert claimed[6] == 2
+
+    next_time = TimeParser.parse_db_time(claimed[3]) + timedelta(days=1)
+    assert db.complete_delivery(reminder_id, 'worker-1', next_time) == (False, None)
+    completed, next_id = db.complete_delivery(reminder_id, 'worker-2', next_time)
+    assert completed and next_id != reminder_id
+    assert status(db, reminder_id) == 'completed'
+    repetition = db.get_reminder(next_id)
+    assert repetition[2] == 'зарядка' and repetition[6] == 'active'
+    assert TimeParser.parse_db_time(repetition[3]) == next_time
+    assert db.get_user_stats(1)['completed'] == 1
+
+
+def test_complete_deliveries_skips_lost_leases(db):
+    first = add(db, 1, 'первое', -2)
+    second = add(db, 1, 'второе', -1)
+    assert len(db.claim_due_reminders('worker-1', 60)) == 2
+    db.release_reminder(second, 'worker-1', 0)
+
+    assert db.complete_deliveries('worker-1', [(first, None), (second, None)]) == [(first, None)]
+    assert status(db, first) == 'completed'
+    assert status(db, second) == 'active'
+
+
+def test_bulk_insert_returns_ids_in_order(db):
+    now = datetime.utcnow()
+    batch = [(f'напоминание {i}', now + timedelta(hours=i + 1), 'work', 'once', 0) for i in range(5)]
+
+    reminder_ids = db.add_reminders_bulk(1, batch)
+
+    assert len(reminder_ids) == len(set(reminder_ids)) == 5
+    assert [db.get_reminder(reminder_id)[2] for reminder_id in reminder_ids] == [item[0] for item in batch]
+    assert db.get_user_stats(1)['total'] == 5
+    assert db.add_reminders_bulk(1, []) == []
+
+
+def test_search_is_scoped_to_owner(db):
+    doctor = add(db, 1, 'Записаться к врачу', 60)
+    add(db, 1, 'Купить молоко', 60)
+    add(db, 2, 'Позвонить врачу', 60)
+
+    assert [row[0] for row in db.search_reminders(1, 'врач')] == [doctor]
+    assert [row[0] for row in db.search_reminders(1, 'ЗАПИСАТЬСЯ врачу')] == [doctor]
+    assert db.search_reminders(1, 'хлеб') == []
+    assert db.search_reminders(3, 'врач') == []
+
+
+def test_deactivate_pauses_and_reactivate_resumes(db):
+    active = [add(db, 1, 'первое', 60), add(db, 1, 'второе', 120)]
+    done = add(db, 1, 'готово', 30)
+    db.update_reminder_status(done, 'completed')
+    other = add(db, 2, 'чужое', -1)
+
+    assert sorted(db.deactivate_user(1)) == sorted(active)
+    assert db.get_user_info(1)[6] == 0
+    assert [status(db, reminder_id) for reminder_id in active] == ['paused', 'paused']
+    assert status(db, done) == 'completed'
+    assert status(db, other) == 'active'
+
+    resumed = db.reactivate_user(1)
+    assert sorted(row[0] for row in resumed) == sorted(active)
+    assert db.get_user_info(1)[6] == 1
+    assert [status(db, reminder_id) for reminder_id in active] == ['active', 'active']
+    # Активного пользователя возобновлять нечего
+    assert db.reactivate_user(1) == []
+
+
+def test_failed_notification_waits_for_retry(db):
+    reminder_id = add(db, 1, 'встреча', 30, notify_before=[60])
+
+    claimed = db.claim_due_notifications()
+    assert [(row[0], row[6], row[-1]) for row in claimed] == [(reminder_id, 1, 0)]  # id, попытка, номер
+    assert db.claim_due_notifications() == []
+
+    db.release_notification(reminder_id, 0, 60)
+    assert db.claim_due_notifications() == []
+    db.update_reminder(reminder_id, notify_retry_at=datetime.utcnow() - timedelta(seconds=1))
+    assert [(row[6], row[-1]) for row in db.claim_due_notifications()] == [(2, 0)]
+
+
+def test_iter_users_skips_inactive_on_request(db):
+    for user_id in (1, 2, 3):
+        db.add_or_update_user(user_id)
+    db.deactivate_user(2)
+
+    assert [user[0] for users in db.iter_users(chunk_size=2) for user in users] == [1, 2, 3]
+    assert [user[0] for users in db.iter_users(chunk_size=2, active_only=True) for user in users] == [1, 3]
+    assert [user[0] for users in db.iter_users(1, active_only=True) for user in users] == [3]
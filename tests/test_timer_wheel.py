@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from timer_wheel import TimerWheel
+
+
+def run_until(wheel, last_second):
+    """Посекундный сдвиг колеса; возвращает id -> секунда срабатывания"""
+    fired = {}
+    for second in range(wheel.current, last_second + 1):
+        for entry_id in wheel.advance(second):
+            assert entry_id not in fired, f"{entry_id} fired twice"
+            fired[entry_id] = second
+    return fired
+
+
+@pytest.mark.parametrize('now', [1000, 65536 * 3 - 1, 65536 * 5, 2 ** 24 - 300])
+def test_entries_fire_on_time_across_level_boundaries(now):
+    wheel = TimerWheel(now)
+    offsets = [0, 1, 255, 256, 257, 511, 512, 65535, 65536, 65537, 70000, 131072 + 17]
+    for offset in offsets:
+        wheel.add(offset, now + offset)
+
+    assert run_until(wheel, now + max(offsets) + 1) == {offset: now + offset for offset in offsets}
+    assert len(wheel) == 0
+
+
+def test_cancel_and_re_add():
+    now = 5000
+    wheel = TimerWheel(now)
+    wheel.add('cancelled', now + 300)
+    wheel.add('moved_earlier', now + 70000)
+    wheel.add('moved_later', now + 10)
+    wheel.add('re_added', now + 65536)
+
+    assert wheel.cancel('cancelled')
+    assert not wheel.cancel('cancelled')
+    wheel.add('moved_earlier', now + 5)
+    wheel.add('moved_later', now + 70000)
+    assert wheel.cancel('re_added')
+    wheel.add('re_added', now + 256)
+
+    assert run_until(wheel, now + 70001) == {
+        'moved_earlier': now + 5,
+        're_added': now + 256,
+        'moved_later': now + 70000,
+    }
+
+
+def test_past_due_entries_fire_on_the_next_advance():
+    wheel = TimerWheel(10000)
+    assert wheel.advance(10000) == []
+    wheel.add('late', 9000)
+    wheel.add('now', 10000)
+    assert sorted(wheel.advance(10001)) == ['late', 'now']
+    assert len(wheel) == 0
+
+
+def test_matches_a_plain_schedule():
+    rng = random.Random(39)
+    now = 65536 - 1000
+    wheel = TimerWheel(now)
+    expected = {}
+    fired = {}
+    for second in range(now, now + 200000):
+        if rng.random() < 0.05:
+            entry_id = rng.randrange(300)
+            if entry_id in expected and rng.random() < 0.3:
+                wheel.cancel(entry_id)
+                del expected[entry_id]
+            else:
+                due = second + rng.choice([rng.randrange(-5, 300), rng.randrange(200, 70000)])
+                wheel.add(entry_id, due)
+                expected[entry_id] = max(due, second)
+        for entry_id in wheel.advance(second):
+            assert expected.pop(entry_id) == second
+            fired[entry_id] = second
+    assert all(due >= now + 200000 for due in expected.values())
+    assert fired
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from telegram.error import NetworkError
+
+from transport import BotApiRequest, TransportMetrics
+
+
+def test_reuse_counts_only_successful_requests():
+    metrics = TransportMetrics('test')
+    metrics.record(10.0, failed=True, reused=True)
+    assert metrics.summary()['reuse'] == 0.0
+
+    metrics.record(5.0, reused=False)
+    metrics.record(5.0, reused=True)
+    metrics.record(5.0, reused=True)
+    stats = metrics.summary()
+    assert stats['requests'] == 4
+    assert stats['failures'] == 1
+    assert stats['reuse'] == round(2 / 3, 3)
+
+
+def test_failed_connect_is_not_reported_as_reused():
+    async def request_closed_port():
+        request = BotApiRequest('test', 1)
+        await request.initialize()
+        try:
+            with pytest.raises(NetworkError):
+                await request.do_request('http://127.0.0.1:1/', 'GET')
+        finally:
+            await request.shutdown()
+        return request.metrics.summary()
+
+    stats = asyncio.run(request_closed_port())
+    assert stats['failures'] == 1
+    assert stats['reuse'] == 0.0
@@ -0,0 +1,132 @@
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_second(moment):
+    """UTC datetime -> целая секунда Unix (с округлением вверх, чтобы не сработать раньше)"""
+    return math.ceil((moment - EPOCH).total_seconds())
+
+
+class TimerWheel:
+    """Иерархическое колесо таймеров с точностью в секунду.
+
+    Для каждой записи хранится только id и секунда срабатывания. Четыре уровня по
+    256 ячеек покрывают 2^32 секунд: запись кладется на уровень по удаленности срока
+    и спускается на нижний уровень, когда до нее доходит очередь. Добавление и отмена
+    выполняются за O(1): отмена только удаляет срок из словаря, а устаревшие ссылки
+    в ячейках пропускаются при обходе.
+    """
+
+    SLOT_BITS = 8
+    SLOTS = 1 << SLOT_BITS
+    MASK = SLOTS - 1
+    LEVELS = 4
+
+    def __init__(self, now_second):
+        self.current = now_second
+        self.due = {}  # id -> секунда срабатывания
+        self.wheels = [[[] for _ in range(self.SLOTS)] for _ in range(self.LEVELS)]
+
+    def __len__(self):
+        return len(self.due)
+
+    def _place(self, entry_id, due):
+        due = max(due, self.current)
+        delta = due - self.current
+        level = 0
+        while level < self.LEVELS - 1 and delta >> (self.SLOT_BITS * (level + 1)):
+            level += 1
+        slot = (due >> (self.SLOT_BITS * level)) & self.MASK
+        self.wheels[level][slot].append(entry_id)
+
+    def add(self, entry_id, due_second):
+        """Добавление или перенос записи"""
+        self.due[entry_id] = due_second
+        self._place(entry_id, due_second)
+
+    def cancel(self, entry_id):
+        return self.due.pop(entry_id, None) is not None
+
+    def _cascade(self):
+        # Ячейка верхнего уровня, до которой дошла очередь, раскладывается по нижним
+        for level in range(1, self.LEVELS):
+            index = (self.current >> (self.SLOT_BITS * level)) & self.MASK
+            bucket = self.wheels[level][index]
+            self.wheels[level][index] = []
+            for entry_id in bucket:
+                due = self.due.get(entry_id)
+                if due is not None:
+                    self._place(entry_id, due)
+            if index:
+                break
+
+    def advance(self, now_second):
+        """Сдвиг колеса до now_second включительно; возвращает id сработавших записей"""
+        expired = []
+        while self.current <= now_second:
+            slot = self.current & self.MASK
+            if slot == 0:
+                self._cascade()
+            bucket = self.wheels[0][slot]
+            self.wheels[0][slot] = []
+            for entry_id in bucket:
+                due = self.due.get(entry_id)
+                # Отмененные и перенесенные на более поздний срок записи пропускаются
+                if due is not None and due <= self.current:
+                    del self.due[entry_id]
+                    expired.append(entry_id)
+            self.current += 1
+        return expired
+
+
+class TimerWheelThread:
+    """Фоновый поток, который раз в секунду сдвигает колесо и запускает сработавшие записи"""
+
+    def __init__(self, callback, max_workers=10):
+        self.callback = callback
+        self.wheel = TimerWheel(to_second(datetime.utcnow()))
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='timer-wheel')
+        self._thread = threading.Thread(target=self._run, name='timer-wheel', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logging.info("Timer wheel started")
+
+    def add(self, entry_id, due):
+        with self._lock:
+            self.wheel.add(entry_id, to_second(due))
+
+    def cancel(self, entry_id):
+        with self._lock:
+            return self.wheel.cancel(entry_id)
+
+    def __len__(self):
+        return len(self.wheel)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                expired = self.wheel.advance(int(time.time()))
+            for entry_id in expired:
+                self._executor.submit(self._fire, entry_id)
+            # Просыпаемся в начале следующей секунды
+            self._stopped.wait(1 - time.time() % 1)
+
+    def _fire(self, entry_id):
+        try:
+            self.callback(entry_id)
+        except Exception as e:
+            logging.error(f"Error firing timer {entry_id}: {e}")
+
+    def shutdown(self, wait=True):
+        self._stopped.set()
+        self._thread.join()
+        self._executor.shutdown(wait=wait)
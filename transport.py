@@ -0,0 +1,135 @@
+import contextvars
+import logging
+import time
+from collections import deque
+
+import httpx
+from telegram.request import HTTPXRequest
+
+from config import Config
+
+# Флаг текущего запроса: открыл ли он новое TCP соединение (события httpcore идут в задаче запроса)
+_connection_opened = contextvars.ContextVar('connection_opened', default=None)
+
+
+class TransportMetrics:
+    """Метрики пула соединений с Bot API: запросы, ошибки, новые соединения и задержка.
+
+    Доля переиспользования - успешные запросы, для которых не пришлось открывать TCP соединение;
+    неудачные запросы в нее не входят, даже если соединение так и не открылось.
+    Задержка хранится для последних LATENCY_SAMPLES запросов; для getUpdates она включает
+    ожидание long polling.
+    """
+
+    LATENCY_SAMPLES = 1000
+
+    def __init__(self, name):
+        self.name = name
+        self.requests = 0
+        self.failures = 0
+        self.connections = 0
+        self.reused = 0
+        self.latencies = deque(maxlen=self.LATENCY_SAMPLES)  # мс
+
+    def record(self, elapsed_ms, failed=False, reused=False):
+        self.requests += 1
+        self.failures += failed
+        self.reused += reused and not failed
+        self.latencies.append(elapsed_ms)
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(share):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * share))], 1) if latencies else 0.0
+
+        succeeded = self.requests - self.failures
+        return {
+            'requests': self.requests,
+            'failures': self.failures,
+            'connections': self.connections,
+            'reuse': round(self.reused / succeeded, 3) if succeeded else 0.0,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(latencies[-1], 1) if latencies else 0.0,
+        }
+
+    def format(self):
+        stats = self.summary()
+        return (
+            f"{self.name}: {stats['requests']} requests, {stats['failures']} failed, "
+            f"{stats['connections']} connections opened ({stats['reuse']:.0%} reused), "
+            f"latency p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms"
+        )
+
+
+class BotApiRequest(HTTPXRequest):
+    """Транспорт Bot API с настраиваемыми пулом, keep-alive и таймаутами и с метриками.
+
+    Соединения пула привязаны к циклу событий, в котором их открыли, поэтому все запросы
+    одного экземпляра должны идти из одного цикла - иначе прогретые соединения не
+    переиспользуются.
+    """
+
+    def __init__(self, name, pool_size, http_version='1.1', keepalive=None, read_timeout=None):
+        # _build_client вызывается из конструктора HTTPXRequest, поэтому поля задаются до него
+        self.keepalive = Config.BOT_API_KEEPALIVE if keepalive is None else keepalive
+        self.metrics = TransportMetrics(name)
+        super().__init__(
+            connection_pool_size=pool_size,
+            read_timeout=Config.BOT_API_READ_TIMEOUT if read_timeout is None else read_timeout,
+            write_timeout=Config.BOT_API_WRITE_TIMEOUT,
+            connect_timeout=Config.BOT_API_CONNECT_TIMEOUT,
+            pool_timeout=Config.BOT_API_POOL_TIMEOUT,
+            http_version=http_version,
+        )
+
+    def _build_client(self):
+        limits = self._client_kwargs['limits']
+        return httpx.AsyncClient(**{
+            **self._client_kwargs,
+            # По умолчанию httpx закрывает простаивающее соединение через 5 секунд
+            'limits': httpx.Limits(
+                max_connections=limits.max_connections,
+                max_keepalive_connections=limits.max_keepalive_connections,
+                keepalive_expiry=self.keepalive,
+            ),
+            'event_hooks': {'request': [self._trace_request]},
+        })
+
+    async def _trace_request(self, request):
+        request.extensions['trace'] = self._trace
+
+    async def _trace(self, event_name, info):
+        """События httpcore: открытие TCP соединения означает, что запрос не попал в прогретое"""
+        if event_name == 'connection.connect_tcp.complete':
+            self.metrics.connections += 1
+            opened = _connection_opened.get()
+            if opened is not None:
+                opened[0] = True
+
+    async def do_request(self, *args, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        opened = [False]
+        token = _connection_opened.set(opened)
+        try:
+            result = await super().do_request(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _connection_opened.reset(token)
+            self.metrics.record((time.perf_counter() - started) * 1000, failed, reused=not opened[0])
+
+
+def create_request(name, pool_size, **kwargs):
+    """Транспорт пула name с настройками BOT_API_*.
+
+    HTTP/2 (BOT_API_HTTP2=1) требует python-telegram-bot[http2]; без него - HTTP/1.1.
+    """
+    if Config.BOT_API_HTTP2:
+        try:
+            return BotApiRequest(name, pool_size, http_version='2', **kwargs)
+        except RuntimeError as e:
+            logging.warning(f"HTTP/2 is not available for Bot API {name} requests, using HTTP/1.1: {e}")
+    return BotApiRequest(name, pool_size, **kwargs)
@@ -0,0 +1,65 @@
+import asyncio
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка обновлений разных пользователей.
+
+    Обновления одного пользователя обрабатываются строго по очереди, поэтому
+    пошаговое создание напоминания в context.user_data не перемешивается,
+    а медленный пользователь не задерживает остальных.
+    """
+
+    __slots__ = ('_workers_limit', '_workers', '_locks')
+
+    # Сколько обновлений может ждать своей очереди на один обработчик
+    QUEUE_FACTOR = 64
+
+    def __init__(self, max_concurrent_updates):
+        # Семафор базового класса захватывается до ожидания очереди пользователя,
+        # поэтому он только ограничивает число ожидающих, а параллельность задает _workers
+        super().__init__(max_concurrent_updates * self.QUEUE_FACTOR)
+        self._workers_limit = max_concurrent_updates
+        self._workers = None
+        self._locks = {}
+
+    @staticmethod
+    def update_key(update):
+        """Ключ очереди: пользователь, а если его нет - чат"""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        key = self.update_key(update)
+        if key is None:
+            async with self._workers:
+                await coroutine
+            return
+
+        # [блокировка, число обновлений пользователя в обработке или в очереди]
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._workers:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    async def initialize(self):
+        # Семафор создается внутри работающего event loop
+        self._workers = asyncio.Semaphore(self._workers_limit)
+
+    async def shutdown(self):
+        self._locks.clear()
@@ -1,7 +1,10 @@
 import re
+import json
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import logging
+import recurrence
+from config import Config, MAX_MESSAGE_LENGTH
 
 class TimeParser:
     @staticmethod
@@ -81,20 +84,51 @@ class TimeParser:
         # Конвертируем в UTC (Москва UTC+3)
         return naive_dt - timedelta(hours=3)
     
+    @staticmethod
+    def parse_db_time(reminder_time_str):
+        """Разбор времени напоминания в формате SQLite"""
+        if '.' in reminder_time_str:
+            return datetime.strptime(reminder_time_str, '%Y-%m-%d %H:%M:%S.%f')
+        return datetime.strptime(reminder_time_str, '%Y-%m-%d %H:%M:%S')
+    
+    @staticmethod
+    def parse_notify_offsets(notify_before, notify_offsets=None):
+        """Минуты уведомлений заранее по убыванию, то есть в порядке срабатывания"""
+        offsets = json.loads(notify_offsets) if notify_offsets else [notify_before]
+        return sorted({int(minutes) for minutes in offsets if minutes and int(minutes) > 0}, reverse=True)
+    
     @staticmethod
     def calculate_next_reminder(reminder_time, repeat_type):
-        """Вычисление следующего напоминания для повторяющихся"""
-        if repeat_type == 'daily':
-            return reminder_time + timedelta(days=1)
-        elif repeat_type == 'weekly':
-            return reminder_time + timedelta(weeks=1)
-        elif repeat_type == 'monthly':
-            return reminder_time + relativedelta(months=1)
-        elif repeat_type == 'yearly':
-            return reminder_time + relativedelta(years=1)
-        return None
+        """Вычисление следующего напоминания для повторяющихся (repeat_type - имя или правило повторения)"""
+        return recurrence.next_occurrence(repeat_type, reminder_time)
+
+    @staticmethod
+    def next_future_reminder(reminder_time, repeat_type, now=None):
+        """Первое повторение позже now и позже самого reminder_time (для пропущенных за время простоя
+        и отправленных заранее перед пиком нагрузки повторяющихся напоминаний)"""
+        return recurrence.next_occurrence(repeat_type, reminder_time, max(now or datetime.utcnow(), reminder_time))
 
 class TextFormatter:
+    @staticmethod
+    def join_within_limit(lines, blocks, total):
+        """Сообщение из строк lines и блоков строк blocks в пределах лимита длины Telegram.
+        
+        Блоки, которые уже не помещаются, заменяются строкой «…и еще N», где N - сколько
+        из total не показано.
+        """
+        lines = list(lines)
+        length = sum(len(line) + 1 for line in lines)
+        for shown, block in enumerate(blocks):
+            rest = f"…и еще {total - shown}"
+            added = sum(len(line) + 1 for line in block)
+            # Оставляем место для строки об остатке
+            if length + added + len(rest) > MAX_MESSAGE_LENGTH:
+                lines.append(rest)
+                break
+            lines.extend(block)
+            length += added
+        return '\n'.join(lines)
+    
     @staticmethod
     def format_reminder_list(reminders):
         if not reminders:
@@ -106,6 +140,8 @@ class TextFormatter:
                 status_icon = "✅"
             elif status == 'cancelled':
                 status_icon = "❌"
+            elif status == 'paused':
+                status_icon = "⏸"
             else:
                 status_icon = "⏳"
             
@@ -124,7 +160,7 @@ class TextFormatter:
                 time_str = time
             
             category_icon = Config.CATEGORIES.get(category, '📌').split(' ')[0]
-            repeat_text = f" ({Config.REPEAT_OPTIONS.get(repeat_type, '')})" if repeat_type != 'once' else ""
+            repeat_text = f" ({recurrence.describe(repeat_type)})" if repeat_type != 'once' else ""
             
             text += f"{status_icon} {category_icon} {text_msg}\n"
             text += f"   📅 {time_str}{repeat_text}\n"
@@ -132,6 +168,22 @@ class TextFormatter:
         
         return text
     
+    @staticmethod
+    def format_search_results(reminders, query, offset=0):
+        """Страница результатов поиска /find; номера продолжаются между страницами"""
+        if not reminders:
+            return f"🔎 По запросу «{query}» ничего не найдено." if not offset else "🔎 Больше результатов нет."
+        
+        status_icons = {'active': '⏳', 'completed': '✅', 'cancelled': '❌', 'paused': '⏸'}
+        text = f"🔎 Результаты по запросу «{query}»:\n\n"
+        for number, (rem_id, text_msg, time, category, repeat_type, status) in enumerate(reminders, offset + 1):
+            moscow_time = TimeParser.parse_db_time(time) + timedelta(hours=3)
+            category_icon = Config.CATEGORIES.get(category, '📌').split(' ')[0]
+            repeat_text = f" ({recurrence.describe(repeat_type)})" if repeat_type != 'once' else ""
+            text += f"{number}. {status_icons.get(status, '⏳')} {category_icon} {text_msg}\n"
+            text += f"   📅 {moscow_time.strftime('%d.%m.%Y %H:%M')}{repeat_text}\n\n"
+        return text
+    
     @staticmethod
     def format_stats(stats):
         text = "📊 Статистика напоминаний:\n\n"
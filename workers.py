@@ -0,0 +1,218 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from telegram import Bot
+
+from config import Config
+from scheduler import ReminderScheduler
+from transport import create_request
+
+# Загрузка переменных окружения
+load_dotenv()
+
+# Настройка логирования
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(processName)s - %(levelname)s - %(message)s',
+    level=logging.INFO,
+    handlers=[
+        logging.FileHandler('workers.log'),
+        logging.StreamHandler()
+    ]
+)
+
+
+class DeliveryWorker(ReminderScheduler):
+    """Процесс доставки: опрашивает базу и отправляет напоминания своего шарда.
+
+    Шард определяется позицией процесса среди живых (по heartbeat) процессов:
+    напоминание принадлежит шарду user_id % N. Если процесс перестает обновлять
+    heartbeat, остальные пересчитывают шарды на следующем опросе и забирают его
+    пользователей.
+    """
+
+    def __init__(self, bot, worker_id=None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.shard = None
+        self._stopped = False
+        self._next_archive_at = 0.0
+        self._next_maintenance_at = 0.0
+        self._next_catchup_at = 0.0
+        self._next_forecast_at = 0.0
+        self._next_metrics_at = time.monotonic() + Config.BOT_API_METRICS_INTERVAL
+        super().__init__(bot, owner_id=self.worker_id)
+
+    def start_scheduler(self):
+        """Время срабатывания определяется опросом базы, APScheduler не запускается"""
+        logging.info(f"Delivery worker {self.worker_id} started")
+
+    def restore_pending_reminders(self):
+        """Все активные напоминания и так лежат в базе"""
+        pass
+
+    def add_reminder(self, user_id, reminder_text, reminder_time, reminder_id, notify_offsets=()):
+        """Новые, повторяющиеся и отложенные после ошибки напоминания подхватываются следующим опросом"""
+        pass
+
+    def cancel_reminder(self, reminder_id):
+        """Отмененные напоминания не попадают в выборку по статусу"""
+        pass
+
+    def retry_notification(self, user_id, reminder_text, reminder_id, index, delay):
+        """Уведомление подхватывается опросом после notify_retry_at"""
+        pass
+
+    def update_shard(self):
+        """Продление heartbeat и пересчет своего шарда"""
+        self.db.heartbeat_worker(self.worker_id, socket.gethostname(), os.getpid())
+        live_workers = self.db.get_live_workers(Config.WORKER_HEARTBEAT_TIMEOUT)
+        if self.worker_id not in live_workers:
+            live_workers = sorted(live_workers + [self.worker_id])
+
+        shard = (live_workers.index(self.worker_id), len(live_workers))
+        if shard != self.shard:
+            logging.info(f"Worker {self.worker_id} now owns shard {shard[0]}/{shard[1]}")
+            self.shard = shard
+        return shard
+
+    def dispatch_until(self):
+        """Граница выборки напоминаний: если по прогнозу в ближайшие FORECAST_EARLY_SECONDS
+        наступает пиковая минута, ее напоминания начинают уходить заранее, чтобы растянуть пик
+        """
+        now = datetime.utcnow()
+        if Config.FORECAST_EARLY_SECONDS <= 0:
+            return now
+        ahead = now + timedelta(seconds=Config.FORECAST_EARLY_SECONDS)
+        if any(fires >= Config.FORECAST_SPIKE_FIRES for _, fires in self.db.get_load_forecast(now, ahead)):
+            return ahead
+        return now
+
+    async def deliver_due(self, shard_index, shard_count):
+        """Отправка наступивших уведомлений и напоминаний шарда. Возвращает их количество"""
+        notifications = self.db.claim_due_notifications(shard_index, shard_count, Config.WORKER_BATCH_SIZE)
+        reminders = self.db.claim_due_reminders(
+            self.owner_id, Config.DELIVERY_LEASE_SECONDS, shard_index, shard_count, Config.WORKER_BATCH_SIZE,
+            due_before=self.dispatch_until()
+        )
+
+        # Все сообщения пачки известны заранее: чат получает их одним сообщением без ожидания окна
+        for user_id in [notification[1] for notification in notifications] + [reminder[1] for reminder in reminders]:
+            self.outbox.expect(user_id)
+        await asyncio.gather(
+            *(self.deliver_notification(notification) for notification in notifications),
+            *(self.deliver_claimed(reminder) for reminder in reminders)
+        )
+        return len(notifications) + len(reminders)
+
+    async def deliver_notification(self, notification):
+        """Отправка уже захваченного уведомления заранее"""
+        rem_id, user_id, reminder_text = notification[:3]
+        attempts = notification[6]  # попытки этого уведомления
+        index = notification[-1]  # номер уведомления заранее
+        try:
+            await self.outbox.send(user_id, f"🔔 Скоро напоминание: {reminder_text}")
+        except Exception as e:
+            logging.error(f"Failed to send notification to user {user_id}: {e}")
+            await asyncio.to_thread(
+                self.handle_notification_failure, rem_id, user_id, reminder_text, index, attempts, e
+            )
+
+    async def run(self):
+        """Основной цикл опроса"""
+        async with self.bot:
+            try:
+                while not self._stopped:
+                    started = time.monotonic()
+                    delivered = 0
+                    try:
+                        shard_index, shard_count = self.update_shard()
+                        if started >= self._next_catchup_at:
+                            # Пропущенные за время простоя напоминания шарда - сводкой, до обычной доставки;
+                            # при старте процесса - все уже наступившие
+                            grace_seconds = 0 if not self._next_catchup_at else None
+                            self._next_catchup_at = started + Config.CATCHUP_INTERVAL
+                            await self.missed.run(shard_index, shard_count, grace_seconds)
+                        delivered = await self.deliver_due(shard_index, shard_count)
+                        if shard_index == 0 and started >= self._next_archive_at:
+                            # Архивацию и обслуживание базы выполняет только первый шард, в отдельном потоке
+                            self._next_archive_at = started + Config.ARCHIVE_INTERVAL
+                            asyncio.get_running_loop().run_in_executor(None, self.archive_old_reminders)
+                        if shard_index == 0 and started >= self._next_forecast_at:
+                            self._next_forecast_at = started + Config.FORECAST_ROLL_INTERVAL
+                            asyncio.get_running_loop().run_in_executor(None, self.roll_forecast)
+                        if shard_index == 0 and started >= self._next_maintenance_at:
+                            self._next_maintenance_at = started + Config.MAINTENANCE_INTERVAL
+                            asyncio.get_running_loop().run_in_executor(None, self.run_maintenance)
+                        if Config.BOT_API_METRICS_INTERVAL > 0 and started >= self._next_metrics_at:
+                            self._next_metrics_at = started + Config.BOT_API_METRICS_INTERVAL
+                            self.log_transport_metrics()
+                    except Exception as e:
+                        logging.error(f"Error in delivery worker {self.worker_id}: {e}")
+
+                    # Полная пачка - значит есть очередь, продолжаем без паузы
+                    if delivered < Config.WORKER_BATCH_SIZE:
+                        elapsed = time.monotonic() - started
+                        await asyncio.sleep(max(0.0, Config.WORKER_POLL_INTERVAL - elapsed))
+            finally:
+                self.shutdown()
+
+    def log_transport_metrics(self):
+        """Метрики соединений процесса с Bot API (если транспорт их собирает)"""
+        metrics = getattr(self.bot.request, 'metrics', None)
+        if metrics is not None:
+            logging.info(f"Bot API {metrics.format()} in worker {self.worker_id}")
+
+    def shutdown(self, wait=True):
+        """Остановка процесса доставки"""
+        self._stopped = True
+        try:
+            self.db.remove_worker(self.worker_id)
+        except Exception as e:
+            logging.error(f"Error removing worker {self.worker_id}: {e}")
+
+
+def run_worker():
+    """Точка входа дочернего процесса"""
+    # Процесс только отправляет, поэтому настраивается только пул отправки
+    worker = DeliveryWorker(Bot(Config.BOT_TOKEN, request=create_request('send', Config.BOT_API_POOL_SIZE)))
+    try:
+        asyncio.run(worker.run())
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Процессы доставки напоминаний')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                        help='число процессов доставки на этом хосте')
+    args = parser.parse_args()
+
+    def spawn(index):
+        process = multiprocessing.Process(target=run_worker, name=f"worker-{index}")
+        process.start()
+        return process
+
+    processes = [spawn(i) for i in range(args.processes)]
+    print(f"Запущено {args.processes} процессов доставки. Нажми Ctrl+C для остановки")
+
+    try:
+        # Перезапускаем упавшие процессы; их шард до этого заберут соседи
+        while True:
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    logging.warning(f"{process.name} exited with code {process.exitcode}, restarting")
+                    processes[i] = spawn(i)
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join(timeout=10)
+
+
+if __name__ == '__main__':
+    main()